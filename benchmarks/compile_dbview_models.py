@@ -0,0 +1,102 @@
+"""
+Benchmark for the compile phase of dbview models (logged as "compiling dbview model").
+
+Compares compiling the Jinja template of the SQL file on every request (as before templates were cached) against reusing
+the template compiled once per SqlQueryFile.
+
+Usage:
+    python benchmarks/compile_dbview_models.py [--iterations N]
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+import logging, statistics, tempfile
+
+from squirrels import _models as m, _model_queries as mq, _utils as u
+from squirrels._arguments.init_time_args import ParametersArgs
+from squirrels._arguments.run_time_args import ContextArgs
+from squirrels._connection_set import ConnectionSet
+from squirrels._manifest import ConnectionProperties
+from squirrels._model_configs import DbviewModelConfig
+from squirrels._schemas.auth_models import GuestUser, CustomUserFields
+
+
+MACROS = """
+{%- macro date_filter(column, start, end) -%}
+    {{ column }} BETWEEN {{ start }} AND {{ end }}
+{%- endmacro -%}
+
+{%- macro in_list(column, values) -%}
+    {{ column }} IN ({% for value in values %}'{{ value }}'{% if not loop.last %}, {% endif %}{% endfor %})
+{%- endmacro -%}
+"""
+
+RAW_QUERY = """
+SELECT date, category, subcategory, description, SUM(amount) AS total_amount
+FROM transactions
+WHERE {{ date_filter("date", "'2024-01-01'", "'2024-12-31'") }}
+{%- if prms.get("categories") %}
+    AND {{ in_list("category", prms["categories"]) }}
+{%- endif %}
+{%- for column in ["description", "subcategory"] %}
+    AND {{ column }} IS NOT NULL
+{%- endfor %}
+GROUP BY date, category, subcategory, description
+ORDER BY date DESC
+"""
+
+
+class _ActivityTimeHandler(logging.Handler):
+    def __init__(self, activity_prefix: str):
+        super().__init__()
+        self.activity_prefix = activity_prefix
+        self.times_ms: list[float] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.activity_prefix in record.getMessage():
+            self.times_ms.append(getattr(record, "data")["time_taken_ms"])
+
+
+def _run(project_path: str, iterations: int, *, reuse_templates: bool) -> list[float]:
+    logger = u.Logger("benchmark")
+    logger.setLevel(logging.INFO)
+    handler = _ActivityTimeHandler("compiling dbview model")
+    logger.addHandler(handler)
+
+    j2_env = u.EnvironmentWithMacros(logger, loader=u.j2.FileSystemLoader(project_path))
+    conn_set = ConnectionSet({"default": ConnectionProperties(uri="sqlite://")})
+    param_args = ParametersArgs(project_path=project_path, proj_vars={}, env_vars={})
+    user = GuestUser(username="test", custom_fields=CustomUserFields())
+    prms = {"categories": ["Food", "Bills", "Entertainment"]}
+    ctx_args = ContextArgs(**param_args.__dict__, user=user, prms=prms, configurables={}, _conn_args=param_args)
+    config = DbviewModelConfig().finalize_connection()
+
+    query_file = mq.SqlQueryFile("models/dbviews/benchmark.sql", RAW_QUERY)
+    for _ in range(iterations):
+        if not reuse_templates:
+            query_file = mq.SqlQueryFile("models/dbviews/benchmark.sql", RAW_QUERY)
+        model = m.DbviewModel("benchmark", config, query_file, logger=logger, conn_set=conn_set, j2_env=j2_env)
+        model.compile({}, ctx_args, {}, recurse=False)
+
+    return handler.times_ms
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the compile phase of dbview models")
+    parser.add_argument("--iterations", type=int, default=500, help="Number of compilations per scenario")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as project_path:
+        macros_path = Path(project_path, "macros")
+        macros_path.mkdir()
+        Path(macros_path, "macros.sql").write_text(MACROS * 5)
+
+        for label, reuse_templates in [("compile template per request", False), ("cached template", True)]:
+            times_ms = _run(project_path, args.iterations, reuse_templates=reuse_templates)
+            print(
+                f"{label:>30}: mean {statistics.mean(times_ms):.3f}ms, median {statistics.median(times_ms):.3f}ms, "
+                f"total {sum(times_ms):.1f}ms over {len(times_ms)} compilations"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark for the peak memory (RSS) of running a multi-hop runtime DAG.
+
+The DAG is a dbview model that runs on DuckDB, followed by a chain of federate models ending in the target model. Compares
+the previous handoff of results between DuckDB and polars (".pl()" for every result, so the dbview result is converted to
+polars and then scanned by DuckDB again) against keeping results that are only used by DuckDB in Arrow, and converting to
+polars only at the target.
+
+Each scenario runs in its own process, since the peak RSS of a process cannot be reset.
+
+Usage:
+    python benchmarks/dag_memory.py [--rows N] [--hops N]
+"""
+from argparse import ArgumentParser
+import asyncio, resource, subprocess, sys, duckdb
+
+from squirrels import _models as m, _model_queries as mq
+from squirrels._model_configs import DbviewModelConfig, FederateModelConfig
+
+
+DBVIEW_QUERY = """
+SELECT range AS id, 'category_' || (range % 1000)::VARCHAR AS category, 'description of row ' || range::VARCHAR AS description,
+    random() * 100 AS amount
+FROM range({rows})
+"""
+
+
+def _load_duckdb_view_to_python_df_before(self: m.DataModel, conn: duckdb.DuckDBPyConnection, *, use_datalake: bool = False):
+    table_name = ("vdl." if use_datalake else "") + self.name
+    return conn.sql(f"FROM {table_name}").pl().lazy()
+
+
+async def _run_dbview_sql_model_before(self: m.DbviewModel, conn: duckdb.DuckDBPyConnection, placeholders: dict = {}) -> None:
+    assert self.compiled_query is not None
+    local_conn = conn.cursor()
+    try:
+        self.result = local_conn.sql(self.compiled_query.query, params=placeholders).pl().lazy()
+    finally:
+        local_conn.close()
+
+
+async def _run_dag(rows: int, hops: int) -> None:
+    dbview = m.DbviewModel("dbview_model", DbviewModelConfig(connection="default"), mq.SqlQueryFile("dbview_model.sql", ""))
+    dbview.compiled_query = mq.SqlModelQuery(DBVIEW_QUERY.format(rows=rows), is_duckdb=True)
+
+    models: list[m.QueryModel] = [dbview]
+    for i in range(hops):
+        upstream = models[-1]
+        federate = m.FederateModel(f"federate_model_{i}", FederateModelConfig(), mq.SqlQueryFile(f"federate_model_{i}.sql", ""))
+        query = f"SELECT id, category, description, amount * 1.1 AS amount FROM {upstream.name} WHERE id % 10 != {i}"
+        federate.compiled_query = mq.SqlModelQuery(query, is_duckdb=True)
+        federate._add_upstream(upstream)
+        models.append(federate)
+    models[-1].is_target = True
+
+    conn = duckdb.connect()
+    for model in models:
+        await model.run_model(conn)
+
+    assert models[-1].result is not None
+    models[-1].result.collect()
+
+
+def _run_scenario(rows: int, hops: int, before: bool) -> float:
+    if before:
+        m.DataModel._load_duckdb_view_to_python_df = _load_duckdb_view_to_python_df_before # type: ignore
+        m.DbviewModel._run_sql_model = _run_dbview_sql_model_before # type: ignore
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    asyncio.run(_run_dag(rows, hops))
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024 # ru_maxrss is in KB on Linux
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the peak memory of running a multi-hop runtime DAG")
+    parser.add_argument("--rows", type=int, default=5_000_000, help="Number of rows of the dbview model")
+    parser.add_argument("--hops", type=int, default=3, help="Number of federate models after the dbview model")
+    parser.add_argument("--scenario", choices=["before", "after"], help=None)
+    args = parser.parse_args()
+
+    if args.scenario is not None:
+        print(_run_scenario(args.rows, args.hops, before=(args.scenario == "before")))
+        return
+
+    for label, scenario in [("polars between every hop", "before"), ("arrow until the target", "after")]:
+        command = [sys.executable, __file__, "--rows", str(args.rows), "--hops", str(args.hops), "--scenario", scenario]
+        peak_mb = float(subprocess.run(command, check=True, capture_output=True, text=True).stdout.strip().splitlines()[-1])
+        print(f"{label:>25}: peak RSS increase {peak_mb:.0f}MB for {args.rows} rows and {args.hops} federate hops")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,23 @@
 Base utilities and dependencies for API routes
 """
 from typing import Any, Mapping, TypeVar, Callable, Coroutine, Literal
+from dataclasses import dataclass
 from textwrap import dedent
 from fastapi import Request, Response, Depends, Header
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from fastapi.templating import Jinja2Templates
 from cachetools import TTLCache
 from pathlib import Path
 from datetime import datetime, timezone
+import asyncio, json, time
 
 from .. import _utils as u
 from .._exceptions import InvalidInputError
 from .._project import SquirrelsProject
 from .._schemas.auth_models import AbstractUser
-from .._dataset_types import DatasetResultFormat
+from .._result_cache import CacheBackend, ResultCache, DiskResultCache, get_cache_tags
+from .._dataset_types import DatasetResult, DatasetResultFormat, ResultFileFormat, RESULT_FILE_FORMAT_MEDIA_TYPES
 
 # Reusable Header dependencies to avoid duplication across routes
 XApiKeyHeader = Header(None, description="API key for authentication (alternative to Authorization header)")
@@ -22,6 +26,19 @@ XApiKeyHeader = Header(None, description="API key for authentication (alternativ
 T = TypeVar('T')
 
 
+@dataclass
+class CacheCounters:
+    """
+    Counters for the cachable actions of a route module. Coalesced requests are cache misses that awaited an identical
+    in-flight action instead of running the action again. Refreshes are runs of the action in the background for stale 
+    or soon to expire entries
+    """
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    refreshes: int = 0
+
+
 class RouteBase:
     """Base class for route modules providing common functionality"""
     
@@ -33,6 +50,8 @@ class RouteBase:
         self.manifest_cfg = project._manifest_cfg
         self.authenticator = project._auth
         self.param_cfg_set = project._param_cfg_set
+        self.cache_counters = CacheCounters()
+        self._in_flight_actions: dict[tuple, asyncio.Task] = {}
         
         # Setup templates
         template_dir = Path(__file__).parent.parent / "_package_data" / "templates"
@@ -96,14 +115,106 @@ class RouteBase:
             selections.append((u.normalize_name(key), val))
         return tuple(selections)
 
-    async def do_cachable_action(self, cache: TTLCache, action: Callable[..., Coroutine[Any, Any, T]], *args) -> T:
-        """Execute a cachable action"""
-        cache_key = tuple(args)
-        result = cache.get(cache_key)
-        if result is None:
-            result = await action(*args)
-            cache[cache_key] = result
-        return result
+    def create_result_cache(
+        self, name: str, *, max_entries: int, max_size_mb: float, ttl_minutes: float, 
+        max_stale_minutes: float = 0, refresh_ahead_minutes: float = 0, refresh_ahead_min_hits: int = 1
+    ) -> CacheBackend:
+        """Create a result cache with the backend from the environment variables, and register it for invalidation after builds"""
+        max_size_bytes = int(max_size_mb*1024*1024)
+        refresh_kwargs = {
+            "max_stale_seconds": max_stale_minutes*60, "refresh_ahead_seconds": refresh_ahead_minutes*60, 
+            "refresh_ahead_min_hits": refresh_ahead_min_hits
+        }
+        cache: CacheBackend
+        if self.env_vars.result_cache_backend == "disk":
+            cache = DiskResultCache(
+                name, max_entries, max_size_bytes, ttl_minutes*60, self.env_vars.result_cache_disk_path, 
+                file_format=self.env_vars.result_cache_disk_format, logger=self.logger, **refresh_kwargs
+            )
+        else:
+            cache = ResultCache(name, max_entries, max_size_bytes, ttl_minutes*60, logger=self.logger, **refresh_kwargs)
+        self.project._register_result_cache(cache)
+        return cache
+    
+    async def do_cachable_action(
+        self, cache: TTLCache | CacheBackend, action: Callable[..., Coroutine[Any, Any, T]], *args, 
+        cache_key: tuple | None = None, get_result_cache_key: Callable[[T], tuple] | None = None
+    ) -> T:
+        """
+        Execute a cachable action. Concurrent cache misses for the same arguments share a single run of the action.
+
+        The cache key is the arguments of the action by default. The key for storing the result can be derived from the 
+        result with "get_result_cache_key" (for instance, when the inputs that the result depends on are only known after running).
+        Concurrent runs are always coalesced on the arguments, since a cache key with fewer inputs may not hold all the inputs 
+        that an in-flight run depends on.
+
+        The action runs in its own task, so cancelling one of the waiting requests does not cancel it for the others.
+        Errors are raised to all waiting requests and are not cached. For a CacheBackend, the time the action took is used as the 
+        cost of the entry for eviction, and results without cache tags are not cached if the cache was invalidated while the 
+        action ran (since they may be computed from the VDL before a build).
+
+        For a CacheBackend, stale entries (and frequently used entries that are about to expire) are returned immediately, while
+        a single background run of the action refreshes them.
+        """
+        if cache_key is None:
+            cache_key = tuple(args)
+        in_flight_key = (id(cache), tuple(args))
+        
+        def start_action(is_refresh: bool) -> asyncio.Task[T]:
+            async def run_action_and_cache() -> T:
+                start = time.time()
+                num_invalidations = cache.num_invalidations if isinstance(cache, CacheBackend) else 0
+                result = await action(*args)
+                result_cache_key = get_result_cache_key(result) if get_result_cache_key is not None else cache_key
+                if isinstance(cache, CacheBackend):
+                    if get_cache_tags(result) is not None or cache.num_invalidations == num_invalidations:
+                        await cache.set_async(result_cache_key, result, cost=time.time()-start)
+                else:
+                    cache[result_cache_key] = result
+                return result
+            
+            def on_done(done_task: asyncio.Task) -> None:
+                self._in_flight_actions.pop(in_flight_key, None)
+                if not done_task.cancelled():
+                    error = done_task.exception() # mark as retrieved in case all waiting requests were cancelled
+                    if error is not None and is_refresh:
+                        self.logger.warning(f"Failed to refresh cached result in the background for '{action.__name__}': {error}")
+            
+            task = asyncio.create_task(run_action_and_cache())
+            task.add_done_callback(on_done)
+            self._in_flight_actions[in_flight_key] = task
+            return task
+        
+        if isinstance(cache, CacheBackend):
+            lookup = await cache.lookup_async(cache_key)
+            if lookup is not None:
+                self.cache_counters.hits += 1
+                if lookup.needs_refresh and in_flight_key not in self._in_flight_actions:
+                    self.cache_counters.refreshes += 1
+                    self.logger.info(
+                        f"Refreshing cached result in the background for '{action.__name__}'", 
+                        data={"background_refreshes": self.cache_counters.refreshes}
+                    )
+                    start_action(is_refresh=True)
+                return lookup.value
+        else:
+            result = cache.get(cache_key)
+            if result is not None:
+                self.cache_counters.hits += 1
+                return result
+        
+        task: asyncio.Task[T] | None = self._in_flight_actions.get(in_flight_key)
+        if task is None:
+            self.cache_counters.misses += 1
+            task = start_action(is_refresh=False)
+        else:
+            self.cache_counters.coalesced += 1
+            self.logger.info(
+                f"Coalesced request with an identical in-flight request for '{action.__name__}'", 
+                data={"coalesced_requests": self.cache_counters.coalesced}
+            )
+        
+        return await asyncio.shield(task)
     
     def get_name_from_path_section(self, request: Request, section: int) -> str:
         """Extract name from request path section"""
@@ -172,4 +283,67 @@ class RouteBase:
             raise InvalidInputError(400, "invalid_limit", "Limit must be non-negative")
         
         return DatasetResultFormat(orientation, offset, limit)
+    
+    @staticmethod
+    def get_result_file_format(params: Mapping[str, Any], headers: Mapping[str, str]) -> ResultFileFormat:
+        """
+        Get the file format for a dataset or query result from the "x_format" parameter if provided, or from the "Accept" header otherwise.
+
+        Args:
+            params: Query parameters
+            headers: Request headers
+
+        Returns:
+            One of "json", "arrow", "parquet", "csv", or "ndjson"
+        """
+        file_format = params.get("x_format")
+        if file_format is not None:
+            file_format = str(file_format).lower()
+            if file_format not in RESULT_FILE_FORMAT_MEDIA_TYPES:
+                raise InvalidInputError(
+                    400, "invalid_format", 
+                    f"Format must be one of {list(RESULT_FILE_FORMAT_MEDIA_TYPES)}. Invalid format provided: {file_format}"
+                )
+            return file_format # type: ignore
+        
+        accept_header = {k.lower(): v for k, v in headers.items()}.get("accept", "")
+        formats_by_media_type = {media_type: fmt for fmt, media_type in RESULT_FILE_FORMAT_MEDIA_TYPES.items()}
+        best_format, best_quality = "json", 0.0
+        for media_range in accept_header.split(","):
+            media_type, *media_params = [x.strip() for x in media_range.split(";")]
+            quality = 1.0
+            for media_param in media_params:
+                key, _, value = media_param.partition("=")
+                if key.strip() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            if media_type.lower() in formats_by_media_type and quality > best_quality:
+                best_format, best_quality = formats_by_media_type[media_type.lower()], quality
+        
+        return best_format # type: ignore
+    
+    def get_result_response(
+        self, result: DatasetResult, params: Mapping[str, Any], headers: Mapping[str, str]
+    ) -> Response:
+        """
+        Get the response for a dataset or query result in the negotiated file format. Formats other than JSON are streamed in 
+        chunks, with the schema fields and total number of rows in the "Result-Schema" and "Total-Num-Rows" headers.
+
+        The JSON response is pre-encoded (and cached by the result) instead of going through the pydantic response model.
+        """
+        result_format = self.extract_orientation_offset_and_limit(params)
+        file_format = self.get_result_file_format(params, headers)
+        if file_format == "json":
+            return Response(content=result.to_json_bytes(result_format), media_type=RESULT_FILE_FORMAT_MEDIA_TYPES["json"])
+        
+        response_headers = {
+            "Result-Schema": json.dumps({"fields": result.get_fields(result.df.columns)}),
+            "Total-Num-Rows": str(result.get_total_num_rows()),
+        }
+        return StreamingResponse(
+            result.iter_file_bytes(result_format, file_format), 
+            media_type=RESULT_FILE_FORMAT_MEDIA_TYPES[file_format], headers=response_headers
+        )
     
\ No newline at end of file
@@ -6,7 +6,6 @@ from fastapi import FastAPI, Depends, Request, Response
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.security import HTTPBearer
 from dataclasses import asdict
-from cachetools import TTLCache
 import time
 
 from .. import _constants as c, _utils as u
@@ -25,9 +24,11 @@ class DashboardRoutes(RouteBase):
         super().__init__(get_bearer_token, project, no_cache)
         
         # Setup caches
-        self.dashboard_results_cache = TTLCache(
-            maxsize=self.env_vars.dashboards_cache_size, 
-            ttl=self.env_vars.dashboards_cache_ttl_minutes*60
+        self.dashboard_results_cache = self.create_result_cache(
+            "dashboard results", 
+            max_entries=self.env_vars.dashboards_cache_size, 
+            max_size_mb=self.env_vars.dashboards_cache_max_mb, 
+            ttl_minutes=self.env_vars.dashboards_cache_ttl_minutes
         )
         
     async def _get_dashboard_results_helper(
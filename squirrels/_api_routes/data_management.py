@@ -6,7 +6,6 @@ from fastapi import FastAPI, Depends, Request, Response, status
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer
 from dataclasses import asdict
-from cachetools import TTLCache
 import time
 
 from .. import _constants as c, _utils as u
@@ -25,17 +24,22 @@ class DataManagementRoutes(RouteBase):
         super().__init__(get_bearer_token, project, no_cache)
         
         # Setup cache (same settings as dataset results cache)
-        self.query_models_cache = TTLCache(
-            maxsize=self.env_vars.datasets_cache_size, 
-            ttl=self.env_vars.datasets_cache_ttl_minutes*60
+        self.query_models_cache = self.create_result_cache(
+            "query results", 
+            max_entries=self.env_vars.datasets_cache_size, 
+            max_size_mb=self.env_vars.datasets_cache_max_mb, 
+            ttl_minutes=self.env_vars.datasets_cache_ttl_minutes
         )
         
     async def _query_models_helper(
-        self, sql_query: str, user: AbstractUser, selections: tuple[tuple[str, Any], ...], configurables: tuple[tuple[str, str], ...]
+        self, sql_query: str, user: AbstractUser, selections: tuple[tuple[str, Any], ...], configurables: tuple[tuple[str, str], ...],
+        *, offset: int = 0, limit: int | None = None
     ) -> DatasetResult:
         """Helper to query models"""
         cfg_filtered = {k: v for k, v in dict(configurables).items() if k in self.manifest_cfg.configurables}
-        return await self.project.query_models(sql_query, user=user, selections=dict(selections), configurables=cfg_filtered)
+        return await self.project.query_models(
+            sql_query, user=user, selections=dict(selections), configurables=cfg_filtered, offset=offset, limit=limit
+        )
 
     async def _query_models_cachable(
         self, sql_query: str, user: AbstractUser, selections: tuple[tuple[str, Any], ...], configurables: tuple[tuple[str, str], ...]
@@ -45,7 +49,7 @@ class DataManagementRoutes(RouteBase):
 
     async def _query_models_definition(
         self, user: AbstractUser, params: dict, *, headers: dict[str, str]
-    ) -> rm.DatasetResultModel:
+    ) -> Response:
         """Query models definition"""
         if not u.user_has_elevated_privileges(user.access_level, self.env_vars.elevated_access_level):
             raise InvalidInputError(403, "unauthorized_access_to_query_models", f"User '{user}' does not have permission to query data models")
@@ -54,14 +58,18 @@ class DataManagementRoutes(RouteBase):
         if sql_query is None:
             raise InvalidInputError(400, "sql_query_required", "SQL query must be provided")
         
-        query_models_function = self._query_models_helper if self.no_cache else self._query_models_cachable
-        uncached_keys = {"x_sql_query", "x_orientation", "x_offset", "x_limit"}
+        uncached_keys = {"x_sql_query", "x_orientation", "x_offset", "x_limit", "x_format"}
         selections = self.get_selections_as_immutable(params, uncached_keys)
         configurables = self.get_configurables_from_headers(headers)
-        result = await query_models_function(sql_query, user, selections, configurables)
-        
-        result_format = self.extract_orientation_offset_and_limit(params)
-        return rm.DatasetResultModel(**result.to_json(result_format)) 
+        if self.no_cache:
+            # Without caching, only the requested page of the result is loaded
+            result_format = self.extract_orientation_offset_and_limit(params)
+            result = await self._query_models_helper(
+                sql_query, user, selections, configurables, offset=result_format.offset, limit=result_format.limit
+            )
+        else:
+            result = await self._query_models_cachable(sql_query, user, selections, configurables)
+        return self.get_result_response(result, params, headers)
     
     async def _get_compiled_model_definition(
         self, model_name: str, user: AbstractUser, params: dict, *, headers: dict[str, str]
@@ -2,19 +2,20 @@
 Dataset routes for parameters and results
 """
 from typing import Callable, Coroutine, Any
-from fastapi import FastAPI, Depends, Request
+from fastapi import FastAPI, Depends, Request, Response
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer
 from dataclasses import asdict
-from cachetools import TTLCache
+from collections import Counter
 
-import time
+import asyncio, time
 import polars as pl
 
 from .. import _constants as c, _utils as u
 from .._schemas import response_models as rm
 from .._exceptions import ConfigurationError, InvalidInputError
 from .._dataset_types import DatasetResult
+from .._dependency_tracker import DatasetDependencies
 from .._schemas.query_param_models import get_query_models_for_parameters, get_query_models_for_dataset
 from .._schemas.auth_models import AbstractUser
 from .base import RouteBase, XApiKeyHeader
@@ -27,10 +28,22 @@ class DatasetRoutes(RouteBase):
         super().__init__(get_bearer_token, project, no_cache)
         
         # Setup caches
-        self.dataset_results_cache = TTLCache(
-            maxsize=self.env_vars.datasets_cache_size, 
-            ttl=self.env_vars.datasets_cache_ttl_minutes*60
+        self.dataset_results_cache = self.create_result_cache(
+            "dataset results", 
+            max_entries=self.env_vars.datasets_cache_size, 
+            max_size_mb=self.env_vars.datasets_cache_max_mb, 
+            ttl_minutes=self.env_vars.datasets_cache_ttl_minutes,
+            max_stale_minutes=self.env_vars.datasets_cache_max_stale_minutes,
+            refresh_ahead_minutes=self.env_vars.datasets_cache_refresh_ahead_minutes,
+            refresh_ahead_min_hits=self.env_vars.datasets_cache_refresh_ahead_min_hits
         )
+        self.dataset_dependencies: dict[str, DatasetDependencies] = {}
+        
+        # Setup cache warming at startup (by the API server) and after builds
+        self.recent_requests: Counter[tuple] = Counter()
+        self._cache_warming_task: asyncio.Task | None = None
+        if self.env_vars.datasets_cache_warming_enabled and not self.no_cache:
+            project._register_post_build_hook(self.start_cache_warming)
         
         # Setup max rows
         self.max_result_rows = self.env_vars.datasets_max_rows_output
@@ -39,42 +52,175 @@ class DatasetRoutes(RouteBase):
         self.sql_timeout_seconds = self.env_vars.datasets_sql_timeout_seconds
         
     async def _get_dataset_results_helper(
-        self, dataset: str, user: AbstractUser, selections: tuple[tuple[str, Any], ...], configurables: tuple[tuple[str, str], ...]
+        self, dataset: str, user: AbstractUser, selections: tuple[tuple[str, Any], ...], configurables: tuple[tuple[str, str], ...],
+        *, offset: int = 0, limit: int | None = None
     ) -> DatasetResult:
         """Helper to get dataset results"""
         # Only pass configurables that are defined in manifest
         cfg_filtered = {k: v for k, v in dict(configurables).items() if k in self.manifest_cfg.configurables}
-        return await self.project.dataset(dataset, user=user, selections=dict(selections), configurables=cfg_filtered)
+        return await self.project.dataset(
+            dataset, user=user, selections=dict(selections), configurables=cfg_filtered, offset=offset, limit=limit
+        )
 
     async def _get_dataset_results_cachable(
         self, dataset: str, user: AbstractUser, selections: tuple[tuple[str, Any], ...], configurables: tuple[tuple[str, str], ...]
     ) -> DatasetResult:
-        """Cachable version of dataset results helper"""
+        """
+        Cachable version of dataset results helper. The cache key only has the selections, configurables, and user fields that 
+        previous results of the dataset depended on, so requests that only differ in other inputs share the cached result.
+
+        The learned dependencies only grow after a run finishes (and start empty after a restart, while disk cache entries 
+        persist). The cache key therefore also holds the dependency set it was made from, so an entry is only found by lookups
+        with the same dependency set, which includes every input that the entry depended on.
+        """
+        def get_cache_key(dependencies: DatasetDependencies | None) -> tuple:
+            if dependencies is None:
+                return (dataset, user, selections, configurables)
+            return (dataset, *dependencies.get_cache_key(user, selections, configurables))
+        
+        def get_result_cache_key(result: DatasetResult) -> tuple:
+            if result.dependencies is None:
+                return (dataset, user, selections, configurables)
+            # Results may depend on different inputs for different selections (such as with conditional logic in models), so
+            # the key uses the inputs that any result of the dataset depended on
+            dependencies = self.dataset_dependencies.get(dataset, DatasetDependencies()) | result.dependencies
+            self.dataset_dependencies[dataset] = dependencies
+            return get_cache_key(dependencies)
+        
         return await self.do_cachable_action(
-            self.dataset_results_cache, self._get_dataset_results_helper, dataset, user, selections, configurables
+            self.dataset_results_cache, self._get_dataset_results_helper, dataset, user, selections, configurables,
+            cache_key=get_cache_key(self.dataset_dependencies.get(dataset)), get_result_cache_key=get_result_cache_key
         )
     
+    def _record_recent_request(self, request: tuple) -> None:
+        top_n = self.env_vars.datasets_cache_warming_top_n
+        if top_n <= 0:
+            return
+        self.recent_requests[request] += 1
+        if len(self.recent_requests) > max(top_n*10, 100):
+            self.recent_requests = Counter(dict(self.recent_requests.most_common(max(top_n*5, 50))))
+
+    def _get_selections_for_test_set(self, parameters: dict[str, Any]) -> tuple[tuple[str, Any], ...]:
+        # Convert the selections to the types of the API query parameters, so the cache keys match the keys of actual requests
+        param_fields = self.param_cfg_set.get_all_api_field_info()
+        selections: dict[str, Any] = {}
+        for name, value in parameters.items():
+            field_type = param_fields[name].type if name in param_fields else str
+            if field_type == list[str]:
+                selections[name] = [str(x) for x in (value if isinstance(value, (list, tuple)) else [value])]
+            elif field_type is float:
+                selections[name] = float(value)
+            else:
+                selections[name] = str(value)
+        return self.get_selections_as_immutable(selections, set())
+
+    def get_cache_warming_requests(self) -> list[tuple[str, AbstractUser, tuple[tuple[str, Any], ...], tuple[tuple[str, str], ...]]]:
+        """
+        Get the dataset requests to warm the cache with. These are the requests for every dataset accessible to the users of the
+        selection test sets in SQRL_DATASETS__CACHE_WARMING_TEST_SETS, followed by the most frequent recent requests
+        """
+        requests: dict[tuple, None] = {}
+        for test_set_name in self.env_vars.datasets_cache_warming_test_sets:
+            test_set = self.manifest_cfg.selection_test_sets.get(test_set_name)
+            if test_set is None and test_set_name == c.DEFAULT_TEST_SET_NAME:
+                test_set = self.manifest_cfg.get_default_test_set()
+            elif test_set is None:
+                self.logger.warning(f"Selection test set '{test_set_name}' for cache warming does not exist")
+                continue
+            
+            user = self.project._get_user_from_test_set(test_set)
+            selections = self._get_selections_for_test_set(test_set.parameters)
+            user_has_elevated_privileges = u.user_has_elevated_privileges(user.access_level, self.env_vars.elevated_access_level)
+            configurables = tuple(
+                (u.normalize_name(k), str(v)) for k, v in test_set.configurables.items()
+            ) if user_has_elevated_privileges else tuple()
+            
+            for dataset_name, dataset_config in self.manifest_cfg.datasets.items():
+                if self.authenticator.can_user_access_scope(user, dataset_config.scope):
+                    requests[(dataset_name, user, selections, configurables)] = None
+        
+        top_n = self.env_vars.datasets_cache_warming_top_n
+        requests.update((request, None) for request, _ in self.recent_requests.most_common(top_n))
+        return list(requests)
+
+    async def warm_cache(self) -> None:
+        """
+        Run the dataset requests from "get_cache_warming_requests" to add their results to the cache, with at most 
+        SQRL_DATASETS__CACHE_WARMING_MAX_CONCURRENCY requests at a time
+        """
+        start = time.time()
+        requests = self.get_cache_warming_requests()
+        semaphore = asyncio.Semaphore(self.env_vars.datasets_cache_warming_max_concurrency)
+        
+        async def warm(request: tuple) -> bool:
+            async with semaphore:
+                try:
+                    await self._get_dataset_results_cachable(*request)
+                    return True
+                except Exception as e:
+                    self.logger.warning(f"Failed to warm the cache for dataset '{request[0]}': {e}")
+                    return False
+        
+        results = await asyncio.gather(*[warm(request) for request in requests])
+        self.logger.info(
+            f"Warmed the dataset results cache with {sum(results)} of {len(requests)} requests", 
+            data={"num_requests": len(requests), "num_warmed": sum(results)}
+        )
+        self.logger.log_activity_time("warming dataset results cache", start)
+
+    def start_cache_warming(self) -> None:
+        """
+        Start warming the cache in the background. A warming that is still running is cancelled first
+        """
+        self.cancel_cache_warming()
+        try:
+            self._cache_warming_task = asyncio.get_running_loop().create_task(self.warm_cache())
+        except RuntimeError:
+            self.logger.warning("Skipped warming the dataset results cache since there is no running event loop")
+
+    def cancel_cache_warming(self) -> None:
+        if self._cache_warming_task is not None and not self._cache_warming_task.done():
+            self._cache_warming_task.cancel()
+        self._cache_warming_task = None
+
     async def _get_dataset_result_object(
-        self, dataset_name: str, user: AbstractUser, params: dict, headers: dict[str, str]
+        self, dataset_name: str, user: AbstractUser, params: dict, headers: dict[str, str], *, load_page_only: bool = False
     ) -> DatasetResult:
-        """Get dataset result object"""
+        """
+        Get dataset result object
+
+        When load_page_only is True and caching is disabled, only the page requested by the "x_offset" and "x_limit"
+        parameters is loaded. Callers that apply their own offset and limit to the result must leave it as False.
+        """
         # self._validate_request_params(all_request_params, params, headers)
 
-        get_dataset_function = self._get_dataset_results_helper if self.no_cache else self._get_dataset_results_cachable
-        uncached_keys = {"x_sql_query", "x_orientation", "x_offset", "x_limit"}
+        uncached_keys = {"x_sql_query", "x_orientation", "x_offset", "x_limit", "x_format"}
         selections = self.get_selections_as_immutable(params, uncached_keys)
         
         user_has_elevated_privileges = u.user_has_elevated_privileges(user.access_level, self.env_vars.elevated_access_level)
         configurables = self.get_configurables_from_headers(headers) if user_has_elevated_privileges else tuple()
-        result = await get_dataset_function(dataset_name, user, selections, configurables)
+        sql_query = params.get("x_sql_query")
+        if self.no_cache and load_page_only and not sql_query:
+            # Without caching, only the requested page of the result is loaded
+            result_format = self.extract_orientation_offset_and_limit(params)
+            result = await self._get_dataset_results_helper(
+                dataset_name, user, selections, configurables, offset=result_format.offset, limit=result_format.limit
+            )
+        elif self.no_cache:
+            result = await self._get_dataset_results_helper(dataset_name, user, selections, configurables)
+        else:
+            self._record_recent_request((dataset_name, user, selections, configurables))
+            result = await self._get_dataset_results_cachable(dataset_name, user, selections, configurables)
         
         # Apply optional final SQL transformation before select/limit/offset
-        sql_query = params.get("x_sql_query")
         if sql_query:
             try:
                 transformed = await u.run_polars_sql_on_dataframes(
-                    sql_query, {"result": result.df.lazy()}, timeout_seconds=self.sql_timeout_seconds, max_rows=self.max_result_rows+1
+                    sql_query, {"result": result.df.lazy()}, timeout_seconds=self.sql_timeout_seconds, max_rows=self.max_result_rows+1, 
+                    run_in_thread=self.project._conn_set.get_local_executor().run
                 )
+            except InvalidInputError:
+                raise
             except Exception as e:
                 raise InvalidInputError(400, "invalid_sql_query", "Failed to run provided Polars SQL on the dataset result") from e
             
@@ -94,12 +240,10 @@ class DatasetRoutes(RouteBase):
 
     async def _get_dataset_results_definition(
         self, dataset_name: str, user: AbstractUser, params: dict, headers: dict[str, str]
-    ) -> rm.DatasetResultModel:
+    ) -> Response:
         """Get dataset results definition"""
-        result = await self._get_dataset_result_object(dataset_name, user, params, headers)
-
-        result_format = self.extract_orientation_offset_and_limit(params)
-        return rm.DatasetResultModel(**result.to_json(result_format)) 
+        result = await self._get_dataset_result_object(dataset_name, user, params, headers, load_page_only=True)
+        return self.get_result_response(result, params, headers)
     
     def setup_routes(
         self, app: FastAPI, project_metadata_path: str, param_fields: dict, 
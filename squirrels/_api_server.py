@@ -58,8 +58,8 @@ class SmartCORSMiddleware(BaseHTTPMiddleware):
             # Call the next middleware/route
             response: StarletteResponse = await call_next(request)
             
-            # Always expose the Applied-Username header
-            response.headers["Access-Control-Expose-Headers"] = "Applied-Username"
+            # Always expose the Applied-Username header, and the result metadata headers of non-JSON result formats
+            response.headers["Access-Control-Expose-Headers"] = "Applied-Username, Result-Schema, Total-Num-Rows"
         
         if origin:
             scheme = u.get_scheme(request.url.hostname)
@@ -100,7 +100,11 @@ class ApiServer:
         self.param_cfg_set = project._param_cfg_set
         self.context_func = project._context_func
         self.dashboards = project._dashboards
-        
+
+        # Precompute the DAG template of every dataset at startup instead of on the first request
+        for dataset_name in self.manifest_cfg.datasets:
+            project._get_dag_template(dataset_name)
+
         # Initialize route modules
         get_bearer_token = HTTPBearer(auto_error=False)
         # self.oauth2_routes = OAuth2Routes(get_bearer_token, project, no_cache)
@@ -225,6 +229,9 @@ class ApiServer:
             """App lifespan that includes MCP server lifecycle and background tasks."""
             mcp_builder = mcp_container.get("mcp_builder")
             refresh_datasource_task = asyncio.create_task(self._refresh_datasource_params())
+            await asyncio.to_thread(self.project._duckdb_pool.warm_up)
+            if self.env_vars.datasets_cache_warming_enabled and not self.no_cache:
+                self.dataset_routes.start_cache_warming()
             
             if mcp_builder:
                 async with mcp_builder.lifespan():
@@ -233,6 +240,8 @@ class ApiServer:
                 yield
             
             refresh_datasource_task.cancel()
+            self.dataset_routes.cancel_cache_warming()
+            self.project._duckdb_pool.clear()
 
         app = FastAPI(
             title=f"Squirrels APIs for '{project_label}'", openapi_tags=tags_metadata,
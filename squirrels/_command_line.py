@@ -127,8 +127,10 @@ def main():
     compile_parser.add_argument('-r', '--runquery', action='store_true', help='Run runtime models and write CSV outputs too. Does not apply to buildtime models')
     
     build_parser = add_subparser(subparsers, c.BUILD_CMD, 'Build the Virtual Data Lake (VDL) for the project')
-    build_parser.add_argument('-f', '--full-refresh', action='store_true', help='Drop all tables before building')
-    build_parser.add_argument('-s', '--select', type=str, help="Select one static model to build. If not specified, all models are built")
+    build_parser.add_argument('-f', '--full-refresh', action='store_true', help='Drop all tables before building, and build unchanged models too')
+    build_parser.add_argument('-s', '--select', type=str, help='Comma-separated models to build, with "+" before/after a model name to include its upstream/downstream models. If not specified, all models are built')
+    build_parser.add_argument('--exclude', type=str, help='Comma-separated models to not build, with the same syntax as --select')
+    build_parser.add_argument('--threads', type=int, help="Max number of models to build concurrently. If not specified, uses the SQRL_VDL__BUILD_THREADS environment variable")
 
     duckdb_parser = add_subparser(subparsers, c.DUCKDB_CMD, 'Run the duckdb command line tool')
     duckdb_parser.add_argument('--ui', action='store_true', help='Run the duckdb local UI')
@@ -160,7 +162,7 @@ def main():
             if args.command == c.DEPS_CMD:
                 PackageLoaderIO.load_packages(project._logger, project._manifest_cfg, reload=True)
             elif args.command == c.BUILD_CMD:
-                task = project.build(full_refresh=args.full_refresh, select=args.select)
+                task = project.build(full_refresh=args.full_refresh, select=args.select, exclude=args.exclude, threads=args.threads)
                 asyncio.run(task)
                 print()
             elif args.command == c.DUCKDB_CMD:
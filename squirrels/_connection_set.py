@@ -1,11 +1,90 @@
-from typing import Any
-from dataclasses import dataclass, field
+from typing import Any, Callable, TypeVar
+from dataclasses import dataclass, field, asdict
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import Engine
-import time, polars as pl, duckdb
+import asyncio, contextvars, threading, time, polars as pl, duckdb
 
 from . import _utils as u, _constants as c, _py_module as pm
 from ._arguments.init_time_args import ConnectionsArgs
 from ._manifest import ManifestConfig, ConnectionProperties, ConnectionTypeEnum
+from ._env_vars import SquirrelsEnvVars
+from ._exceptions import InvalidInputError
+
+
+T = TypeVar('T')
+
+LOCAL_EXECUTOR_NAME = "__local__"
+
+
+@dataclass
+class ExecutorMetrics:
+    name: str
+    max_workers: int
+    max_queue_size: int
+    active: int = 0
+    queued: int = 0
+    peak_queued: int = 0
+    submitted: int = 0
+    completed: int = 0
+    rejected: int = 0
+    total_wait_ms: float = 0
+
+
+class BulkheadExecutor:
+    """
+    A size-limited thread pool for the blocking work of one connection, so a slow connection cannot exhaust the threads
+    used by other connections. Work is rejected when more than max_queue_size tasks are waiting for a thread.
+    """
+    def __init__(self, name: str, max_workers: int, max_queue_size: int) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"sqrl_{name}")
+        self._metrics = ExecutorMetrics(name=name, max_workers=max_workers, max_queue_size=max_queue_size)
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> None:
+        metrics = self._metrics
+        with self._lock:
+            is_queue_full = metrics.max_queue_size > 0 and metrics.queued >= metrics.max_queue_size
+            if metrics.active + metrics.queued >= metrics.max_workers and is_queue_full:
+                metrics.rejected += 1
+                raise InvalidInputError(
+                    503, "connection_overloaded", 
+                    f'Too many queries are waiting on connection "{metrics.name}". Please try again later.'
+                )
+            metrics.submitted += 1
+            metrics.queued += 1
+            metrics.peak_queued = max(metrics.peak_queued, metrics.queued)
+
+    def _run(self, submit_time: float, func: Callable[[], T]) -> T:
+        metrics = self._metrics
+        with self._lock:
+            metrics.queued -= 1
+            metrics.active += 1
+            metrics.total_wait_ms += (time.time() - submit_time) * 10**3
+        try:
+            return func()
+        finally:
+            with self._lock:
+                metrics.active -= 1
+                metrics.completed += 1
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Runs a blocking function in this executor, similar to asyncio.to_thread
+
+        Raises:
+            InvalidInputError: If the queue of waiting tasks is full
+        """
+        self._reserve()
+        ctx = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._run, time.time(), lambda: ctx.run(func, *args))
+
+    def get_metrics(self) -> ExecutorMetrics:
+        with self._lock:
+            return ExecutorMetrics(**asdict(self._metrics))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
 
 
 @dataclass
@@ -17,6 +96,11 @@ class ConnectionSet:
         _engines: A dictionary of connection name to the corresponding sqlalchemy engine
     """
     _connections: dict[str, ConnectionProperties | Any] = field(default_factory=dict)
+    max_workers_per_connection: int = 4
+    max_local_workers: int = 8
+    max_queue_size: int = 100
+    _executors: dict[str, BulkheadExecutor] = field(default_factory=dict, init=False, repr=False)
+    _executors_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
 
     def get_connections_as_dict(self):
         return self._connections.copy()
@@ -28,6 +112,30 @@ class ConnectionSet:
             raise u.ConfigurationError(f'Connection name "{conn_name}" was not configured') from e
         return connection
     
+    def _get_or_create_executor(self, name: str, max_workers: int) -> BulkheadExecutor:
+        with self._executors_lock:
+            if name not in self._executors:
+                self._executors[name] = BulkheadExecutor(name, max_workers, self.max_queue_size)
+            return self._executors[name]
+
+    def get_executor(self, conn_name: str) -> BulkheadExecutor:
+        """
+        Gets the executor dedicated to the blocking work on the given connection
+        """
+        self.get_connection(conn_name) # validate the connection exists
+        return self._get_or_create_executor(conn_name, self.max_workers_per_connection)
+
+    def get_local_executor(self) -> BulkheadExecutor:
+        """
+        Gets the executor for blocking work that runs locally (e.g. on DuckDB or Polars)
+        """
+        return self._get_or_create_executor(LOCAL_EXECUTOR_NAME, self.max_local_workers)
+
+    def get_executor_metrics(self) -> dict[str, ExecutorMetrics]:
+        with self._executors_lock:
+            executors = dict(self._executors)
+        return {name: executor.get_metrics() for name, executor in executors.items()}
+
     def run_sql_query_from_conn_name(self, query: str, conn_name: str, placeholders: dict = {}) -> pl.DataFrame:
         conn = self.get_connection(conn_name)
         try:
@@ -53,8 +161,13 @@ class ConnectionSet:
 
     def dispose(self) -> None:
         """
-        Disposes / closes all the connections in this ConnectionSet
+        Disposes / closes all the connections and executors in this ConnectionSet
         """
+        with self._executors_lock:
+            executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            executor.shutdown()
+
         for conn in self._connections.values():
             if isinstance(conn, Engine):
                 conn.dispose()
@@ -69,7 +182,8 @@ class ConnectionSetIO:
 
     @classmethod
     def load_from_file(
-        cls, logger: u.Logger, project_path: str, manifest_cfg: ManifestConfig, conn_args: ConnectionsArgs
+        cls, logger: u.Logger, project_path: str, manifest_cfg: ManifestConfig, conn_args: ConnectionsArgs, 
+        *, env_vars: SquirrelsEnvVars | None = None
     ) -> ConnectionSet:
         """
         Takes the DB connection engines from both the squirrels.yml and connections.py files and merges them
@@ -89,6 +203,10 @@ class ConnectionSetIO:
         pm.run_pyconfig_main(project_path, c.CONNECTIONS_FILE, {"connections": connections, "sqrl": conn_args})
 
         conn_set = ConnectionSet(connections)
+        if env_vars is not None:
+            conn_set.max_workers_per_connection = env_vars.connections_max_threads_per_connection
+            conn_set.max_local_workers = env_vars.connections_max_local_threads
+            conn_set.max_queue_size = env_vars.connections_max_queued_queries
 
         logger.log_activity_time("creating sqlalchemy engines", start)
         return conn_set
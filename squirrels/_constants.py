@@ -24,20 +24,44 @@ SQRL_PARAMETERS_DATASOURCE_REFRESH_MINUTES = 'SQRL_PARAMETERS__DATASOURCE_REFRES
 
 SQRL_DATASETS_CACHE_SIZE = 'SQRL_DATASETS__CACHE_SIZE'
 SQRL_DATASETS_CACHE_TTL_MINUTES = 'SQRL_DATASETS__CACHE_TTL_MINUTES'
+SQRL_DATASETS_CACHE_MAX_MB = 'SQRL_DATASETS__CACHE_MAX_MB'
+SQRL_DATASETS_CACHE_MAX_STALE_MINUTES = 'SQRL_DATASETS__CACHE_MAX_STALE_MINUTES'
+SQRL_DATASETS_CACHE_REFRESH_AHEAD_MINUTES = 'SQRL_DATASETS__CACHE_REFRESH_AHEAD_MINUTES'
+SQRL_DATASETS_CACHE_REFRESH_AHEAD_MIN_HITS = 'SQRL_DATASETS__CACHE_REFRESH_AHEAD_MIN_HITS'
+SQRL_DATASETS_CACHE_WARMING_ENABLED = 'SQRL_DATASETS__CACHE_WARMING_ENABLED'
+SQRL_DATASETS_CACHE_WARMING_TEST_SETS = 'SQRL_DATASETS__CACHE_WARMING_TEST_SETS'
+SQRL_DATASETS_CACHE_WARMING_TOP_N = 'SQRL_DATASETS__CACHE_WARMING_TOP_N'
+SQRL_DATASETS_CACHE_WARMING_MAX_CONCURRENCY = 'SQRL_DATASETS__CACHE_WARMING_MAX_CONCURRENCY'
 SQRL_DATASETS_MAX_ROWS_FOR_AI = 'SQRL_DATASETS__MAX_ROWS_FOR_AI'
 SQRL_DATASETS_MAX_ROWS_OUTPUT = 'SQRL_DATASETS__MAX_ROWS_OUTPUT'
 SQRL_DATASETS_SQL_TIMEOUT_SECONDS = 'SQRL_DATASETS__SQL_TIMEOUT_SECONDS'
+SQRL_DATASETS_MAX_WORKERS = 'SQRL_DATASETS__MAX_WORKERS'
 
 SQRL_DASHBOARDS_CACHE_SIZE = 'SQRL_DASHBOARDS__CACHE_SIZE'
 SQRL_DASHBOARDS_CACHE_TTL_MINUTES = 'SQRL_DASHBOARDS__CACHE_TTL_MINUTES'
+SQRL_DASHBOARDS_CACHE_MAX_MB = 'SQRL_DASHBOARDS__CACHE_MAX_MB'
+
+SQRL_RESULT_CACHE_BACKEND = 'SQRL_RESULT_CACHE__BACKEND'
+SQRL_RESULT_CACHE_DISK_PATH = 'SQRL_RESULT_CACHE__DISK_PATH'
+SQRL_RESULT_CACHE_DISK_FORMAT = 'SQRL_RESULT_CACHE__DISK_FORMAT'
 
 SQRL_SEEDS_INFER_SCHEMA = 'SQRL_SEEDS__INFER_SCHEMA'
 SQRL_SEEDS_NA_VALUES = 'SQRL_SEEDS__NA_VALUES'
+SQRL_FEDERATES_DEFAULT_EAGER = 'SQRL_FEDERATES__DEFAULT_EAGER'
+SQRL_FEDERATES_AUTO_EAGER_MAX_ROWS = 'SQRL_FEDERATES__AUTO_EAGER_MAX_ROWS'
+SQRL_FEDERATES_AUTO_EAGER_MIN_SAVED_MS = 'SQRL_FEDERATES__AUTO_EAGER_MIN_SAVED_MS'
 
 SQRL_CONNECTIONS_DEFAULT_NAME_USED = 'SQRL_CONNECTIONS__DEFAULT_NAME_USED'
+SQRL_CONNECTIONS_MAX_THREADS_PER_CONNECTION = 'SQRL_CONNECTIONS__MAX_THREADS_PER_CONNECTION'
+SQRL_CONNECTIONS_MAX_LOCAL_THREADS = 'SQRL_CONNECTIONS__MAX_LOCAL_THREADS'
+SQRL_CONNECTIONS_MAX_QUEUED_QUERIES = 'SQRL_CONNECTIONS__MAX_QUEUED_QUERIES'
 
 SQRL_VDL_CATALOG_DB_PATH = 'SQRL_VDL__CATALOG_DB_PATH'
 SQRL_VDL_DATA_PATH = 'SQRL_VDL__DATA_PATH'
+SQRL_VDL_BUILD_THREADS = 'SQRL_VDL__BUILD_THREADS'
+
+SQRL_DUCKDB_POOL_SIZE = 'SQRL_DUCKDB__POOL_SIZE'
+SQRL_DUCKDB_POOL_HEALTH_CHECK = 'SQRL_DUCKDB__POOL_HEALTH_CHECK'
 
 SQRL_STUDIO_BASE_URL = 'SQRL_STUDIO__BASE_URL'
 
@@ -96,6 +120,7 @@ COMPILE_FOLDER = 'compile'
 COMPILE_BUILDTIME_FOLDER = 'buildtime'
 COMPILE_RUNTIME_FOLDER = 'runtime'
 DB_FILE = 'auth.sqlite'
+BUILD_STATE_FILE = 'build_state.json'
 
 SEEDS_FOLDER = 'seeds'
 SEED_CATEGORY_FILE_STEM = 'seed_categories'
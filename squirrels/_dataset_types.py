@@ -1,9 +1,11 @@
-from typing import Callable, Literal
+from typing import Any, Iterator, Literal
 from dataclasses import dataclass, field
-from functools import cached_property, lru_cache
-import polars as pl
+from collections import OrderedDict
+from functools import cached_property
+import io, json, pydantic_core, polars as pl, pyarrow as pa, pyarrow.ipc as pa_ipc, pyarrow.parquet as pq
 
 from ._model_configs import ModelConfig
+from ._dependency_tracker import DatasetDependencies
 
 
 @dataclass
@@ -39,32 +41,197 @@ class DatasetResultFormat:
     limit: int | None
 
 
+ResultFileFormat = Literal["json", "arrow", "parquet", "csv", "ndjson"]
+
+RESULT_FILE_FORMAT_MEDIA_TYPES: dict[ResultFileFormat, str] = {
+    "json": "application/json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class _ChunkedOutputStream(io.RawIOBase):
+    """
+    Write-only file object that keeps the written bytes until they are drained. The position keeps counting across drains,
+    since writers like parquet record file offsets in their footer
+    """
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _is_float_or_float_list(dtype: pl.DataType) -> bool:
+    if isinstance(dtype, (pl.List, pl.Array)):
+        return _is_float_or_float_list(dtype.inner)
+    return dtype.is_float()
+
+
+def _is_natively_json_encodable(dtype: pl.DataType) -> bool:
+    """
+    Whether polars encodes the values of this type to JSON the same way as the pydantic response model. Floats (and lists 
+    of floats) are encoded natively and then reformatted by _format_floats_like_python
+    """
+    if isinstance(dtype, pl.Float32):
+        return False
+    if dtype.is_numeric() and not isinstance(dtype, pl.Decimal):
+        return True
+    if isinstance(dtype, (pl.List, pl.Array)):
+        return _is_natively_json_encodable(dtype.inner)
+    if isinstance(dtype, pl.Struct):
+        return all(_is_natively_json_encodable(fld.dtype) and not _is_float_or_float_list(fld.dtype) for fld in dtype.fields)
+    return isinstance(dtype, (pl.Boolean, pl.String, pl.Date, pl.Null))
+
+
+def _format_floats_like_python(fragments: pl.Expr) -> pl.Expr:
+    """
+    Reformat the JSON fragments of floats (or lists of floats) from polars to match Python's float repr, which always 
+    signs the exponent and pads it to two digits (1e+20, 1e-07), and uses the exponent from 1e-5 instead of 1e-6
+    """
+    return (
+        fragments
+        .str.replace_all(r"e(-?)(\d)(\D|$)", "e${1}0${2}${3}")
+        .str.replace_all(r"e(\d)", "e+${1}")
+        .str.replace_all(r"(^|[\[,])(-?)0\.0000([1-9])(\d+)", "${1}${2}${3}.${4}e-05")
+        .str.replace_all(r"(^|[\[,])(-?)0\.0000([1-9])", "${1}${2}${3}e-05")
+    )
+
+
+def _to_json_fragment(value: Any) -> str:
+    # Same encoding as the pydantic response model followed by JSONResponse
+    return json.dumps(pydantic_core.to_jsonable_python(value), ensure_ascii=False, separators=(",", ":"))
+
+
+def _get_json_value_expr(col: str, dtype: pl.DataType) -> tuple[pl.Expr, bool]:
+    """
+    Get an expression for the values of a column that polars can encode to JSON, and whether the values are already 
+    JSON fragments (for the types that polars cannot encode the same way as pydantic)
+    """
+    expr = pl.col(col)
+    if isinstance(dtype, (pl.Categorical, pl.Enum, pl.Decimal)):
+        return expr.cast(pl.String), False
+    if isinstance(dtype, (pl.Datetime, pl.Time)):
+        base_format = "%Y-%m-%dT%H:%M:%S" if isinstance(dtype, pl.Datetime) else "%H:%M:%S"
+        fraction = pl.when(expr.dt.microsecond() != 0).then(expr.dt.strftime("%.6f")).otherwise(pl.lit(""))
+        parts = [expr.dt.strftime(base_format), fraction]
+        if isinstance(dtype, pl.Datetime) and dtype.time_zone is not None:
+            parts.append(expr.dt.strftime("%:z").replace("+00:00", "Z"))
+        return pl.concat_str(parts), False
+    if isinstance(dtype, pl.Float32):
+        # The response model converted float32 values to Python floats, which keeps their float64 precision
+        return expr.cast(pl.Float64), False
+    if _is_natively_json_encodable(dtype):
+        return expr, False
+    
+    return expr.map_elements(_to_json_fragment, return_dtype=pl.String, skip_nulls=False), True
+
+
+def _get_json_fragments(df: pl.DataFrame) -> pl.DataFrame:
+    """Get a dataframe of the same shape where every value is the JSON encoding of the original value as a string"""
+    exprs = []
+    for col, dtype in df.schema.items():
+        value_expr, is_fragment = _get_json_value_expr(col, dtype)
+        if not is_fragment:
+            value_expr = pl.struct(value_expr.alias("v")).struct.json_encode().str.strip_prefix('{"v":').str.strip_suffix("}")
+            if _is_float_or_float_list(dtype):
+                value_expr = _format_floats_like_python(value_expr)
+        exprs.append(value_expr.alias(col))
+    return df.select(exprs)
+
+
+def _encode_data_as_json(df: pl.DataFrame, orientation: Literal["records", "rows", "columns"]) -> str:
+    """Encode the data field of the JSON response directly from polars, without creating Python objects per value"""
+    fragments = _get_json_fragments(df)
+    json_keys = [json.dumps(col, ensure_ascii=False) for col in df.columns]
+    
+    if orientation == "columns":
+        columns = fragments.select([pl.col(col).str.join(",") for col in df.columns]).row(0) if df.width > 0 else ()
+        return "{" + ",".join(f"{key}:[{column}]" for key, column in zip(json_keys, columns)) + "}"
+    
+    if orientation == "records":
+        parts = [pl.lit("{")]
+        for i, (key, col) in enumerate(zip(json_keys, df.columns)):
+            parts.extend([pl.lit(("," if i > 0 else "") + key + ":"), pl.col(col)])
+        parts.append(pl.lit("}"))
+    else:
+        parts = [pl.lit("[")]
+        for i, col in enumerate(df.columns):
+            parts.extend([pl.lit(","), pl.col(col)] if i > 0 else [pl.col(col)])
+        parts.append(pl.lit("]"))
+    
+    if df.height == 0:
+        return "[]"
+    rows = fragments.select(pl.concat_str(parts).str.join(",")).item()
+    return "[" + rows + "]"
+
+
+MAX_CACHED_FORMATS = 16
+
+
 @dataclass
 class DatasetResult(DatasetMetadata):
     df: pl.DataFrame
-    to_json: Callable[[DatasetResultFormat], dict] = field(init=False)
+    total_num_rows: int | None = field(default=None, repr=False) # the number of rows of the full result, if "df" only has a page of it
+    vdl_snapshot_id: int | None = field(default=None, repr=False) # the VDL snapshot that the result was computed from, if any
+    static_models: frozenset[str] = field(default_factory=frozenset, repr=False) # the sources, seeds, and build models read
+    dependencies: DatasetDependencies | None = field(default=None, repr=False) # the request inputs that the result depends on
+    _json_bytes_cache: OrderedDict[DatasetResultFormat, bytes] = field(default_factory=OrderedDict, init=False, repr=False)
 
-    def __post_init__(self):
-        self.to_json = lru_cache()(self._to_json)
+    def get_total_num_rows(self) -> int:
+        return self.total_num_rows if self.total_num_rows is not None else self.df.height
     
-    def _to_json(self, result_format: DatasetResultFormat) -> dict:
+    def estimated_size(self) -> int:
+        """
+        Get the estimated memory of the result in bytes, including the cached JSON payloads
+        """
+        return self.df.estimated_size() + sum(len(x) for x in list(self._json_bytes_cache.values()))
+    
+    def to_json_bytes(self, result_format: DatasetResultFormat) -> bytes:
+        """
+        Get the JSON payload of the result as bytes. The payloads of the most recently used result formats are cached.
+        """
+        json_bytes = self._json_bytes_cache.get(result_format)
+        if json_bytes is None:
+            json_bytes = self._to_json_bytes(result_format)
+            self._json_bytes_cache[result_format] = json_bytes
+            while len(self._json_bytes_cache) > MAX_CACHED_FORMATS:
+                self._json_bytes_cache.popitem(last=False)
+        else:
+            self._json_bytes_cache.move_to_end(result_format)
+        return json_bytes
+    
+    def _get_result_df(self, result_format: DatasetResultFormat) -> pl.DataFrame:
         df = self.df.lazy()
         if result_format.offset > 0:
             df = df.filter(pl.col("_row_num") > result_format.offset)
         if result_format.limit is not None:
             df = df.limit(result_format.limit)
-        df = df.collect()
-        
-        if result_format.orientation == "columns":
-            data = df.to_dict(as_series=False)
-        else:
-            data = df.to_dicts()
-            if result_format.orientation == "rows":
-                data = [[row[col] for col in df.columns] for row in data]
-
+        return df.collect()
+    
+    def get_fields(self, columns: list[str]) -> list[dict]:
+        """
+        Get the schema fields of the given result columns, with the details from the column configs of the target model
+        """
         column_details_by_name = {col.name: col for col in self.target_model_config.columns}
         fields = []
-        for col in df.columns:
+        for col in columns:
             if col == "_row_num":
                 fields.append({"name": "_row_num", "type": "integer", "description": "The row number of the dataset (starts at 1)", "category": "misc"})
             elif col in column_details_by_name:
@@ -77,15 +244,100 @@ class DatasetResult(DatasetMetadata):
                 })
             else:
                 fields.append({"name": col, "type": "unknown", "description": "", "category": "misc"})
+        return fields
+    
+    def to_json(self, result_format: DatasetResultFormat) -> dict: # type: ignore[override]
+        """
+        Get the JSON of the result as a dict. Unlike the payloads of to_json_bytes, these are not cached since their
+        Python objects can take much more memory than the dataframe, and would not be counted by estimated_size.
+        """
+        df = self._get_result_df(result_format)
+        
+        if result_format.orientation == "columns":
+            data = df.to_dict(as_series=False)
+        else:
+            data = df.to_dicts()
+            if result_format.orientation == "rows":
+                data = [[row[col] for col in df.columns] for row in data]
         
         return {
             "schema": {
-                "fields": fields
+                "fields": self.get_fields(df.columns)
             },
-            "total_num_rows": self.df.select(pl.len()).item(),
+            "total_num_rows": self.get_total_num_rows(),
             "data_details": {
                 "num_rows": df.select(pl.len()).item(),
                 "orientation": result_format.orientation
             },
             "data": data
         }
+    
+    def _to_json_bytes(self, result_format: DatasetResultFormat) -> bytes:
+        """
+        Same content as the JSON of to_json, but the data is encoded directly from polars instead of through Python objects
+        """
+        df = self._get_result_df(result_format)
+        metadata = {
+            "schema": {
+                "fields": self.get_fields(df.columns)
+            },
+            "total_num_rows": self.get_total_num_rows(),
+            "data_details": {
+                "num_rows": df.select(pl.len()).item(),
+                "orientation": result_format.orientation
+            }
+        }
+        metadata_json = json.dumps(metadata, ensure_ascii=False, separators=(",", ":"))
+        data_json = _encode_data_as_json(df, result_format.orientation)
+        return (metadata_json[:-1] + ',"data":' + data_json + "}").encode()
+
+    def _get_arrow_table(self, df: pl.DataFrame) -> pa.Table:
+        table = df.to_arrow()
+        fields_by_name = {field["name"]: field for field in self.get_fields(df.columns)}
+        arrow_fields = []
+        for arrow_field in table.schema:
+            field_details = fields_by_name[arrow_field.name]
+            arrow_fields.append(arrow_field.with_metadata({
+                "description": field_details["description"], "category": field_details["category"]
+            }))
+        schema_metadata = {"squirrels:schema": json.dumps({"fields": list(fields_by_name.values())})}
+        return table.cast(pa.schema(arrow_fields, metadata=schema_metadata))
+    
+    def iter_file_bytes(
+        self, result_format: DatasetResultFormat, file_format: ResultFileFormat, *, chunk_size: int = 10_000
+    ) -> Iterator[bytes]:
+        """
+        Write the result (after offset and limit) in a binary or text file format, yielding the bytes of every chunk of rows
+        as soon as it is written. The orientation of the result format only applies to JSON and is ignored here.
+
+        For Arrow and Parquet, the column configs of the target model are kept in the field and schema metadata.
+        """
+        df = self._get_result_df(result_format)
+        
+        if file_format in ("arrow", "parquet"):
+            table = self._get_arrow_table(df)
+            sink = _ChunkedOutputStream()
+            if file_format == "arrow":
+                with pa_ipc.new_stream(sink, table.schema) as writer:
+                    for batch in table.to_batches(max_chunksize=chunk_size):
+                        writer.write_batch(batch)
+                        yield sink.drain()
+            else:
+                with pq.ParquetWriter(sink, table.schema) as writer:
+                    for offset in range(0, table.num_rows, chunk_size):
+                        writer.write_table(table.slice(offset, chunk_size), row_group_size=chunk_size)
+                        yield sink.drain()
+            yield sink.drain()
+        
+        elif file_format == "csv":
+            if df.height == 0:
+                yield df.write_csv().encode()
+            for i, chunk in enumerate(df.iter_slices(chunk_size)):
+                yield chunk.write_csv(include_header=(i == 0)).encode()
+        
+        elif file_format == "ndjson":
+            for chunk in df.iter_slices(chunk_size):
+                yield chunk.write_ndjson().encode()
+        
+        else:
+            raise ValueError(f"Unsupported file format for streaming: {file_format}")
@@ -0,0 +1,178 @@
+"""
+Tracking of the parameters, configurables, and user fields that are read by context.py and the models of a dataset
+"""
+from typing import Any, Hashable, Iterable, TypeVar, cast
+from dataclasses import dataclass, field
+from pydantic import BaseModel
+import json
+
+from . import _utils as u
+from ._schemas.auth_models import AbstractUser
+
+U = TypeVar("U", bound=AbstractUser)
+
+
+@dataclass(frozen=True)
+class DatasetDependencies:
+    """
+    The inputs of a request that a dataset result depends on
+
+    Attributes:
+        parameters: The names of the parameters whose selections affect the result
+        configurables: The names of the configurables that were read
+        user_fields: The paths of the user fields that were read (such as "custom_fields.role"). The path "" means the entire user
+    """
+    parameters: frozenset[str] = frozenset()
+    configurables: frozenset[str] = frozenset()
+    user_fields: frozenset[str] = frozenset()
+
+    def __or__(self, other: "DatasetDependencies") -> "DatasetDependencies":
+        return DatasetDependencies(
+            self.parameters | other.parameters, self.configurables | other.configurables, self.user_fields | other.user_fields
+        )
+
+    def get_cache_key(
+        self, user: AbstractUser, selections: Iterable[tuple[str, Any]], configurables: Iterable[tuple[str, str]]
+    ) -> tuple:
+        """
+        Get the part of a cache key for the request inputs that the result depends on. Requests that only differ in other
+        inputs get the same key.
+
+        The key starts with the names of the inputs in this dependency set, so keys from different dependency sets never
+        match. Otherwise, a request with a selection for a parameter outside of a smaller set would match an entry that 
+        depended on the default value of that parameter.
+        """
+        names = (tuple(sorted(self.parameters)), tuple(sorted(self.configurables)), tuple(sorted(self.user_fields)))
+        parameters = {u.normalize_name(x) for x in self.parameters}
+        selections_used = tuple((key, val) for key, val in selections if key in parameters)
+        configurables_used = tuple((key, val) for key, val in configurables if key in self.configurables)
+        if "" in self.user_fields:
+            user_fields_used = (("", user),)
+        else:
+            user_fields_used = tuple((path, _get_user_field(user, path)) for path in sorted(self.user_fields))
+        return (names, user_fields_used, selections_used, configurables_used)
+
+
+def _get_user_field(user: AbstractUser, path: str) -> Hashable:
+    value: Any = user
+    for attribute in path.split("."):
+        value = getattr(value, attribute, None)
+    if isinstance(value, BaseModel):
+        return value.model_dump_json()
+    if not isinstance(value, Hashable):
+        return json.dumps(value, default=str, sort_keys=True)
+    return value
+
+
+class _TrackedDict(dict):
+    """
+    A dict that records the keys that are read. Iterating over the dict counts as reading all keys
+    """
+    def __init__(self, data: dict, keys_read: set[str]) -> None:
+        super().__init__(data)
+        self._keys_read = keys_read
+
+    def _read_all(self) -> None:
+        self._keys_read.update(dict.keys(self))
+
+    def __getitem__(self, key: Any) -> Any:
+        self._keys_read.add(key)
+        return super().__getitem__(key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        self._keys_read.add(key)
+        return super().get(key, default)
+
+    def __contains__(self, key: Any) -> bool:
+        self._keys_read.add(key)
+        return super().__contains__(key)
+
+    def __iter__(self):
+        self._read_all()
+        return super().__iter__()
+
+    def keys(self):
+        self._read_all()
+        return super().keys()
+
+    def values(self):
+        self._read_all()
+        return super().values()
+
+    def items(self):
+        self._read_all()
+        return super().items()
+
+    def copy(self) -> "_TrackedDict":
+        return _TrackedDict(dict(dict.items(self)), self._keys_read)
+
+
+class _TrackedModel:
+    """
+    A read-only proxy of a pydantic model that records the paths of the fields that are read. Reading anything other than a
+    field (such as calling a method) counts as reading the entire model
+    """
+    def __init__(self, model: BaseModel, fields_read: set[str], path: str = "") -> None:
+        object.__setattr__(self, "_model", model)
+        object.__setattr__(self, "_fields_read", fields_read)
+        object.__setattr__(self, "_path", path)
+
+    @property
+    def __class__(self): # type: ignore
+        # Keeps isinstance checks (such as for RegisteredUser) working for the proxy
+        return type(object.__getattribute__(self, "_model"))
+
+    def _read_all(self) -> BaseModel:
+        self._fields_read.add(self._path)
+        return self._model
+
+    def __getattr__(self, name: str) -> Any:
+        model: BaseModel = self._model
+        value = getattr(model, name)
+        if name not in type(model).model_fields and name not in (model.model_extra or {}):
+            self._read_all()
+            return value
+
+        path = f"{self._path}.{name}" if self._path else name
+        if isinstance(value, BaseModel):
+            return _TrackedModel(value, self._fields_read, path)
+        self._fields_read.add(path)
+        return value
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"Cannot set attribute '{name}' of a read-only model")
+
+    def __str__(self) -> str:
+        return str(self._read_all())
+
+    def __repr__(self) -> str:
+        return repr(self._read_all())
+
+    def __eq__(self, other: Any) -> bool:
+        return self._read_all() == other
+
+    def __hash__(self) -> int:
+        return hash(self._read_all())
+
+
+@dataclass
+class DependencyTracker:
+    """
+    Records the parameters, configurables, and user fields that are read by context.py and the models of a dataset.
+
+    Reads are recorded through the tracked versions of the "prms" and "configurables" dicts and the "user" object, which are
+    provided in place of the originals when compiling and running the models. The values in "ctx" are derived from these in
+    context.py, so reading "ctx" does not need to be tracked separately.
+    """
+    parameters_read: set[str] = field(default_factory=set)
+    configurables_read: set[str] = field(default_factory=set)
+    user_fields_read: set[str] = field(default_factory=set)
+
+    def track_parameters(self, prms: dict[str, Any]) -> dict[str, Any]:
+        return _TrackedDict(prms, self.parameters_read)
+
+    def track_configurables(self, configurables: dict[str, str]) -> dict[str, str]:
+        return _TrackedDict(configurables, self.configurables_read)
+
+    def track_user(self, user: U) -> U:
+        return cast(U, _TrackedModel(user, self.user_fields_read))
@@ -0,0 +1,201 @@
+from typing import Iterator
+from dataclasses import dataclass, field
+from contextlib import contextmanager
+import threading, time, duckdb
+
+from . import _utils as u
+from ._connection_set import ConnectionSet
+from ._manifest import ConnectionProperties
+
+
+@dataclass
+class DuckDBConnectionPool:
+    """
+    A pool of pre-initialized DuckDB connections for running data models at runtime.
+
+    Pooled connections already ran the duckdb init file and attached the external databases, so a request does not redo
+    this work. Each connection is checked out by one request at a time, and the tables and views created by the request
+    are dropped when the connection is released. Objects created by the duckdb init file are kept.
+
+    The Virtual Data Lake (VDL) is attached when a connection is checked out and detached when it is released. Idle
+    connections therefore do not hold the VDL catalog, and a DuckDB catalog file can still be written by another process
+    (such as "sqrl build") while the server is idle.
+
+    Attributes:
+        datalake_db_path: The path to the VDL catalog database, attached as 'vdl' (READ_ONLY)
+        conn_set: The connection set with the external databases to attach as 'db_{conn_name}'
+        pool_size: The maximum number of idle connections to keep. Requests beyond this get a connection that is closed after use
+        health_check: Whether to validate an idle connection with a trivial query before handing it out
+    """
+    datalake_db_path: str | None
+    conn_set: ConnectionSet
+    pool_size: int = 4
+    health_check: bool = True
+    logger: u.Logger = field(default_factory=lambda: u.Logger(""))
+    _idle_connections: list[duckdb.DuckDBPyConnection] = field(default_factory=list, init=False)
+    _init_objects: dict[int, set[tuple[str, str]]] = field(default_factory=dict, init=False)
+    _generation: int = field(default=0, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def _attach_connections_with_type_duckdb(self, conn: duckdb.DuckDBPyConnection) -> None:
+        for conn_name, connection in self.conn_set.get_connections_as_dict().items():
+            if not isinstance(connection, ConnectionProperties):
+                continue
+            attach_uri = connection.attach_uri_for_duckdb
+            if attach_uri is None:
+                continue
+            attach_stmt = f"ATTACH IF NOT EXISTS '{attach_uri}' AS db_{conn_name} (READ_ONLY)"
+            u.run_duckdb_stmt(self.logger, conn, attach_stmt, redacted_values=[attach_uri])
+
+    def _get_main_objects(self, conn: duckdb.DuckDBPyConnection) -> list[tuple[str, str]]:
+        # Data models use cursors, which default to the in-memory database (unlike the connection itself, which uses the
+        # VDL while checked out)
+        cursor = conn.cursor()
+        query = (
+            "SELECT 'VIEW', view_name FROM duckdb_views() "
+            "WHERE database_name = current_database() AND schema_name = 'main' AND NOT internal "
+            "UNION ALL "
+            "SELECT 'TABLE', table_name FROM duckdb_tables() "
+            "WHERE database_name = current_database() AND schema_name = 'main' "
+            "ORDER BY 1 DESC"
+        )
+        try:
+            return cursor.execute(query).fetchall()
+        finally:
+            cursor.close()
+
+    def _create_connection(self) -> duckdb.DuckDBPyConnection:
+        start = time.time()
+        conn = u.create_duckdb_connection()
+        try:
+            self._attach_connections_with_type_duckdb(conn)
+            self._init_objects[id(conn)] = set(self._get_main_objects(conn))
+        except Exception:
+            conn.close()
+            raise
+        self.logger.log_activity_time("creating duckdb connection", start)
+        return conn
+
+    def _close_connection(self, conn: duckdb.DuckDBPyConnection) -> None:
+        self._init_objects.pop(id(conn), None)
+        conn.close()
+
+    def _attach_vdl(self, conn: duckdb.DuckDBPyConnection) -> None:
+        if self.datalake_db_path:
+            try:
+                conn.execute(f"ATTACH '{self.datalake_db_path}' AS vdl (READ_ONLY); USE vdl;")
+            except Exception as e:
+                raise u.ConfigurationError(f"Failed to attach Virtual Data Lake (VDL): {str(e)}") from e
+
+    def _detach_vdl(self, conn: duckdb.DuckDBPyConnection) -> None:
+        if self.datalake_db_path:
+            conn.execute("USE memory; DETACH DATABASE IF EXISTS vdl;")
+
+    def _is_healthy(self, conn: duckdb.DuckDBPyConnection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchall()
+            return True
+        except Exception:
+            return False
+
+    def _reset_connection(self, conn: duckdb.DuckDBPyConnection) -> None:
+        # Drop the tables and views created by the data models of the request, but not the ones created by the init file
+        init_objects = self._init_objects.get(id(conn), set())
+        cursor = conn.cursor()
+        try:
+            for object_type, object_name in self._get_main_objects(conn):
+                if (object_type, object_name) in init_objects:
+                    continue
+                escaped_name = object_name.replace('"', '""')
+                cursor.execute(f'DROP {object_type} IF EXISTS "{escaped_name}"')
+        finally:
+            cursor.close()
+        self._detach_vdl(conn)
+
+    def _acquire(self) -> tuple[duckdb.DuckDBPyConnection, int]:
+        while True:
+            with self._lock:
+                generation = self._generation
+                conn = self._idle_connections.pop() if self._idle_connections else None
+
+            if conn is None:
+                conn = self._create_connection()
+            elif self.health_check and not self._is_healthy(conn):
+                self.logger.warning("Discarding unhealthy pooled duckdb connection")
+                self._close_connection(conn)
+                continue
+
+            try:
+                self._attach_vdl(conn)
+            except Exception:
+                self._close_connection(conn)
+                raise
+            return conn, generation
+
+    def _can_return_to_pool(self, generation: int) -> bool:
+        return generation == self._generation and len(self._idle_connections) < self.pool_size
+
+    def _release(self, conn: duckdb.DuckDBPyConnection, generation: int) -> None:
+        with self._lock:
+            can_return_to_pool = self._can_return_to_pool(generation)
+        
+        if can_return_to_pool:
+            try:
+                self._reset_connection(conn)
+            except Exception as e:
+                self.logger.warning(f"Discarding pooled duckdb connection that failed to reset: {e}")
+                self._close_connection(conn)
+                return
+
+            with self._lock:
+                if self._can_return_to_pool(generation):
+                    self._idle_connections.append(conn)
+                    return
+
+        self._close_connection(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """
+        Checks out a pre-initialized DuckDB connection for the duration of the context.
+
+        Yields:
+            A DuckDB connection that is used exclusively by the caller until the context exits
+        """
+        conn, generation = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn, generation)
+
+    def warm_up(self) -> None:
+        """
+        Creates connections until the pool holds pool_size idle connections
+        """
+        start = time.time()
+        with self._lock:
+            num_to_create = self.pool_size - len(self._idle_connections)
+            generation = self._generation
+
+        new_connections = [self._create_connection() for _ in range(num_to_create)]
+        with self._lock:
+            if generation == self._generation:
+                self._idle_connections.extend(new_connections)
+                new_connections = []
+
+        for conn in new_connections:
+            self._close_connection(conn)
+        self.logger.log_activity_time("warming up duckdb connection pool", start)
+
+    def clear(self) -> None:
+        """
+        Closes all idle connections. Connections checked out at this time are closed when released instead of being returned to the pool.
+
+        Used when the VDL is rebuilt, since existing attachments may not see the new data.
+        """
+        with self._lock:
+            self._generation += 1
+            idle_connections, self._idle_connections = self._idle_connections, []
+
+        for conn in idle_connections:
+            self._close_connection(conn)
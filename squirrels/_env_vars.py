@@ -1,7 +1,7 @@
 from typing import Any, Literal, Optional
 from typing_extensions import Self
 from pathlib import Path
-from pydantic import BaseModel, Field, field_validator, model_validator, ConfigDict
+from pydantic import BaseModel, Field, ValidationInfo, field_validator, model_validator, ConfigDict
 import json
 
 from . import _constants as c
@@ -68,6 +68,38 @@ class SquirrelsEnvVars(BaseModel):
         60, gt=0, alias=c.SQRL_DATASETS_CACHE_TTL_MINUTES, 
         description="Cache TTL for dataset results in minutes"
     )
+    datasets_cache_max_mb: float = Field(
+        1024, ge=0, alias=c.SQRL_DATASETS_CACHE_MAX_MB, 
+        description="Max estimated memory of the dataset results cache in megabytes"
+    )
+    datasets_cache_max_stale_minutes: float = Field(
+        0, ge=0, alias=c.SQRL_DATASETS_CACHE_MAX_STALE_MINUTES, 
+        description="How long expired dataset results can be served while they are refreshed in the background in minutes"
+    )
+    datasets_cache_refresh_ahead_minutes: float = Field(
+        0, ge=0, alias=c.SQRL_DATASETS_CACHE_REFRESH_AHEAD_MINUTES, 
+        description="How long before expiring that frequently used dataset results are refreshed in the background in minutes"
+    )
+    datasets_cache_refresh_ahead_min_hits: int = Field(
+        3, ge=1, alias=c.SQRL_DATASETS_CACHE_REFRESH_AHEAD_MIN_HITS, 
+        description="Minimum number of cache hits for a dataset result to be refreshed ahead of expiring"
+    )
+    datasets_cache_warming_enabled: bool = Field(
+        False, alias=c.SQRL_DATASETS_CACHE_WARMING_ENABLED, 
+        description="Whether to warm the dataset results cache at startup and after builds"
+    )
+    datasets_cache_warming_test_sets: list[str] = Field(
+        [c.DEFAULT_TEST_SET_NAME], alias=c.SQRL_DATASETS_CACHE_WARMING_TEST_SETS, 
+        description="List of selection test sets to warm the dataset results cache with"
+    )
+    datasets_cache_warming_top_n: int = Field(
+        0, ge=0, alias=c.SQRL_DATASETS_CACHE_WARMING_TOP_N, 
+        description="Number of the most frequent recent dataset requests to warm the dataset results cache with"
+    )
+    datasets_cache_warming_max_concurrency: int = Field(
+        2, ge=1, alias=c.SQRL_DATASETS_CACHE_WARMING_MAX_CONCURRENCY, 
+        description="Max number of datasets to run at a time when warming the dataset results cache"
+    )
     datasets_max_rows_for_ai: int = Field(
         100, ge=0, alias=c.SQRL_DATASETS_MAX_ROWS_FOR_AI, 
         description="Max rows for AI queries"
@@ -80,6 +112,10 @@ class SquirrelsEnvVars(BaseModel):
         2.0, gt=0, alias=c.SQRL_DATASETS_SQL_TIMEOUT_SECONDS, 
         description="Timeout for SQL operations in seconds"
     )
+    datasets_max_workers: int = Field(
+        8, ge=1, alias=c.SQRL_DATASETS_MAX_WORKERS, 
+        description="Max number of data models to run concurrently for a single request"
+    )
 
     # Dashboards Cache
     dashboards_cache_size: int = Field(
@@ -90,6 +126,24 @@ class SquirrelsEnvVars(BaseModel):
         60, gt=0, alias=c.SQRL_DASHBOARDS_CACHE_TTL_MINUTES, 
         description="Cache TTL for dashboards in minutes"
     )
+    dashboards_cache_max_mb: float = Field(
+        256, ge=0, alias=c.SQRL_DASHBOARDS_CACHE_MAX_MB, 
+        description="Max estimated memory of the dashboards cache in megabytes"
+    )
+
+    # Result cache backend
+    result_cache_backend: Literal["memory", "disk"] = Field(
+        "memory", alias=c.SQRL_RESULT_CACHE_BACKEND, 
+        description="Backend for the dataset, query and dashboard results caches"
+    )
+    result_cache_disk_path: str = Field(
+        "{project_path}/target/result_cache/", alias=c.SQRL_RESULT_CACHE_DISK_PATH, 
+        description="Path to the folder of the disk result cache"
+    )
+    result_cache_disk_format: Literal["arrow", "parquet"] = Field(
+        "arrow", alias=c.SQRL_RESULT_CACHE_DISK_FORMAT, 
+        description="File format for dataset results in the disk result cache"
+    )
     
     # Seeds
     seeds_infer_schema: bool = Field(
@@ -101,11 +155,37 @@ class SquirrelsEnvVars(BaseModel):
         description="List of N/A values for seeds"
     )
 
+    # Federates
+    federates_default_eager: bool | Literal["auto"] = Field(
+        False, alias=c.SQRL_FEDERATES_DEFAULT_EAGER, 
+        description="Default of the eager setting for federate models, either true, false, or 'auto'"
+    )
+    federates_auto_eager_max_rows: int = Field(
+        1_000_000, ge=0, alias=c.SQRL_FEDERATES_AUTO_EAGER_MAX_ROWS, 
+        description="Max number of rows (from past runs) to always materialize for federate models with eager set to 'auto'"
+    )
+    federates_auto_eager_min_saved_ms: float = Field(
+        100, ge=0, alias=c.SQRL_FEDERATES_AUTO_EAGER_MIN_SAVED_MS, 
+        description="Min recomputation time saved in milliseconds to materialize larger results for federate models with eager set to 'auto'"
+    )
+
     # Connections
     connections_default_name_used: str = Field(
         "default", alias=c.SQRL_CONNECTIONS_DEFAULT_NAME_USED, 
         description="Default connection name to use"
     )
+    connections_max_threads_per_connection: int = Field(
+        4, ge=1, alias=c.SQRL_CONNECTIONS_MAX_THREADS_PER_CONNECTION, 
+        description="Max number of threads for running queries on each connection"
+    )
+    connections_max_local_threads: int = Field(
+        8, ge=1, alias=c.SQRL_CONNECTIONS_MAX_LOCAL_THREADS, 
+        description="Max number of threads for running local DuckDB and Polars work"
+    )
+    connections_max_queued_queries: int = Field(
+        100, ge=0, alias=c.SQRL_CONNECTIONS_MAX_QUEUED_QUERIES, 
+        description="Max number of queries waiting for a thread on each connection before new ones are rejected. Zero means no limit"
+    )
 
     # VDL
     vdl_catalog_db_path: str = Field(
@@ -116,6 +196,20 @@ class SquirrelsEnvVars(BaseModel):
         "{project_path}/target/vdl_data/", alias=c.SQRL_VDL_DATA_PATH, 
         description="Path to the VDL data directory"
     )
+    vdl_build_threads: int = Field(
+        4, ge=1, alias=c.SQRL_VDL_BUILD_THREADS, 
+        description="Max number of static models to build concurrently"
+    )
+
+    # DuckDB connection pool
+    duckdb_pool_size: int = Field(
+        4, ge=0, alias=c.SQRL_DUCKDB_POOL_SIZE, 
+        description="Max number of idle pre-initialized DuckDB connections kept for running data models"
+    )
+    duckdb_pool_health_check: bool = Field(
+        True, alias=c.SQRL_DUCKDB_POOL_HEALTH_CHECK, 
+        description="Whether to validate a pooled DuckDB connection before using it"
+    )
 
     # Studio
     studio_base_url: str = Field(
@@ -167,31 +261,42 @@ class SquirrelsEnvVars(BaseModel):
             return res or ["https://squirrels-analytics.github.io"]
         return v
 
-    @field_validator("seeds_na_values", mode="before")
+    @field_validator("seeds_na_values", "datasets_cache_warming_test_sets", mode="before")
     @classmethod
-    def parse_json_list(cls, v: Any) -> list[str]:
+    def parse_json_list(cls, v: Any, info: ValidationInfo) -> list[str]:
         if isinstance(v, str):
             try:
                 parsed = json.loads(v)
                 if not isinstance(parsed, list):
-                    raise ValueError(f"The {c.SQRL_SEEDS_NA_VALUES} environment variable must be a JSON list")
+                    env_var_name = cls.model_fields[info.field_name].alias if info.field_name else None
+                    raise ValueError(f"The {env_var_name} environment variable must be a JSON list")
                 return parsed
             except json.JSONDecodeError:
                 return []
         return v
     
-    @field_validator("logging_log_to_file", "seeds_infer_schema", mode="before")
+    @field_validator(
+        "logging_log_to_file", "seeds_infer_schema", "duckdb_pool_health_check", "datasets_cache_warming_enabled", mode="before"
+    )
     @classmethod
     def parse_bool(cls, v: Any) -> bool:
         if isinstance(v, str):
             return v.lower() in ("true", "t", "1", "yes", "y", "on")
         return bool(v)
 
+    @field_validator("federates_default_eager", mode="before")
+    @classmethod
+    def parse_bool_or_auto(cls, v: Any) -> bool | str:
+        if isinstance(v, str):
+            return "auto" if v.lower() == "auto" else v.lower() in ("true", "t", "1", "yes", "y", "on")
+        return bool(v)
+
     @model_validator(mode="after")
     def format_paths_with_filepath(self) -> Self:
         """Format paths containing {filepath} placeholder with the actual filepath value."""
         self.auth_db_file_path = self.auth_db_file_path.format(project_path=self.project_path)
         self.vdl_catalog_db_path = self.vdl_catalog_db_path.format(project_path=self.project_path)
         self.vdl_data_path = self.vdl_data_path.format(project_path=self.project_path)
+        self.result_cache_disk_path = self.result_cache_disk_path.format(project_path=self.project_path)
         return self
     
\ No newline at end of file
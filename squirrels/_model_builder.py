@@ -1,9 +1,38 @@
+from __future__ import annotations
 from dataclasses import dataclass, field
-import duckdb, time
+from pathlib import Path
+import asyncio, duckdb, json, time, typing as t, uuid
 
 from . import _utils as u, _connection_set as cs, _models as m
 
 
+@dataclass
+class BuildState:
+    """
+    The fingerprints of the static models from their last successful builds, and the versions of their tables in the VDL.
+    A model is unchanged if its fingerprint (from its config, content, and the versions of its upstream models) is the same
+    """
+    vdl_catalog_db_path: str
+    fingerprints: dict[str, str] = field(default_factory=dict)
+    versions: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, filepath: str | None, vdl_catalog_db_path: str) -> BuildState:
+        try:
+            data = json.loads(Path(filepath).read_text()) if filepath is not None else {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        
+        # The state of a different VDL does not apply
+        if data.get("vdl_catalog_db_path") != vdl_catalog_db_path:
+            return cls(vdl_catalog_db_path)
+        return cls(vdl_catalog_db_path, data.get("fingerprints", {}), data.get("versions", {}))
+    
+    def save(self, filepath: str) -> None:
+        data = {"vdl_catalog_db_path": self.vdl_catalog_db_path, "fingerprints": self.fingerprints, "versions": self.versions}
+        Path(filepath).write_text(json.dumps(data, indent=2, sort_keys=True))
+
+
 @dataclass
 class ModelBuilder:
     _datalake_db_path: str
@@ -11,6 +40,8 @@ class ModelBuilder:
     _static_models: dict[str, m.StaticModel]
     _conn_args: cs.ConnectionsArgs
     _logger: u.Logger = field(default_factory=lambda: u.Logger(""))
+    _threads: int = field(default=4)
+    _build_state_path: str | None = field(default=None) # if None, all models are built
     
     def _attach_connections(self, duckdb_conn: duckdb.DuckDBPyConnection) -> None:
         for conn_name, conn_props in self._conn_set.get_connections_as_dict().items():
@@ -22,35 +53,186 @@ class ModelBuilder:
             attach_stmt = f"ATTACH IF NOT EXISTS '{attach_uri}' AS db_{conn_name} (READ_ONLY)"
             u.run_duckdb_stmt(self._logger, duckdb_conn, attach_stmt, redacted_values=[attach_uri])
 
-    async def _build_models(self, duckdb_conn: duckdb.DuckDBPyConnection, select: str | None, full_refresh: bool) -> None:
+    def _get_existing_tables(self, duckdb_conn: duckdb.DuckDBPyConnection, *, include_views: bool = False) -> set[str]:
+        query = (
+            "SELECT table_name FROM information_schema.tables "
+            "WHERE table_catalog = current_database() AND table_schema = current_schema()"
+        )
+        if not include_views:
+            query += " AND table_type = 'BASE TABLE'"
+        return {name for (name,) in duckdb_conn.sql(query).fetchall()}
+
+    def _get_table_version(self, duckdb_conn: duckdb.DuckDBPyConnection, model_name: str) -> str | None:
+        """
+        Get a version of the table of a model that changes whenever its data changes. Only available for DuckLake tables
+        """
+        if not self._datalake_db_path.startswith("ducklake:"):
+            return None
+        
+        query = (
+            "SELECT table_uuid, file_count, file_size_bytes, delete_file_count, delete_file_size_bytes "
+            "FROM ducklake_table_info(current_database()) WHERE table_name = $model_name"
+        )
+        local_conn = duckdb_conn.cursor()
+        try:
+            row = local_conn.execute(query, {"model_name": model_name}).fetchone()
+        finally:
+            local_conn.close()
+        return ":".join(str(x) for x in row) if row is not None else None
+
+    def _get_fingerprint(self, model: m.StaticModel, versions: dict[str, str]) -> str | None:
+        """
+        Get the fingerprint of a model from its config, content, and the versions of its upstream models. None means that 
+        the model must always be built (such as for sources and Python build models, since the data in external databases may have changed)
+        """
+        content_hash = model.get_build_content_hash()
+        upstream_versions = {name: versions.get(name) for name in sorted(model.upstreams_for_build)}
+        if content_hash is None or None in upstream_versions.values():
+            return None
+        
+        default = lambda x: sorted(x) if isinstance(x, (set, frozenset)) else str(x)
+        config = json.dumps(model.model_config.model_dump(), sort_keys=True, default=default)
+        fingerprint_input = json.dumps([model.model_type.value, config, content_hash, upstream_versions])
+        return u.hash_string(fingerprint_input, "")
+
+    async def _build_model_if_changed(
+        self, model: m.StaticModel, duckdb_conn: duckdb.DuckDBPyConnection, full_refresh: bool, state: BuildState, 
+        existing_tables: set[str]
+    ) -> bool:
+        fingerprint = self._get_fingerprint(model, state.versions)
+        is_unchanged = fingerprint is not None and state.fingerprints.get(model.name) == fingerprint
+        if is_unchanged and not full_refresh and model.name in existing_tables:
+            print(f"[{u.get_current_time()}] ⏭️  UNCHANGED: {model.model_type.value} model '{model.name}'")
+            return False
+        
+        state.fingerprints.pop(model.name, None) # in case the build fails
+        await model.build_model(duckdb_conn, full_refresh)
+        
+        table_version = await asyncio.to_thread(self._get_table_version, duckdb_conn, model.name)
+        state.versions[model.name] = table_version or fingerprint or uuid.uuid4().hex
+        if fingerprint is not None:
+            state.fingerprints[model.name] = fingerprint
+        return True
+
+    def _get_selected_models(self, selectors: str) -> set[str]:
+        """
+        Get the names of the models matched by comma-separated graph selectors. A selector is a model name, optionally with 
+        "+" before it to include all its upstream models, and/or "+" after it to include all its downstream models
+        """
+        def get_connected_models(model_name: str, get_neighbours: t.Callable[[m.StaticModel], t.Iterable[str]]) -> set[str]:
+            connected, stack = set(), [model_name]
+            while stack:
+                for name in get_neighbours(self._static_models[stack.pop()]):
+                    if name not in connected:
+                        connected.add(name)
+                        stack.append(name)
+            return connected
+        
+        selected = set()
+        for selector in selectors.split(","):
+            selector = selector.strip()
+            model_name = u.normalize_name(selector.strip("+"))
+            if model_name not in self._static_models:
+                raise u.ConfigurationError(f'No static model found for selector "{selector}"')
+            
+            selected.add(model_name)
+            if selector.startswith("+"):
+                selected.update(get_connected_models(model_name, lambda model: model.upstreams_for_build))
+            if selector.endswith("+"):
+                selected.update(get_connected_models(model_name, lambda model: model.downstreams_for_build))
+        return selected
+
+    async def _build_models(
+        self, duckdb_conn: duckdb.DuckDBPyConnection, select: str | None, full_refresh: bool, exclude: str | None = None
+    ) -> None:
         """
         Compile and construct the build models as DuckDB tables.
+
+        Each model is built as soon as all its upstream models are built, with at most "_threads" models building at a time. 
+        Models are built on their own DuckDB cursors in worker threads. If a model fails, the models that depend on it are 
+        skipped while the other models continue to build, and the first error is raised once the build is done.
+
+        Unless doing a full refresh, models that are unchanged since their last build (based on the build state file) are 
+        not built again.
+
+        The "select" and "exclude" arguments are comma-separated graph selectors (see "_get_selected_models"). Only the 
+        selected models that are not excluded are built, and all models are selected if "select" is None.
         """
-        # Compile the build models
-        models_list = self._static_models.values() if select is None else [self._static_models[select]]
+        # Compile all the build models, since the upstreams and downstreams of the selected models are only known after 
+        # compiling. Incremental models update their existing tables unless doing a full refresh
+        models_list = self._static_models.values()
+        existing_tables = self._get_existing_tables(duckdb_conn, include_views=True) if not full_refresh else set()
+        existing_base_tables = self._get_existing_tables(duckdb_conn) if not full_refresh else set()
         for model in models_list:
+            if isinstance(model, m.BuildModel) and model.model_config.is_incremental:
+                model.is_incremental_run = model.name in existing_base_tables
             model.compile_for_build(self._conn_args, self._static_models)
 
-        # Find all terminal nodes
-        terminal_nodes = set()
-        if select is None:
-            for model in models_list:
-                terminal_nodes.update(model.get_terminal_nodes_for_build(set()))
-            for model in models_list:
-                model.confirmed_no_cycles = False
-        else:
-            terminal_nodes.add(select)
-
-        # Run the build models
-        coroutines = []
-        for model_name in terminal_nodes:
-            model = self._static_models[model_name]
-            # await model.build_model(duckdb_conn, full_refresh)
-            coro = model.build_model(duckdb_conn, full_refresh)
-            coroutines.append(coro)
-        await u.asyncio_gather(coroutines)
-
-    async def build(self, full_refresh: bool, select: str | None) -> None:
+        # Validate that there are no cycles
+        for model in models_list:
+            model.get_terminal_nodes_for_build(set())
+        for model in models_list:
+            model.confirmed_no_cycles = False
+
+        # Run the selected build models
+        selected = set(self._static_models) if select is None else self._get_selected_models(select)
+        if exclude is not None:
+            selected -= self._get_selected_models(exclude)
+        models_to_build = {model.name: model for model in models_list if model.name in selected}
+        remaining_upstreams = {
+            name: sum(1 for x in model.upstreams_for_build if x in models_to_build) for name, model in models_to_build.items()
+        }
+        ready = sorted(name for name, count in remaining_upstreams.items() if count == 0)
+        running: dict[asyncio.Task[bool], str] = {}
+        errors: dict[str, BaseException] = {}
+        num_built, num_unchanged = 0, 0
+        state = BuildState.load(self._build_state_path, self._datalake_db_path)
+        try:
+            while ready or running:
+                while ready and len(running) < max(self._threads, 1):
+                    model_name = ready.pop(0)
+                    coro = self._build_model_if_changed(
+                        models_to_build[model_name], duckdb_conn, full_refresh, state, existing_tables
+                    )
+                    running[asyncio.create_task(coro)] = model_name
+                
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    model_name = running.pop(task)
+                    if (error := task.exception()) is not None:
+                        print(f"[{u.get_current_time()}] ❌ FAILED: model '{model_name}'")
+                        errors[model_name] = error
+                        continue
+                    if task.result():
+                        num_built += 1
+                    else:
+                        num_unchanged += 1
+                    for downstream in models_to_build[model_name].downstreams_for_build:
+                        if downstream not in remaining_upstreams:
+                            continue
+                        remaining_upstreams[downstream] -= 1
+                        if remaining_upstreams[downstream] == 0:
+                            ready.append(downstream)
+        except BaseException:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            raise
+        finally:
+            if self._build_state_path is not None:
+                state.save(self._build_state_path)
+
+        print(f"[{u.get_current_time()}] Built {num_built} models and skipped {num_unchanged} unchanged models")
+        self._logger.info(
+            f"Built {num_built} models and skipped {num_unchanged} unchanged models", 
+            data={"models_built": num_built, "models_unchanged": num_unchanged, "models_failed": len(errors)}
+        )
+        if errors:
+            skipped = sorted(name for name, count in remaining_upstreams.items() if count > 0)
+            self._logger.warning(f"Failed to build models {sorted(errors)}. Skipped their downstream models {skipped}")
+            raise next(iter(errors.values()))
+
+    async def build(self, full_refresh: bool, select: str | None, exclude: str | None = None) -> None:
         start = time.time()
 
         # Connect directly to DuckLake instead of attaching (supports concurrent connections)
@@ -61,7 +243,7 @@ class ModelBuilder:
             self._attach_connections(duckdb_conn)
 
             # Construct build models
-            await self._build_models(duckdb_conn, select, full_refresh)
+            await self._build_models(duckdb_conn, select, full_refresh, exclude)
 
         finally:
             duckdb_conn.close()
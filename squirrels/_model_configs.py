@@ -1,3 +1,4 @@
+from typing import Literal
 from enum import Enum
 from pydantic import BaseModel, Field
 
@@ -47,10 +48,23 @@ class QueryModelConfig(ModelConfig):
 
 
 class BuildModelConfig(QueryModelConfig):
-    materialization: str = Field(default="VIEW", description="The materialization of the model (ignored if Python model which is always a table)")
-
-    def get_sql_for_build(self, model_name: str, select_query: str) -> str:
-        if self.materialization.upper() == "TABLE":
+    materialization: str = Field(default="VIEW", description="The materialization of the model, one of TABLE, VIEW, or INCREMENTAL (ignored if Python model which is always a table)")
+    unique_key: list[str] = Field(default_factory=list, description="The columns that identify a row, used to merge new or changed rows into the table of incremental models")
+
+    @property
+    def is_incremental(self) -> bool:
+        return self.materialization.upper() == "INCREMENTAL"
+
+    def get_sql_for_build(self, model_name: str, select_query: str, *, incremental_run: bool = False) -> str:
+        if self.is_incremental and incremental_run:
+            # Without a unique key, all rows from the query are inserted
+            match_condition = f"USING ({', '.join(self.unique_key)})" if self.unique_key else "ON false"
+            return (
+                f"MERGE INTO {model_name} USING (\n{select_query.strip().rstrip(';')}\n) AS src {match_condition} "
+                f"WHEN MATCHED THEN UPDATE BY NAME WHEN NOT MATCHED THEN INSERT BY NAME"
+            )
+        
+        if self.materialization.upper() in ("TABLE", "INCREMENTAL"):
             materialization = "TABLE"
         elif self.materialization.upper() == "VIEW":
             materialization = "VIEW"
@@ -66,9 +80,20 @@ class DbviewModelConfig(ConnectionInterface, QueryModelConfig):
 
 
 class FederateModelConfig(QueryModelConfig):
-    eager: bool = Field(default=False, description="Whether the model should always be materialized in memory for SQL models")
+    eager: bool | Literal["auto"] | None = Field(
+        default=None, 
+        description="Whether the model should always be materialized in memory for SQL models, or 'auto' to decide per request. "
+        "Uses the project default if not specified"
+    )
+
+    def finalize_eager(self, *, default_eager: bool | Literal["auto"] = False):
+        if self.eager is None:
+            self.eager = default_eager
+        return self
 
-    def get_sql_for_create(self, model_name: str, select_query: str) -> str:
-        materialization = "TABLE" if self.eager else "VIEW"
+    def get_sql_for_create(self, model_name: str, select_query: str, *, eager: bool | None = None) -> str:
+        if eager is None:
+            eager = self.eager is True
+        materialization = "TABLE" if eager else "VIEW"
         create_prefix = f"CREATE {materialization} {model_name} AS\n\n"
         return create_prefix + select_query
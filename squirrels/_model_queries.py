@@ -1,7 +1,7 @@
 from abc import ABCMeta
 from dataclasses import dataclass, field
 from typing import Callable, Generic, TypeVar, Any
-import polars as pl, pandas as pd
+import weakref, jinja2 as j2, polars as pl, pandas as pd
 
 from ._arguments.run_time_args import BuildModelArgs
 from ._model_configs import ModelConfig
@@ -17,6 +17,21 @@ class QueryFile(metaclass=ABCMeta):
 @dataclass(frozen=True)
 class SqlQueryFile(QueryFile):
     raw_query: str
+    _templates: weakref.WeakKeyDictionary[j2.Environment, j2.Template] = field(
+        default_factory=weakref.WeakKeyDictionary, init=False, repr=False, compare=False
+    )
+
+    def get_template(self, j2_env: j2.Environment) -> j2.Template:
+        """
+        Returns the raw query compiled as a Jinja template, compiling it only on first use for each environment.
+
+        The template is tied to the raw query of this object, so a changed file (which loads as a new SqlQueryFile) is recompiled.
+        """
+        template = self._templates.get(j2_env)
+        if template is None:
+            template = j2_env.from_string(self.raw_query)
+            self._templates[j2_env] = template
+        return template
 
 @dataclass(frozen=True)
 class PyQueryFile(QueryFile):
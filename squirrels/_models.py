@@ -4,8 +4,8 @@ from dataclasses import dataclass, field, KW_ONLY
 from abc import ABCMeta, abstractmethod
 from enum import Enum
 from pathlib import Path
-import asyncio, os, re, time, duckdb, sqlglot
-import polars as pl, pandas as pd
+import asyncio, hashlib, heapq, os, re, time, duckdb, sqlglot
+import polars as pl, pandas as pd, pyarrow as pa
 
 from . import _constants as c, _utils as u, _py_module as pm, _model_queries as mq, _model_configs as mc, _sources as src
 from ._schemas import response_models as rm
@@ -16,10 +16,22 @@ from ._connection_set import ConnectionsArgs, ConnectionSet, ConnectionPropertie
 from ._manifest import DatasetConfig, ConnectionTypeEnum
 from ._parameter_sets import ParameterConfigsSet, ParametersArgs, ParameterSet
 from ._env_vars import SquirrelsEnvVars
+from ._duckdb_pool import DuckDBConnectionPool
+from ._dependency_tracker import DependencyTracker, DatasetDependencies
 
 ContextFunc = Callable[[dict[str, Any], ContextArgs], None]
 
 
+def _arrow_to_polars(data: pa.RecordBatchReader | pa.Table) -> pl.LazyFrame:
+    """
+    Convert the Arrow record batches of a DuckDB result to polars without rechunking. Unlike DuckDB's ".pl()", this does 
+    not keep an intermediate copy of the result while converting.
+    """
+    df = pl.from_arrow(data, rechunk=False)
+    assert isinstance(df, pl.DataFrame)
+    return df.lazy()
+
+
 class ModelType(Enum):
     SEED = "seed"
     SOURCE = "source"
@@ -34,10 +46,17 @@ class DataModel(metaclass=ABCMeta):
     model_config: mc.ModelConfig
     is_target: bool = field(default=False, init=False)
 
-    result: pl.LazyFrame | None = field(default=None, init=False, repr=False)
+    # The result is a polars LazyFrame if it's used in python (by python models or as the target), or an Arrow table if it's 
+    # only used by DuckDB (which scans Arrow tables without copying them)
+    result: pl.LazyFrame | pa.Table | None = field(default=None, init=False, repr=False)
     needs_python_df: bool = field(default=False, init=False)
 
-    wait_count: int = field(default=0, init=False, repr=False)
+    # For the target model, the rows to load from DuckDB into the result, and whether to count the rows of the full result
+    row_offset: int = field(default=0, init=False, repr=False)
+    row_limit: int | None = field(default=None, init=False, repr=False)
+    count_total_rows: bool = field(default=False, init=False, repr=False)
+    total_num_rows: int | None = field(default=None, init=False, repr=False)
+
     confirmed_no_cycles: bool = field(default=False, init=False)
     upstreams: dict[str, DataModel] = field(default_factory=dict, init=False, repr=False)
     downstreams: dict[str, DataModel] = field(default_factory=dict, init=False, repr=False)
@@ -55,6 +74,13 @@ class DataModel(metaclass=ABCMeta):
     def is_queryable(self) -> bool:
         return True
 
+    @property
+    def is_view(self) -> bool:
+        """
+        Whether the model is a DuckDB view. The upstream results of a view are read whenever the view is queried
+        """
+        return False
+
     def compile(
         self, ctx: dict[str, Any], ctx_args: ContextArgs, models_dict: dict[str, DataModel], recurse: bool
     ) -> None:
@@ -81,8 +107,14 @@ class DataModel(metaclass=ABCMeta):
     
     def _load_duckdb_view_to_python_df(self, conn: duckdb.DuckDBPyConnection, *, use_datalake: bool = False) -> pl.LazyFrame:
         table_name = ("vdl." if use_datalake else "") + self.name
+        query = f"FROM {table_name}"
+        if self.is_target:
+            # DuckDB preserves insertion order, so the pages are consistent with the rows of the full result
+            query += (f" LIMIT {self.row_limit}" if self.row_limit is not None else "") + (f" OFFSET {self.row_offset}" if self.row_offset > 0 else "")
         try:
-            return conn.sql(f"FROM {table_name}").pl().lazy()
+            if self.is_target and self.count_total_rows:
+                self.total_num_rows = conn.sql(f"SELECT count(*) FROM {table_name}").fetchone()[0] # type: ignore
+            return _arrow_to_polars(conn.sql(query).arrow())
         except duckdb.CatalogException as e:
             raise u.ConfigurationError(f'Failed to load duckdb table or view "{self.name}" to python dataframe') from e
     
@@ -90,16 +122,11 @@ class DataModel(metaclass=ABCMeta):
         self.logger.debug(f"Running SQL query on connection '{connection_name}':\n{query}")
         return self.conn_set.run_sql_query_from_conn_name(query, connection_name, placeholders)
     
-    async def _trigger(self, conn: duckdb.DuckDBPyConnection, placeholders: dict = {}) -> None:
-        self.wait_count -= 1
-        if (self.wait_count == 0):
-            await self.run_model(conn, placeholders)
-    
     async def run_model(self, conn: duckdb.DuckDBPyConnection, placeholders: dict = {}) -> None:
-        coroutines = []
-        for model in self.downstreams.values():
-            coroutines.append(model._trigger(conn, placeholders))
-        await u.asyncio_gather(coroutines)
+        """
+        Runs this model only. The DAG is responsible for running the upstream models first
+        """
+        pass
     
     def retrieve_dependent_query_models(self, dependent_model_names: set[str]) -> None:
         pass
@@ -128,18 +155,13 @@ class DataModel(metaclass=ABCMeta):
                 self.max_path_len_to_target = 0 if self.is_target else None
         return self.max_path_len_to_target
 
-    async def _trigger_build(self, conn: duckdb.DuckDBPyConnection, full_refresh: bool) -> None:
-        pass
-    
     def _create_table_from_df(self, conn: duckdb.DuckDBPyConnection, query_result: pl.LazyFrame | pd.DataFrame):
         local_conn = conn.cursor()
-        # local_conn = conn
         try:
             assert query_result is not None
             local_conn.execute(f"CREATE OR REPLACE TABLE {self.name} AS FROM query_result")
         finally:
             local_conn.close()
-            # pass
         
     def process_pass_through_columns(self, models_dict: dict[str, DataModel]) -> None:
         pass
@@ -148,7 +170,6 @@ class DataModel(metaclass=ABCMeta):
 @dataclass
 class StaticModel(DataModel):
     needs_python_df_for_build: bool = field(default=False, init=False)
-    wait_count_for_build: int = field(default=0, init=False, repr=False)
     upstreams_for_build: dict[str, StaticModel] = field(default_factory=dict, init=False, repr=False)
     downstreams_for_build: dict[str, StaticModel] = field(default_factory=dict, init=False, repr=False)
     
@@ -184,7 +205,7 @@ class StaticModel(DataModel):
         if (self.needs_python_df or self.is_target) and self.result is None:
             start = time.time()
 
-            self.result = await asyncio.to_thread(self._get_result, conn)
+            self.result = await self.conn_set.get_local_executor().run(self._get_result, conn)
             
             self.logger.log_activity_time(
                 f"loading {self.model_type.value} model '{self.name}' into memory", start, 
@@ -195,30 +216,28 @@ class StaticModel(DataModel):
                 }
             )
 
-        await super().run_model(conn, placeholders)
-
     def compile_for_build(
         self, conn_args: ConnectionsArgs, models_dict: dict[str, StaticModel]
     ) -> None:
         pass
-    
-    async def _trigger_build(self, conn: duckdb.DuckDBPyConnection, full_refresh: bool) -> None:
-        self.wait_count_for_build -= 1
-        if (self.wait_count_for_build == 0):
-            await self.build_model(conn, full_refresh)
+
+    def get_build_content_hash(self) -> str | None:
+        """
+        Get a hash of what the built model depends on other than its config and upstream models, or None if it can only be
+        known by building the model (such as data from external databases)
+        """
+        return None
     
     async def build_model(self, conn: duckdb.DuckDBPyConnection, full_refresh: bool) -> None:
+        """
+        Builds this model only. The ModelBuilder is responsible for building the upstream models first
+        """
         if self.needs_python_df and self.result is None:
             local_conn = conn.cursor()
             try:
                 self.result = await asyncio.to_thread(self._load_duckdb_view_to_python_df, local_conn)
             finally:
                 local_conn.close()
-        
-        coroutines = []
-        for model in self.downstreams_for_build.values():
-            coroutines.append(model._trigger_build(conn, full_refresh))
-        await u.asyncio_gather(coroutines)
 
 
 @dataclass
@@ -230,12 +249,15 @@ class Seed(StaticModel):
     def model_type(self) -> ModelType:
         return ModelType.SEED
     
+    def get_build_content_hash(self) -> str | None:
+        buffer = self.result.collect().write_ipc(None)
+        return hashlib.sha256(buffer.getvalue()).hexdigest()
+    
     async def build_model(self, conn: duckdb.DuckDBPyConnection, full_refresh: bool) -> None:
         start = time.time()
 
         print(f"[{u.get_current_time()}] 🔨 BUILDING: seed model '{self.name}'")
-        # await asyncio.to_thread(self._create_table_from_df, conn, self.result)
-        self._create_table_from_df(conn, self.result) # without threading
+        await asyncio.to_thread(self._create_table_from_df, conn, self.result)
 
         print(f"[{u.get_current_time()}] ✅ FINISHED: seed model '{self.name}'")
         self.logger.log_activity_time(
@@ -273,7 +295,6 @@ class SourceModel(StaticModel):
     
     def _build_source_model(self, conn: duckdb.DuckDBPyConnection, full_refresh: bool) -> None:
         local_conn = conn.cursor()
-        # local_conn = conn
         
         local_conn.begin()
         try:
@@ -340,15 +361,13 @@ class SourceModel(StaticModel):
         
         finally:
             local_conn.close()
-            # pass
 
     async def build_model(self, conn: duckdb.DuckDBPyConnection, full_refresh: bool) -> None:
         if self.model_config.load_to_vdl:
             start = time.time()
             print(f"[{u.get_current_time()}] 🔨 BUILDING: source model '{self.name}'")
 
-            # await asyncio.to_thread(self._build_source_model, conn, full_refresh)
-            self._build_source_model(conn, full_refresh) # without threading
+            await asyncio.to_thread(self._build_source_model, conn, full_refresh)
             
             print(f"[{u.get_current_time()}] ✅ FINISHED: source model '{self.name}'")
             self.logger.log_activity_time(
@@ -401,7 +420,7 @@ class QueryModel(DataModel):
         if dependent_model_name not in self.upstreams:
             raise u.ConfigurationError(f'Model "{self.name}" must include model "{dependent_model_name}" as a dependency to use')
         df = self.upstreams[dependent_model_name].result
-        assert df is not None
+        assert isinstance(df, pl.LazyFrame)
         return df
 
     def _get_compile_sql_model_args_from_ctx_args(
@@ -415,10 +434,9 @@ class QueryModel(DataModel):
         }
         return kwargs
     
-    def _get_compiled_sql_query_str(self, raw_query: str, kwargs: dict[str, Any]) -> str:
+    def _get_compiled_sql_query_str(self, query_file: mq.SqlQueryFile, kwargs: dict[str, Any]) -> str:
         try:
-            template = self.j2_env.from_string(raw_query)
-            query = template.render(kwargs)
+            query = query_file.get_template(self.j2_env).render(kwargs)
         except Exception as e:
             raise FileExecutionError(f'Failed to compile sql model "{self.name}"', e) from e
         return query
@@ -502,6 +520,7 @@ class DbviewModel(QueryModel):
         self, ctx: dict[str, Any], ctx_args: ContextArgs, models_dict: dict[str, DataModel]
     ) -> dict[str, Any]:
         kwargs = self._get_compile_sql_model_args_from_ctx_args(ctx, ctx_args)
+        is_translated_to_duckdb = self._is_translated_to_duckdb()
         
         def source(source_name: str) -> str:
             if source_name not in models_dict or not isinstance(source_model := models_dict[source_name], SourceModel):
@@ -518,44 +537,34 @@ class DbviewModel(QueryModel):
                 
             self.model_config.depends_on.add(source_name)
             self.sources[source_name] = source_model.model_config
-            return "{{ source(\"" + source_name + "\") }}"
+            return "vdl." + source_name if is_translated_to_duckdb else source_model.model_config.get_table()
         
         kwargs["source"] = source
         kwargs["ref"] = source
         return kwargs
 
+    def _is_translated_to_duckdb(self) -> bool:
+        connection_props = self.conn_set.get_connection(self.model_config.get_connection())
+        return self.model_config.translate_to_duckdb and isinstance(connection_props, ConnectionProperties)
+    
     def _get_duckdb_query(self, read_dialect: str, query: str) -> str:
-        kwargs = {
-            "source": lambda source_name: "vdl." + source_name
-        }
-        compiled_query = self._get_compiled_sql_query_str(query, kwargs)
-        duckdb_query = sqlglot.transpile(compiled_query, read=read_dialect, write="duckdb", pretty=True)[0]
+        duckdb_query = sqlglot.transpile(query, read=read_dialect, write="duckdb", pretty=True)[0]
         return "-- translated to duckdb\n" + duckdb_query
     
     def _compile_sql_model(self, kwargs: dict[str, Any]) -> mq.SqlModelQuery:
-        compiled_query_str = self._get_compiled_sql_query_str(self.query_file.raw_query, kwargs)
+        # The "source" macro resolves to the final table names, so the query only needs to be rendered once
+        compiled_query_str = self._get_compiled_sql_query_str(self.query_file, kwargs)
 
-        connection_name = self.model_config.get_connection()
-        connection_props = self.conn_set.get_connection(connection_name)
-        
-        if self.model_config.translate_to_duckdb and isinstance(connection_props, ConnectionProperties):
+        connection_props = self.conn_set.get_connection(self.model_config.get_connection())
+        is_duckdb = self._is_translated_to_duckdb()
+        if is_duckdb:
+            assert isinstance(connection_props, ConnectionProperties)
             # Forbid translate_to_duckdb when dbview connection is duckdb
             if connection_props.type == ConnectionTypeEnum.DUCKDB:
                 raise u.ConfigurationError(
                     f'Dbview "{self.name}" has translate_to_duckdb=True but its connection is duckdb. Use a federate model instead.'
                 )
-            macros = {
-                "source": lambda source_name: "vdl." + source_name
-            }
-            compiled_query2 = self._get_compiled_sql_query_str(compiled_query_str, macros)
-            compiled_query_str = self._get_duckdb_query(connection_props.dialect, compiled_query2)
-            is_duckdb = True
-        else:
-            macros = {
-                "source": lambda source_name: self.sources[source_name].get_table()
-            }
-            compiled_query_str = self._get_compiled_sql_query_str(compiled_query_str, macros)
-            is_duckdb = False
+            compiled_query_str = self._get_duckdb_query(connection_props.dialect, compiled_query_str)
         
         compiled_query = mq.SqlModelQuery(compiled_query_str, is_duckdb)
         return compiled_query
@@ -588,13 +597,19 @@ class DbviewModel(QueryModel):
         query = self.compiled_query.query
         connection_name = self.model_config.get_connection()
         
-        def run_sql_query_on_connection(is_duckdb: bool, query: str, placeholders: dict) -> pl.DataFrame:
+        def run_sql_query_on_connection(is_duckdb: bool, query: str, placeholders: dict) -> pa.Table | pl.LazyFrame:
             try:
                 if is_duckdb:
                     local_conn = conn.cursor()
                     try:
                         self.logger.info(f"Running dbview '{self.name}' on duckdb")
-                        return local_conn.sql(query, params=placeholders).pl()
+                        arrow_result = local_conn.sql(query, params=placeholders).arrow() # a table before DuckDB 1.5
+                        if self.needs_python_df or self.is_target:
+                            return _arrow_to_polars(arrow_result)
+                        # Results from DuckDB that are only read by downstream SQL models stay in Arrow. They are read
+                        # into a table since a record batch reader can only be scanned once
+                        is_reader = isinstance(arrow_result, pa.RecordBatchReader)
+                        return arrow_result.read_all() if is_reader else arrow_result
                     except duckdb.CatalogException as e:
                         raise InvalidInputError(409, f'dependent_data_model_not_found', f'Model "{self.name}" depends on static data models that cannot be found. Try building the Virtual Data Lake (VDL) first.')
                     except Exception as e:
@@ -603,13 +618,13 @@ class DbviewModel(QueryModel):
                         local_conn.close()
                 else:
                     self.logger.info(f"Running dbview '{self.name}' on connection: {connection_name}")
-                    return self.conn_set.run_sql_query_from_conn_name(query, connection_name, placeholders)
+                    return self.conn_set.run_sql_query_from_conn_name(query, connection_name, placeholders).lazy()
             except RuntimeError as e:
                 raise FileExecutionError(f'Failed to run dbview sql model "{self.name}"', e)
         
         self._log_sql_to_run(query, placeholders)
-        result = await asyncio.to_thread(run_sql_query_on_connection, is_duckdb, query, placeholders)
-        self.result = result.lazy()
+        executor = self.conn_set.get_local_executor() if is_duckdb else self.conn_set.get_executor(connection_name)
+        self.result = await executor.run(run_sql_query_on_connection, is_duckdb, query, placeholders)
 
     async def run_model(self, conn: duckdb.DuckDBPyConnection, placeholders: dict = {}) -> None:
         start = time.time()
@@ -624,8 +639,6 @@ class DbviewModel(QueryModel):
                 "model_type": self.model_type.value
             }
         )
-        
-        await super().run_model(conn, placeholders)
     
 
 @dataclass
@@ -633,11 +646,26 @@ class FederateModel(QueryModel):
     model_config: mc.FederateModelConfig
     query_file: mq.SqlQueryFile | mq.PyQueryFile
     compiled_query: mq.SqlModelQuery | mq.PyModelQuery | None = field(default=None, init=False)
+    inlined_into: FederateModel | None = field(default=None, init=False, repr=False) # set by the DAG if inlined as a CTE
+    auto_eager: bool = field(default=False, init=False) # set by the DAG if eager is "auto"
+    num_rows_materialized: int | None = field(default=None, init=False) # set when run as a TABLE
 
     @property
     def model_type(self) -> ModelType:
         return ModelType.FEDERATE
 
+    @property
+    def is_eager(self) -> bool:
+        """
+        Whether the SQL model is materialized as a TABLE for this request
+        """
+        eager = self.model_config.eager
+        return eager is True or (eager == "auto" and self.auto_eager)
+
+    @property
+    def is_view(self) -> bool:
+        return isinstance(self.compiled_query, mq.SqlModelQuery) and not self.is_eager
+
     def _get_compile_sql_model_args(
         self, ctx: dict[str, Any], ctx_args: ContextArgs, models_dict: dict[str, DataModel]
     ) -> dict[str, Any]:
@@ -663,7 +691,7 @@ class FederateModel(QueryModel):
         self, query_file: mq.SqlQueryFile, ctx: dict[str, Any], ctx_args: ContextArgs, models_dict: dict[str, DataModel]
     ) -> mq.SqlModelQuery:
         kwargs = self._get_compile_sql_model_args(ctx, ctx_args, models_dict)
-        compiled_query_str = self._get_compiled_sql_query_str(query_file.raw_query, kwargs)
+        compiled_query_str = self._get_compiled_sql_query_str(query_file, kwargs)
         compiled_query = mq.SqlModelQuery(compiled_query_str, is_duckdb=True)
         return compiled_query
     
@@ -730,28 +758,62 @@ class FederateModel(QueryModel):
             return 
         
         dependencies = self.model_config.depends_on
-        self.wait_count = len(dependencies)
-
         for name in dependencies:
             dep_model = models_dict[name]
             self._add_upstream(dep_model)
             dep_model.compile(ctx, ctx_args, models_dict, recurse)
 
+    @property
+    def can_be_inlined(self) -> bool:
+        """
+        Whether the SQL query of the model can be inlined as a CTE into its downstream model instead of creating a view
+        """
+        return self.is_view and not self.needs_python_df and not self.is_target
+
+    def get_inlined_upstreams(self) -> list[FederateModel]:
+        """
+        Get the upstream models that are inlined into this model (directly or through other inlined models), such that every
+        model comes after the models it depends on
+        """
+        inlined_upstreams: list[FederateModel] = []
+        for upstream in sorted(self.upstreams.values(), key=lambda x: x.name):
+            if isinstance(upstream, FederateModel) and upstream.inlined_into is self:
+                inlined_upstreams.extend(upstream.get_inlined_upstreams())
+                inlined_upstreams.append(upstream)
+        return inlined_upstreams
+
+    def _get_query_with_inlined_upstreams(self, query: str) -> str:
+        inlined_upstreams = self.get_inlined_upstreams()
+        if not inlined_upstreams:
+            return query
+        
+        ctes = []
+        for model in inlined_upstreams:
+            assert isinstance(model.compiled_query, mq.SqlModelQuery)
+            # The new line before the closing parenthesis ends any trailing line comment
+            ctes.append(f"{model.name} AS (\n{model.compiled_query.query.strip().rstrip(';')}\n)")
+        
+        # If the query already has a WITH clause, the inlined models are added as its first CTEs
+        with_clause = re.match(r"(\s|--[^\n]*(\n|$)|/\*.*?\*/)*WITH\s+(RECURSIVE\s+)?", query, re.IGNORECASE | re.DOTALL)
+        if with_clause:
+            return with_clause.group(0) + ",\n".join(ctes) + ",\n" + query[with_clause.end():]
+        return "WITH " + ",\n".join(ctes) + "\n" + query
+
     async def _run_sql_model(self, compiled_query: mq.SqlModelQuery, conn: duckdb.DuckDBPyConnection, placeholders: dict = {}) -> None:
         local_conn = conn.cursor()
         try:
             self.register_all_upstream_python_df(local_conn)
-            query = compiled_query.query
+            query = self._get_query_with_inlined_upstreams(compiled_query.query)
 
             def create_table(local_conn: duckdb.DuckDBPyConnection):
                 # DuckDB doesn't support specifying named parameters that are not used in the query, so filtering them out
                 placeholder_exists = lambda key: re.search(r"\$" + key + r"(?!\w)", query)
                 existing_placeholders = {key: value for key, value in placeholders.items() if placeholder_exists(key)}
 
-                create_query = self.model_config.get_sql_for_create(self.name, query)
+                create_query = self.model_config.get_sql_for_create(self.name, query, eager=self.is_eager)
                 self._log_sql_to_run(create_query, existing_placeholders)
                 try:
-                    return local_conn.execute(create_query, existing_placeholders)
+                    local_conn.execute(create_query, existing_placeholders)
                 except duckdb.CatalogException as e:
                     if self.name == "__fake_target":
                         raise InvalidInputError(409, "invalid_sql_query", f"Provided SQL query depends on static data models that cannot be found. Try building the Virtual Data Lake (VDL) first.")
@@ -760,23 +822,33 @@ class FederateModel(QueryModel):
                 except Exception as e:
                     if self.name == "__fake_target":
                         raise InvalidInputError(400, "invalid_sql_query", f"Failed to run provided SQL query")
-                    else:
-                        raise FileExecutionError(f'Failed to run federate sql model "{self.name}"', e) from e
+                    
+                    inlined_names = [x.name for x in self.get_inlined_upstreams()]
+                    msg_extension = f" (with inlined federate models {inlined_names})" if inlined_names else ""
+                    raise FileExecutionError(f'Failed to run federate sql model "{self.name}"{msg_extension}', e) from e
+                
+                if self.is_eager:
+                    row = local_conn.fetchone() # the number of rows inserted into the table
+                    self.num_rows_materialized = row[0] if row else None
             
-            await asyncio.to_thread(create_table, local_conn)
+            executor = self.conn_set.get_local_executor()
+            await executor.run(create_table, local_conn)
             if self.needs_python_df or self.is_target:
-                self.result = await asyncio.to_thread(self._load_duckdb_view_to_python_df, local_conn)
+                self.result = await executor.run(self._load_duckdb_view_to_python_df, local_conn)
         finally:
             local_conn.close()
 
     async def _run_python_model(self, compiled_query: mq.PyModelQuery) -> None:
-        query_result = await asyncio.to_thread(compiled_query.query)
+        query_result = await self.conn_set.get_local_executor().run(compiled_query.query)
         if isinstance(query_result, pd.DataFrame):
             query_result = pl.from_pandas(query_result)
         
         self.result = query_result.lazy()
 
     async def run_model(self, conn: duckdb.DuckDBPyConnection, placeholders: dict = {}) -> None:
+        if self.inlined_into is not None:
+            return # the query runs as part of the downstream model
+        
         start = time.time()
         
         if isinstance(self.compiled_query, mq.SqlModelQuery):
@@ -794,8 +866,6 @@ class FederateModel(QueryModel):
                 "model_type": self.model_type.value
             }
         )
-        
-        await super().run_model(conn, placeholders)
     
 
 @dataclass
@@ -803,6 +873,7 @@ class BuildModel(StaticModel, QueryModel):
     model_config: mc.BuildModelConfig
     query_file: mq.SqlQueryFile | mq.PyQueryFile
     compiled_query: mq.SqlModelQuery | mq.PyModelQuery | None = field(default=None, init=False)
+    is_incremental_run: bool = field(default=False, init=False) # set by the ModelBuilder if updating the existing table
 
     @property
     def model_type(self) -> ModelType:
@@ -832,13 +903,15 @@ class BuildModel(StaticModel, QueryModel):
             return dependent_model
         
         kwargs["ref"] = ref_for_build
+        kwargs["this"] = self.name
+        kwargs["is_incremental"] = lambda: self.is_incremental_run
         return kwargs
 
     def _compile_sql_model(
         self, query_file: mq.SqlQueryFile, conn_args: ConnectionsArgs, models_dict: dict[str, StaticModel]
     ) -> mq.SqlModelQuery:
         kwargs = self._get_compile_sql_model_args(conn_args, models_dict)
-        compiled_query_str = self._get_compiled_sql_query_str(query_file.raw_query, kwargs)
+        compiled_query_str = self._get_compiled_sql_query_str(query_file, kwargs)
         compiled_query = mq.SqlModelQuery(compiled_query_str, is_duckdb=True)
         return compiled_query
     
@@ -846,7 +919,7 @@ class BuildModel(StaticModel, QueryModel):
         if dependent_model_name not in self.upstreams_for_build:
             raise u.ConfigurationError(f'Model "{self.name}" must include model "{dependent_model_name}" as a dependency to use')
         df = self.upstreams_for_build[dependent_model_name].result
-        assert df is not None
+        assert isinstance(df, pl.LazyFrame)
         return df
     
     def _get_compile_python_model_args(self, conn_args: ConnectionsArgs) -> BuildModelArgs:
@@ -873,6 +946,12 @@ class BuildModel(StaticModel, QueryModel):
         
         return mq.PyModelQuery(compiled_query)
     
+    def get_build_content_hash(self) -> str | None:
+        # Python models can read external databases through "connections" and "run_external_sql", so they are always built
+        if not isinstance(self.compiled_query, mq.SqlModelQuery):
+            return None
+        return hashlib.sha256(self.compiled_query.query.encode()).hexdigest()
+    
     def compile_for_build(self, conn_args: ConnectionsArgs, models_dict: dict[str, StaticModel]) -> None:
         start = time.time()
 
@@ -893,8 +972,6 @@ class BuildModel(StaticModel, QueryModel):
         )
         
         dependencies = self.model_config.depends_on
-        self.wait_count_for_build = len(dependencies)
-
         for name in dependencies:
             dep_model = models_dict[name]
             self._add_upstream_for_build(dep_model)
@@ -903,19 +980,16 @@ class BuildModel(StaticModel, QueryModel):
         query = compiled_query.query
 
         def create_table():
-            create_query = self.model_config.get_sql_for_build(self.name, query)
+            create_query = self.model_config.get_sql_for_build(self.name, query, incremental_run=self.is_incremental_run)
             local_conn = conn.cursor()
-            # local_conn = conn
             try:
                 return u.run_duckdb_stmt(self.logger, local_conn, create_query, model_name=self.name)
             except Exception as e:
                 raise FileExecutionError(f'Failed to build static sql model "{self.name}"', e) from e
             finally:
                 local_conn.close()
-                # pass
         
-        # await asyncio.to_thread(create_table)
-        create_table() # without threading
+        await asyncio.to_thread(create_table)
 
     async def _build_python_model(self, compiled_query: mq.PyModelQuery, conn: duckdb.DuckDBPyConnection) -> None:
         query_result = await asyncio.to_thread(compiled_query.query)
@@ -923,12 +997,12 @@ class BuildModel(StaticModel, QueryModel):
             query_result = pl.from_pandas(query_result).lazy()
         if self.needs_python_df_for_build:
             self.result = query_result.lazy()
-        # await asyncio.to_thread(self._create_table_from_df, conn, query_result)
-        self._create_table_from_df(conn, query_result) # without threading
+        await asyncio.to_thread(self._create_table_from_df, conn, query_result)
 
     async def build_model(self, conn: duckdb.DuckDBPyConnection, full_refresh: bool) -> None:
         start = time.time()
-        print(f"[{u.get_current_time()}] 🔨 BUILDING: build model '{self.name}'")
+        incremental_str = " (incremental)" if self.is_incremental_run and isinstance(self.compiled_query, mq.SqlModelQuery) else ""
+        print(f"[{u.get_current_time()}] 🔨 BUILDING: build model '{self.name}'{incremental_str}")
         
         if isinstance(self.compiled_query, mq.SqlModelQuery):
             await self._build_sql_model(self.compiled_query, conn)
@@ -937,12 +1011,10 @@ class BuildModel(StaticModel, QueryModel):
             def load_df(conn: duckdb.DuckDBPyConnection, dep_model: DataModel):
                 if dep_model.result is None:
                     local_conn = conn.cursor()
-                    # local_conn = conn
                     try:
                         dep_model.result = dep_model._load_duckdb_view_to_python_df(local_conn)
                     finally:
                         local_conn.close()
-                        # pass
                 
             coroutines = []
             for dep_model in self.upstreams_for_build.values():
@@ -968,6 +1040,105 @@ class BuildModel(StaticModel, QueryModel):
         await super().build_model(conn, full_refresh)
 
 
+@dataclass(frozen=True)
+class DAGTemplate:
+    """
+    Request-independent structure of the runtime DAG for a dataset, computed once from the model files.
+
+    Dependencies come from the constant arguments of ref() / source() calls in SQL models and the depends_on of Python models.
+    If any dependency cannot be resolved statically, the template covers all models and cycle validation is left to run time.
+    """
+    dataset: DatasetConfig
+    model_names: frozenset[str]
+    upstreams: dict[str, frozenset[str]]
+    downstreams: dict[str, frozenset[str]]
+    topological_order: tuple[str, ...] # empty if is_acyclic is False
+    is_acyclic: bool
+
+    @classmethod
+    def from_static_dependencies(
+        cls, dataset: DatasetConfig, static_dependencies: dict[str, set[str] | None]
+    ) -> DAGTemplate:
+        target = dataset.model
+        if target not in static_dependencies:
+            raise u.ConfigurationError(f'Dataset "{dataset.name}" references unknown model "{target}"')
+
+        # Find all models upstream of the target. Unknown model names are skipped since they fail at compile time anyways
+        model_names: set[str] = set()
+        is_static = True
+        stack = [target]
+        while stack:
+            name = stack.pop()
+            if name in model_names:
+                continue
+            model_names.add(name)
+            dependencies = static_dependencies[name]
+            if dependencies is None:
+                is_static = False
+                break
+            stack.extend(x for x in dependencies if x in static_dependencies)
+
+        if not is_static:
+            model_names = set(static_dependencies.keys())
+
+        upstreams = {
+            name: frozenset(x for x in (static_dependencies[name] or set()) if x in model_names) for name in model_names
+        }
+        downstreams: dict[str, set[str]] = {name: set() for name in model_names}
+        for name, deps in upstreams.items():
+            for dep in deps:
+                downstreams[dep].add(name)
+
+        # Kahn's algorithm (sorted for deterministic ordering)
+        in_degrees = {name: len(deps) for name, deps in upstreams.items()}
+        ready = sorted(name for name, degree in in_degrees.items() if degree == 0)
+        topological_order: list[str] = []
+        while ready:
+            name = ready.pop(0)
+            topological_order.append(name)
+            for child in sorted(downstreams[name]):
+                in_degrees[child] -= 1
+                if in_degrees[child] == 0:
+                    ready.append(child)
+
+        is_acyclic = is_static and len(topological_order) == len(model_names)
+        return cls(
+            dataset=dataset,
+            model_names=frozenset(model_names),
+            upstreams=upstreams,
+            downstreams={name: frozenset(x) for name, x in downstreams.items()},
+            topological_order=tuple(topological_order) if is_acyclic else tuple(),
+            is_acyclic=is_acyclic
+        )
+
+
+@dataclass(frozen=True)
+class NodeTiming:
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class ModelRunStats:
+    """
+    Averages of the run time and number of rows of a federate model from past runs as a TABLE. Recent runs are weighted
+    more once there are enough runs
+    """
+    num_runs: int = 0
+    avg_duration: float = 0
+    avg_num_rows: float = 0
+
+    def record(self, duration: float, num_rows: int) -> None:
+        self.num_runs += 1
+        weight = max(1 / self.num_runs, 0.2)
+        self.avg_duration += (duration - self.avg_duration) * weight
+        self.avg_num_rows += (num_rows - self.avg_num_rows) * weight
+
+
 @dataclass
 class DAG:
     dataset: DatasetConfig | None
@@ -975,8 +1146,18 @@ class DAG:
     models_dict: dict[str, DataModel]
     datalake_db_path: str | None = field(default=None)
     logger: u.Logger = field(default_factory=lambda: u.Logger(""))
+    template: DAGTemplate | None = field(default=None)
+    duckdb_pool: DuckDBConnectionPool | None = field(default=None)
+    max_workers: int = field(default=8)
+    release_results: bool = field(default=True) # whether to release the results of intermediate models once they're read
+    model_run_stats: dict[str, ModelRunStats] = field(default_factory=dict) # shared across requests of the project
+    auto_eager_max_rows: int = field(default=1_000_000)
+    auto_eager_min_saved_ms: float = field(default=100)
     parameter_set: ParameterSet | None = field(default=None, init=False) # set in apply_selections
     placeholders: dict[str, Any] = field(init=False, default_factory=dict)
+    node_timings: dict[str, NodeTiming] = field(init=False, default_factory=dict) # set in _run_models
+    vdl_snapshot_id: int | None = field(default=None, init=False) # set in _run_models
+    dependency_tracker: DependencyTracker = field(default_factory=DependencyTracker, init=False)
 
     def _get_msg_extension(self) -> str:
         return f" for dataset '{self.dataset.name}'" if self.dataset else ""
@@ -1016,6 +1197,9 @@ class DAG:
         args = ContextArgs(
             **param_args.__dict__, user=user, prms=prms, configurables=configurables, _conn_args=param_args
         )
+        args.user = self.dependency_tracker.track_user(user)
+        args.prms = self.dependency_tracker.track_parameters(args.prms)
+        args.configurables = self.dependency_tracker.track_configurables(args.configurables)
         msg_extension = self._get_msg_extension()
         
         try:
@@ -1033,7 +1217,25 @@ class DAG:
     def _compile_models(self, context: dict[str, Any], ctx_args: ContextArgs, recurse: bool) -> None:
         self.target_model.compile(context, ctx_args, self.models_dict, recurse)
     
+    def _get_terminal_nodes_without_cycle_check(self) -> set[str]:
+        terminal_nodes = set()
+        visited = set()
+        stack = [self.target_model]
+        while stack:
+            model = stack.pop()
+            if model.name in visited:
+                continue
+            visited.add(model.name)
+            if len(model.upstreams) == 0:
+                terminal_nodes.add(model.name)
+            stack.extend(model.upstreams.values())
+        return terminal_nodes
+
     def _get_terminal_nodes(self) -> set[str]:
+        # Runtime dependencies are a subset of the template's dependencies, so an acyclic template means no cycles are possible
+        if self.template is not None and self.template.is_acyclic:
+            return self._get_terminal_nodes_without_cycle_check()
+
         start = time.time()
         terminal_nodes = self.target_model.get_terminal_nodes(set())
         for model in self.models_dict.values():
@@ -1041,31 +1243,227 @@ class DAG:
         self.logger.log_activity_time("validating no cycles in model dependencies", start)
         return terminal_nodes
 
-    def _attach_connections_with_type_duckdb(self, conn: duckdb.DuckDBPyConnection) -> None:
-        for conn_name, connection in self.target_model.conn_set.get_connections_as_dict().items():
-            if not isinstance(connection, ConnectionProperties):
-                continue
-            attach_uri = connection.attach_uri_for_duckdb
-            if attach_uri is None:
-                continue
-            attach_stmt = f"ATTACH IF NOT EXISTS '{attach_uri}' AS db_{conn_name} (READ_ONLY)"
-            u.run_duckdb_stmt(self.logger, conn, attach_stmt, redacted_values=[attach_uri])
-
     async def _run_models(self) -> None:
         terminal_nodes = self._get_terminal_nodes()
 
-        conn = u.create_duckdb_connection(datalake_db_path=self.datalake_db_path)
-        try:
-            self._attach_connections_with_type_duckdb(conn)
+        # Without a shared pool, use a single-use connection (pool size of zero)
+        duckdb_pool = self.duckdb_pool or DuckDBConnectionPool(
+            self.datalake_db_path, self.target_model.conn_set, pool_size=0, logger=self.logger
+        )
+        with duckdb_pool.connection() as conn:
+            if self.datalake_db_path is not None and self.datalake_db_path.startswith("ducklake:"):
+                self.vdl_snapshot_id = u.get_current_vdl_snapshot_id(conn)
+            await self._schedule_models(conn, terminal_nodes)
+
+    def get_dependencies(self) -> DatasetDependencies:
+        """
+        Get the parameters, configurables, and user fields that the result depends on, based on what context.py and the models 
+        read. Parameters depend on the selections of their parent parameters and the user attribute for their options (if any)
+        """
+        assert isinstance(self.parameter_set, ParameterSet)
+        parameters = self.parameter_set.get_parameters_as_dict()
+        parameters_used: set[str] = set()
+        stack = [x for x in self.dependency_tracker.parameters_read if x in parameters]
+        while stack:
+            name = stack.pop()
+            if name in parameters_used:
+                continue
+            parameters_used.add(name)
+            parent_name = parameters[name]._config.parent_name
+            if parent_name in parameters:
+                stack.append(parent_name)
+        
+        # The access level is used to check the permission to the dataset
+        user_fields = {"access_level", *self.dependency_tracker.user_fields_read}
+        user_fields.update(x for name in parameters_used if (x := parameters[name]._config.user_attribute) is not None)
+        return DatasetDependencies(
+            frozenset(parameters_used), frozenset(self.dependency_tracker.configurables_read), frozenset(user_fields)
+        )
+
+    def get_static_models_read(self) -> frozenset[str]:
+        """
+        Get the names of the sources, seeds, and build models that the target model depends on
+        """
+        return frozenset(name for name, model in self._get_models_to_run().items() if isinstance(model, StaticModel))
+
+    def _get_models_to_run(self) -> dict[str, DataModel]:
+        models_to_run: dict[str, DataModel] = {}
+        stack: list[DataModel] = [self.target_model]
+        while stack:
+            model = stack.pop()
+            if model.name not in models_to_run:
+                models_to_run[model.name] = model
+                stack.extend(model.upstreams.values())
+        return models_to_run
+
+    def _get_critical_path_length(self, models_to_run: dict[str, DataModel]) -> float:
+        # Longest chain of model run durations, where each model can only start after all its upstreams end
+        finish_times: dict[str, float] = {}
+        def get_finish_time(model: DataModel) -> float:
+            if model.name not in finish_times:
+                upstream_finish_times = [get_finish_time(x) for x in model.upstreams.values()]
+                finish_times[model.name] = self.node_timings[model.name].duration + max(upstream_finish_times, default=0)
+            return finish_times[model.name]
+        return max((get_finish_time(model) for model in models_to_run.values()), default=0)
+
+    def _decide_auto_eager_models(self, models_to_run: dict[str, DataModel]) -> None:
+        """
+        Decide whether the federate SQL models with eager set to "auto" are materialized as a TABLE for this request. A model 
+        with multiple downstream models is materialized, so its query runs once instead of once per downstream model. Based on 
+        past runs, it is only created as a VIEW if its result has more than auto_eager_max_rows rows, and recomputing it for 
+        the extra downstream models takes less than auto_eager_min_saved_ms
+        """
+        for model in models_to_run.values():
+            if not (isinstance(model, FederateModel) and model.model_config.eager == "auto"):
+                continue
+            if not isinstance(model.compiled_query, mq.SqlModelQuery):
+                continue
             
-            coroutines = []
-            for model_name in terminal_nodes:
-                model = self.models_dict[model_name] if model_name != "__fake_target" else self.target_model
-                coroutines.append(model.run_model(conn, self.placeholders))
-            await u.asyncio_gather(coroutines)
+            num_downstreams = sum(1 for name in model.downstreams if name in models_to_run)
+            stats = self.model_run_stats.get(model.name)
+            if num_downstreams < 2:
+                model.auto_eager = False
+                reason = f"{num_downstreams} downstream model(s)"
+            elif stats is None:
+                model.auto_eager = True
+                reason = f"{num_downstreams} downstream models and no past runs"
+            else:
+                saved_ms = (num_downstreams - 1) * stats.avg_duration * 10**3
+                model.auto_eager = stats.avg_num_rows <= self.auto_eager_max_rows or saved_ms >= self.auto_eager_min_saved_ms
+                reason = (
+                    f"{num_downstreams} downstream models, about {stats.avg_num_rows:.0f} rows, and about {saved_ms:.1f}ms "
+                    f"of recomputation saved (from {stats.num_runs} past runs)"
+                )
             
-        finally:
-            conn.close()
+            materialization = "TABLE" if model.auto_eager else "VIEW"
+            self.logger.info(
+                f"Creating federate model '{model.name}' as {materialization}{self._get_msg_extension()}, based on {reason}",
+                data={"model_name": model.name, "materialization": materialization, "num_downstreams": num_downstreams}
+            )
+
+    def _inline_federate_models(self, models_to_run: dict[str, DataModel]) -> None:
+        """
+        Inline the federate SQL models that are only queried by one downstream federate SQL model (and are not eager or needed 
+        in python) as CTEs of the downstream query. Chains of such models then run as a single statement, so DuckDB can 
+        optimize across models, and fewer views are created per request
+        """
+        is_sql_federate = lambda x: isinstance(x, FederateModel) and isinstance(x.compiled_query, mq.SqlModelQuery)
+        inlined: dict[str, str] = {}
+        for model in models_to_run.values():
+            if not (isinstance(model, FederateModel) and model.can_be_inlined):
+                continue
+            downstreams = [x for x in model.downstreams.values() if x.name in models_to_run]
+            if len(downstreams) == 1 and is_sql_federate(downstream := downstreams[0]):
+                assert isinstance(downstream, FederateModel)
+                model.inlined_into = downstream
+                inlined[model.name] = downstream.name
+        
+        if inlined:
+            inlined_str = ", ".join(f"'{name}' into '{downstream}'" for name, downstream in inlined.items())
+            self.logger.debug(f"Inlined federate models as CTEs of downstream models{self._get_msg_extension()}: {inlined_str}")
+
+    def _get_result_readers(self, models_to_run: dict[str, DataModel]) -> dict[str, set[str]]:
+        """
+        Get the names of the models that read the result of each model when they run. These are the downstreams of the model,
+        and the models that query a downstream view (directly or through other views)
+        """
+        readers: dict[str, set[str]] = {}
+        def get_readers(model: DataModel) -> set[str]:
+            if model.name not in readers:
+                model_readers = set()
+                for downstream in model.downstreams.values():
+                    if downstream.name not in models_to_run:
+                        continue
+                    model_readers.add(downstream.name)
+                    if downstream.is_view:
+                        model_readers.update(get_readers(downstream))
+                readers[model.name] = model_readers
+            return readers[model.name]
+        
+        for model in models_to_run.values():
+            get_readers(model)
+        return readers
+
+    async def _schedule_models(self, conn: duckdb.DuckDBPyConnection, terminal_nodes: set[str]) -> None:
+        """
+        Runs the models with at most max_workers models at a time. Ready models on the longest path to the target run first.
+
+        Unless release_results is False, the result of a model (other than the target) is released as soon as all models that 
+        read it have finished. Results are registered in DuckDB on the cursors of the models that read them, which are closed 
+        after running, so nothing else keeps the results in memory.
+        """
+        start = time.time()
+        models_to_run = self._get_models_to_run()
+        self._decide_auto_eager_models(models_to_run)
+        self._inline_federate_models(models_to_run)
+        remaining_upstreams = {name: len(model.upstreams) for name, model in models_to_run.items()}
+
+        results_read_by: dict[str, list[str]] = {}
+        remaining_readers: dict[str, int] = {}
+        if self.release_results:
+            for name, readers in self._get_result_readers(models_to_run).items():
+                if name == self.target_model.name:
+                    continue
+                remaining_readers[name] = len(readers)
+                for reader in readers:
+                    results_read_by.setdefault(reader, []).append(name)
+        
+        def release_results_read_by(model: DataModel) -> None:
+            for name in results_read_by.get(model.name, []):
+                remaining_readers[name] -= 1
+                if remaining_readers[name] == 0:
+                    models_to_run[name].result = None
+
+        ready: list[tuple[int, str]] = []
+        def add_ready_model(model: DataModel) -> None:
+            path_length = model.get_max_path_length_to_target() or 0
+            heapq.heappush(ready, (-path_length, model.name))
+        
+        for model_name in terminal_nodes:
+            add_ready_model(models_to_run[model_name])
+
+        async def run_model(model: DataModel) -> DataModel:
+            model_start = time.time()
+            await model.run_model(conn, self.placeholders)
+            self.node_timings[model.name] = NodeTiming(model_start, time.time())
+            if isinstance(model, FederateModel) and model.num_rows_materialized is not None:
+                stats = self.model_run_stats.setdefault(model.name, ModelRunStats())
+                stats.record(self.node_timings[model.name].duration, model.num_rows_materialized)
+            return model
+
+        running: set[asyncio.Task[DataModel]] = set()
+        try:
+            while ready or running:
+                while ready and len(running) < max(self.max_workers, 1):
+                    _, model_name = heapq.heappop(ready)
+                    running.add(asyncio.create_task(run_model(models_to_run[model_name])))
+                
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    model = task.result()
+                    release_results_read_by(model)
+                    for downstream in model.downstreams.values():
+                        if downstream.name not in remaining_upstreams:
+                            continue
+                        remaining_upstreams[downstream.name] -= 1
+                        if remaining_upstreams[downstream.name] == 0:
+                            add_ready_model(downstream)
+        except BaseException:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            raise
+
+        total_work = sum(timing.duration for timing in self.node_timings.values())
+        self.logger.log_activity_time(
+            "running data models" + self._get_msg_extension(), start, 
+            additional_data={
+                "activity": "running data models",
+                "critical_path_ms": round(self._get_critical_path_length(models_to_run) * 10**3, 3),
+                "total_work_ms": round(total_work * 10**3, 3),
+                "max_workers": self.max_workers
+            }
+        )
     
     async def execute(
         self, param_args: ParametersArgs, param_cfg_set: ParameterConfigsSet, context_func: ContextFunc, user: AbstractUser, selections: dict[str, str], 
@@ -1123,7 +1521,7 @@ class ModelsIO:
             config = mc.DbviewModelConfig(**config_dict).finalize_connection(default_conn_name=default_conn_name)
             return config
         elif model_type == ModelType.FEDERATE:
-            return mc.FederateModelConfig(**config_dict)
+            return mc.FederateModelConfig(**config_dict).finalize_eager(default_eager=env_vars.federates_default_eager)
         elif model_type == ModelType.BUILD:
             return mc.BuildModelConfig(**config_dict)
         else:
@@ -1,12 +1,14 @@
 from dotenv import dotenv_values, load_dotenv
 from pathlib import Path
-import asyncio, typing as t, functools as ft, shutil, json, os
+import asyncio, typing as t, functools as ft, shutil, json, os, time
 import sqlglot, sqlglot.expressions, duckdb, polars as pl
 
 from ._auth import Authenticator, AuthProviderArgs, ProviderFunctionType
 from ._schemas.auth_models import CustomUserFields, AbstractUser, GuestUser, RegisteredUser
 from ._schemas import response_models as rm
 from ._model_builder import ModelBuilder
+from ._duckdb_pool import DuckDBConnectionPool
+from ._result_cache import CacheBackend, get_oldest_disk_cache_vdl_snapshot_id
 from ._env_vars import SquirrelsEnvVars
 from ._exceptions import InvalidInputError, ConfigurationError
 from ._py_module import PyModule
@@ -43,7 +45,17 @@ class SquirrelsProject:
         self._vdl_catalog_db_path = self._env_vars.vdl_catalog_db_path
         
         self._logger = self._get_logger(project_path, self._env_vars, log_to_file, log_level, log_format)
-        self._ensure_virtual_datalake_exists(project_path, self._vdl_catalog_db_path, self._env_vars.vdl_data_path)
+        keep_vdl_snapshots_since = get_oldest_disk_cache_vdl_snapshot_id(
+            self._env_vars.result_cache_disk_path
+        ) if self._env_vars.result_cache_backend == "disk" else None
+        self._ensure_virtual_datalake_exists(
+            project_path, self._vdl_catalog_db_path, self._env_vars.vdl_data_path, keep_vdl_snapshots_since
+        )
+
+        self._dag_templates: dict[str, m.DAGTemplate] = {}
+        self._model_run_stats: dict[str, m.ModelRunStats] = {}
+        self._result_caches: list[CacheBackend] = []
+        self._post_build_hooks: list[t.Callable[[], None]] = []
     
     @staticmethod
     def _load_env_vars(project_path: str, load_dotenv_globally: bool) -> dict[str, str]:
@@ -69,7 +81,9 @@ class SquirrelsProject:
         return l.get_logger(filepath, log_to_file, log_level, log_format, log_file_size_mb, log_file_backup_count)
 
     @staticmethod
-    def _ensure_virtual_datalake_exists(project_path: str, vdl_catalog_db_path: str, vdl_data_path: str) -> None:
+    def _ensure_virtual_datalake_exists(
+        project_path: str, vdl_catalog_db_path: str, vdl_data_path: str, keep_vdl_snapshots_since: int | None = None
+    ) -> None:
         target_path = u.Path(project_path, c.TARGET_FOLDER)
         target_path.mkdir(parents=True, exist_ok=True)
 
@@ -81,8 +95,15 @@ class SquirrelsProject:
             attach_stmt = f"ATTACH '{vdl_catalog_db_path}' AS vdl {options}"
             with duckdb.connect() as conn:
                 conn.execute(attach_stmt)
-                # TODO: support incremental loads for build models and avoid cleaning up old files all the time
-                conn.execute("CALL ducklake_expire_snapshots('vdl', older_than => now())")
+                # TODO: avoid cleaning up old files all the time
+                # Snapshots since the latest invalidation of the disk caches are kept, so they can be invalidated selectively
+                keep_since = conn.execute(
+                    "SELECT snapshot_time FROM ducklake_snapshots('vdl') WHERE snapshot_id = ?", [keep_vdl_snapshots_since]
+                ).fetchone() if keep_vdl_snapshots_since is not None else None
+                if keep_since is not None:
+                    conn.execute("CALL ducklake_expire_snapshots('vdl', older_than => ?)", [keep_since[0]])
+                else:
+                    conn.execute("CALL ducklake_expire_snapshots('vdl', older_than => now())")
                 conn.execute("CALL ducklake_cleanup_old_files('vdl', cleanup_all => true)")
         
         except Exception as e:
@@ -138,7 +159,16 @@ class SquirrelsProject:
     
     @ft.cached_property
     def _conn_set(self) -> cs.ConnectionSet:
-        return cs.ConnectionSetIO.load_from_file(self._logger, self._project_path, self._manifest_cfg, self._conn_args)
+        return cs.ConnectionSetIO.load_from_file(
+            self._logger, self._project_path, self._manifest_cfg, self._conn_args, env_vars=self._env_vars
+        )
+    
+    @ft.cached_property
+    def _duckdb_pool(self) -> DuckDBConnectionPool:
+        return DuckDBConnectionPool(
+            self._vdl_catalog_db_path, self._conn_set, self._env_vars.duckdb_pool_size, self._env_vars.duckdb_pool_health_check, 
+            logger=self._logger
+        )
     
     @ft.cached_property
     def _custom_user_fields_cls_and_provider_functions(self) -> tuple[type[CustomUserFields], list[ProviderFunctionType]]:
@@ -214,6 +244,8 @@ class SquirrelsProject:
         """
         Deliberately close any open resources within the Squirrels project, such as database connections (instead of relying on the garbage collector).
         """
+        if "_duckdb_pool" in self.__dict__:
+            self._duckdb_pool.clear()
         self._conn_set.dispose()
         self._auth.close()
 
@@ -227,60 +259,221 @@ class SquirrelsProject:
         models_dict[model.name] = model
     
 
-    def _get_static_models(self) -> dict[str, m.StaticModel]:
+    def _get_static_models(self, model_names: t.AbstractSet[str] | None = None) -> dict[str, m.StaticModel]:
         models_dict: dict[str, m.StaticModel] = {}
+        is_selected = lambda name: model_names is None or name in model_names
 
         seeds_dict = self._seeds.get_dataframes()
         for key, seed in seeds_dict.items():
-            self._add_model(models_dict, m.Seed(key, seed.config, seed.df, logger=self._logger, conn_set=self._conn_set))
+            if is_selected(key):
+                self._add_model(models_dict, m.Seed(key, seed.config, seed.df, logger=self._logger, conn_set=self._conn_set))
 
         for source_name, source_config in self._sources.sources.items():
-            self._add_model(models_dict, m.SourceModel(source_name, source_config, logger=self._logger, conn_set=self._conn_set))
+            if is_selected(source_name):
+                self._add_model(models_dict, m.SourceModel(source_name, source_config, logger=self._logger, conn_set=self._conn_set))
 
         for name, val in self._build_model_files.items():
-            model = m.BuildModel(name, val.config, val.query_file, logger=self._logger, conn_set=self._conn_set, j2_env=self._j2_env) 
-            self._add_model(models_dict, model)
+            if is_selected(name):
+                model = m.BuildModel(name, val.config, val.query_file, logger=self._logger, conn_set=self._conn_set, j2_env=self._j2_env)
+                self._add_model(models_dict, model)
 
         return models_dict
 
 
-    async def build(self, *, full_refresh: bool = False, select: str | None = None) -> None:
+    async def build(
+        self, *, full_refresh: bool = False, select: str | None = None, exclude: str | None = None, threads: int | None = None
+    ) -> None:
         """
         Build the Virtual Data Lake (VDL) for the Squirrels project
 
         Arguments:
-            full_refresh: Whether to drop all tables and rebuild the VDL from scratch. Default is False.
-            select: The name of a specific model to build. If None, all models are built. Default is None.
+            full_refresh: Whether to drop all tables and rebuild the VDL from scratch (including models that are unchanged since their last build). Default is False.
+            select: Comma-separated selectors of the models to build. A selector is a model name, optionally with "+" before it to include all its upstream models, and/or "+" after it to include all its downstream models. If None, all models are built. Default is None.
+            exclude: Comma-separated selectors of the models to not build (with the same syntax as "select"). Default is None.
+            threads: The max number of models to build concurrently. If None, the SQRL_VDL__BUILD_THREADS environment variable is used. Default is None.
         """
         models_dict: dict[str, m.StaticModel] = self._get_static_models()
-        builder = ModelBuilder(self._vdl_catalog_db_path, self._conn_set, models_dict, self._conn_args, self._logger)
-        await builder.build(full_refresh, select)
+        threads = self._env_vars.vdl_build_threads if threads is None else threads
+        build_state_path = str(u.Path(self._project_path, c.TARGET_FOLDER, c.BUILD_STATE_FILE))
+        builder = ModelBuilder(
+            self._vdl_catalog_db_path, self._conn_set, models_dict, self._conn_args, self._logger, threads, build_state_path
+        )
+        
+        vdl_snapshot_id = self._get_current_vdl_snapshot_id() if self._result_caches else None
+        
+        # Pooled connections keep the VDL attached, which may block the build and may not see the newly built data
+        self._duckdb_pool.clear()
+        try:
+            await builder.build(full_refresh, select, exclude)
+        finally:
+            self._duckdb_pool.clear()
+            if self._result_caches:
+                self._invalidate_result_caches(vdl_snapshot_id)
+        
+        for hook in self._post_build_hooks:
+            hook()
+
+    def _get_current_vdl_snapshot_id(self) -> int | None:
+        if not self._vdl_catalog_db_path.startswith("ducklake:"):
+            return None
+        with self._duckdb_pool.connection() as conn:
+            return u.get_current_vdl_snapshot_id(conn)
 
-    def _get_models_dict(self, always_python_df: bool) -> dict[str, m.DataModel]:
-        models_dict: dict[str, m.DataModel] = self._get_static_models()
+    def _invalidate_result_caches(self, prior_vdl_snapshot_id: int | None, caches: list[CacheBackend] | None = None) -> None:
+        """
+        Invalidate the cached results that read the tables of the VDL that changed since the prior snapshot. All cached results 
+        are invalidated if the changes are unknown (such as when the VDL is not a DuckLake or the prior snapshot expired)
+        """
+        start = time.time()
+        vdl_snapshot_id, changed_models = None, None
+        if self._vdl_catalog_db_path.startswith("ducklake:"):
+            with self._duckdb_pool.connection() as conn:
+                vdl_snapshot_id = u.get_current_vdl_snapshot_id(conn)
+                if prior_vdl_snapshot_id is not None and vdl_snapshot_id is not None:
+                    changed_models = u.get_vdl_tables_changed_since(conn, prior_vdl_snapshot_id)
         
+        caches = self._result_caches if caches is None else caches
+        num_invalidated = sum(cache.invalidate(changed_models, vdl_snapshot_id) for cache in caches)
+        self._logger.info(
+            f"Invalidated {num_invalidated} cached results for changes to the VDL", 
+            data={
+                "vdl_snapshot_id": vdl_snapshot_id, "changed_models": sorted(changed_models) if changed_models is not None else None,
+                "num_invalidated": num_invalidated
+            }
+        )
+        self._logger.log_activity_time("invalidating result caches", start)
+
+    def _register_post_build_hook(self, hook: t.Callable[[], None]) -> None:
+        """
+        Register a function to call after every successful build (such as to warm the result caches again)
+        """
+        self._post_build_hooks.append(hook)
+
+    def _register_result_cache(self, cache: CacheBackend) -> None:
+        """
+        Register a result cache to invalidate after builds. Caches that persist across restarts (like the disk cache) are 
+        invalidated if the VDL changed since their latest invalidation
+        """
+        self._result_caches.append(cache)
+        if len(cache) > 0 and cache.vdl_snapshot_id != self._get_current_vdl_snapshot_id():
+            self._invalidate_result_caches(cache.vdl_snapshot_id, [cache])
+
+    def _get_user_from_test_set(self, test_set: mf.TestSetsConfig) -> AbstractUser:
+        # Separate base fields from custom fields
+        access_level = test_set.user.access_level
+        custom_fields = self._auth.CustomUserFields(**test_set.user.custom_fields)
+        if access_level == "guest":
+            return GuestUser(username="", custom_fields=custom_fields)
+        else:
+            return RegisteredUser(username="", access_level=access_level, custom_fields=custom_fields)
+
+    def _get_models_dict(self, always_python_df: bool, model_names: t.AbstractSet[str] | None = None) -> dict[str, m.DataModel]:
+        models_dict: dict[str, m.DataModel] = self._get_static_models(model_names)
+        is_selected = lambda name: model_names is None or name in model_names
+
         for name, val in self._dbview_model_files.items():
+            if not is_selected(name):
+                continue
             self._add_model(models_dict, m.DbviewModel(
                 name, val.config, val.query_file, logger=self._logger, conn_set=self._conn_set, j2_env=self._j2_env
             ))
             models_dict[name].needs_python_df = always_python_df
-        
+
         for name, val in self._federate_model_files.items():
+            if not is_selected(name):
+                continue
             self._add_model(models_dict, m.FederateModel(
                 name, val.config, val.query_file, logger=self._logger, conn_set=self._conn_set, j2_env=self._j2_env
             ))
             models_dict[name].needs_python_df = always_python_df
-        
+
         return models_dict
-    
+
+    def _get_static_dependencies_of_query_file(self, query_file_with_config: mq.QueryFileWithConfig, func_names: list[str]) -> set[str] | None:
+        config = query_file_with_config.config
+        assert isinstance(config, mc.QueryModelConfig)
+        dependencies = set(config.depends_on)
+        for col in config.columns:
+            if col.pass_through:
+                dependencies.update(x.split('.')[0] for x in col.depends_on)
+
+        query_file = query_file_with_config.query_file
+        if isinstance(query_file, mq.SqlQueryFile):
+            try:
+                # Macros are included since they may call ref() / source() as well
+                refs = u.get_constant_args_of_calls(self._j2_env, self._j2_env._macros + query_file.raw_query, func_names)
+            except u.j2.TemplateSyntaxError:
+                return None # let the error surface at compile time
+            if refs is None:
+                return None
+            dependencies.update(refs)
+
+        return dependencies
+
+    @ft.cached_property
+    def _static_dependencies(self) -> dict[str, set[str] | None]:
+        """
+        The dependencies of all models that can be found without compiling them. Build models include their buildtime
+        dependencies since they are needed for pass-through column metadata. A value of None means the dependencies can
+        only be found at compile time.
+        """
+        static_dependencies: dict[str, set[str] | None] = {}
+
+        def add_dependencies(name: str, dependencies: set[str] | None) -> None:
+            if name in static_dependencies:
+                raise ConfigurationError(f"Names across all models must be unique. Model '{name}' is duplicated")
+            static_dependencies[name] = dependencies
+
+        for name in self._seeds.get_dataframes():
+            add_dependencies(name, set())
+        for name in self._sources.sources:
+            add_dependencies(name, set())
+        for name, val in self._build_model_files.items():
+            add_dependencies(name, self._get_static_dependencies_of_query_file(val, ["ref"]))
+        for name, val in self._dbview_model_files.items():
+            add_dependencies(name, self._get_static_dependencies_of_query_file(val, ["source", "ref"]))
+        for name, val in self._federate_model_files.items():
+            add_dependencies(name, self._get_static_dependencies_of_query_file(val, ["ref"]))
+
+        return static_dependencies
+
+    def _compile_sql_templates(self, model_names: t.AbstractSet[str]) -> None:
+        for model_files in [self._build_model_files, self._dbview_model_files, self._federate_model_files]:
+            for name, val in model_files.items():
+                if name in model_names and isinstance(val.query_file, mq.SqlQueryFile):
+                    try:
+                        val.query_file.get_template(self._j2_env)
+                    except u.j2.TemplateSyntaxError:
+                        pass # let the error surface at compile time
+
+    def _get_dag_template(self, dataset: str) -> m.DAGTemplate:
+        if dataset not in self._dag_templates:
+            start = time.time()
+            dataset_config = self._manifest_cfg.datasets[dataset]
+            template = m.DAGTemplate.from_static_dependencies(dataset_config, self._static_dependencies)
+            self._compile_sql_templates(template.model_names)
+            self._dag_templates[dataset] = template
+            self._logger.log_activity_time(f"creating DAG template for dataset '{dataset}'", start)
+        return self._dag_templates[dataset]
+
+    def _get_auto_eager_kwargs(self) -> dict[str, t.Any]:
+        return {
+            "model_run_stats": self._model_run_stats,
+            "auto_eager_max_rows": self._env_vars.federates_auto_eager_max_rows,
+            "auto_eager_min_saved_ms": self._env_vars.federates_auto_eager_min_saved_ms,
+        }
+
     def _generate_dag(self, dataset: str) -> m.DAG:
-        models_dict = self._get_models_dict(always_python_df=False)
-        
-        dataset_config = self._manifest_cfg.datasets[dataset]
-        target_model = models_dict[dataset_config.model]
+        template = self._get_dag_template(dataset)
+        models_dict = self._get_models_dict(always_python_df=False, model_names=template.model_names)
+
+        target_model = models_dict[template.dataset.model]
         target_model.is_target = True
-        dag = m.DAG(dataset_config, target_model, models_dict, self._vdl_catalog_db_path, self._logger)
-        
+        dag = m.DAG(
+            template.dataset, target_model, models_dict, self._vdl_catalog_db_path, self._logger, template=template, 
+            duckdb_pool=self._duckdb_pool, max_workers=self._env_vars.datasets_max_workers, **self._get_auto_eager_kwargs()
+        )
+
         return dag
     
     def _generate_dag_with_fake_target(self, sql_query: str | None, *, always_python_df: bool = False) -> m.DAG:
@@ -319,7 +512,10 @@ class SquirrelsProject:
             "__fake_target", model_config, query_file, logger=self._logger, conn_set=self._conn_set, j2_env=self._j2_env
         )
         fake_target_model.is_target = True
-        dag = m.DAG(None, fake_target_model, models_dict, self._vdl_catalog_db_path, self._logger)
+        dag = m.DAG(
+            None, fake_target_model, models_dict, self._vdl_catalog_db_path, self._logger, duckdb_pool=self._duckdb_pool, 
+            max_workers=self._env_vars.datasets_max_workers, **self._get_auto_eager_kwargs()
+        )
         return dag
     
     async def _get_compiled_dag(
@@ -477,19 +673,14 @@ class SquirrelsProject:
 
                 # Build user and selections from test set config if present
                 ts_conf = self._manifest_cfg.selection_test_sets.get(ts_name, self._manifest_cfg.get_default_test_set())
-                # Separate base fields from custom fields
-                access_level = ts_conf.user.access_level
-                custom_fields = self._auth.CustomUserFields(**ts_conf.user.custom_fields)
-                if access_level == "guest":
-                    user = GuestUser(username="", custom_fields=custom_fields)
-                else:
-                    user = RegisteredUser(username="", access_level=access_level, custom_fields=custom_fields)
+                user = self._get_user_from_test_set(ts_conf)
 
                 # Generate DAG across all models. When runquery=True, force models to produce Python dataframes so CSVs can be written.
                 dag = await self._get_compiled_dag(
                     user=user, selections=ts_conf.parameters, configurables=ts_conf.configurables, always_python_df=runquery,
                 )
                 if runquery:
+                    dag.release_results = False # the results of all models are written to CSV files
                     await dag._run_models()
 
                 # Prepare output folders
@@ -598,18 +789,51 @@ class SquirrelsProject:
         # Collect max_rows + 1 to detect overflow without loading unbounded results
         collected = lazy_df.limit(max_rows + 1).collect()
         row_count = collected.select(pl.len()).item()
-        
+        self._check_max_result_rows(row_count, error_type)
+        return collected
+    
+    def _check_max_result_rows(self, row_count: int, error_type: str) -> None:
+        max_rows = self._env_vars.datasets_max_rows_output
         if row_count > max_rows:
             raise InvalidInputError(
                 413, f"{error_type}_result_too_large",
                 f"The {error_type} result contains {row_count} rows, which exceeds the maximum allowed of {max_rows} rows."
             )
-        
-        return collected
+    
+    def _set_target_rows_to_load(self, target_model: m.DataModel, offset: int, limit: int | None) -> None:
+        """
+        Push the row cap, or the requested page of rows, down to the query that loads the target model from DuckDB. For a
+        page, the rows of the full result are counted by a separate query instead of being loaded.
+        """
+        if offset > 0 or limit is not None:
+            target_model.row_offset, target_model.row_limit = offset, limit
+            target_model.count_total_rows = True
+        else:
+            target_model.row_limit = self._env_vars.datasets_max_rows_output + 1
+    
+    def _get_target_result_df(
+        self, target_model: m.DataModel, error_type: str, offset: int, limit: int | None
+    ) -> tuple[pl.DataFrame, int | None]:
+        """
+        Get the requested rows of the target model's result (with the "_row_num" column), and the number of rows of the full 
+        result if only a page was requested
+        """
+        assert isinstance(target_model.result, pl.LazyFrame)
+        is_page = offset > 0 or limit is not None
+        total_num_rows = target_model.total_num_rows
+        if total_num_rows is not None:
+            self._check_max_result_rows(total_num_rows, error_type)
+            df = target_model.result.collect()
+        else:
+            # The result was not loaded from DuckDB (such as for python or dbview models), so the page is taken in polars
+            df = self._enforce_max_result_rows(target_model.result, error_type)
+            total_num_rows = df.height if is_page else None
+            df = df.slice(offset, limit) if is_page else df
+        return df.with_row_index("_row_num", offset=offset+1), total_num_rows
     
     async def dataset(
         self, name: str, *, selections: dict[str, t.Any] = {}, user: AbstractUser | None = None, require_auth: bool = True,
-        configurables: dict[str, str] = {}
+        configurables: dict[str, str] = {}, offset: int = 0, limit: int | None = None
     ) -> dr.DatasetResult:
         """
         Async method to retrieve a dataset as a DatasetResult object (with metadata) given parameter selections.
@@ -618,6 +842,8 @@ class SquirrelsProject:
             name: The name of the dataset to retrieve.
             selections: A dictionary of parameter selections to apply to the dataset. Optional, default is empty dictionary.
             user: The user to use for authentication. If None, no user is used. Optional, default is None.
+            offset: The number of rows to skip. Optional, default is 0.
+            limit: The maximum number of rows to retrieve after the offset. If None, all rows are retrieved. Optional, default is None.
         
         Returns:
             A DatasetResult object containing the dataset result (as a polars DataFrame), its description, and the column details.
@@ -630,15 +856,19 @@ class SquirrelsProject:
             raise self._permission_error(user, "dataset", name, scope.name)
         
         dag = self._generate_dag(name)
+        self._set_target_rows_to_load(dag.target_model, offset, limit)
         configurables = {**self._manifest_cfg.get_default_configurables(name), **configurables}
         await dag.execute(
             self._param_args, self._param_cfg_set, self._context_func, user, dict(selections), configurables=configurables
         )
-        assert isinstance(dag.target_model.result, pl.LazyFrame)
-        df = self._enforce_max_result_rows(dag.target_model.result, "dataset")
+        df, total_num_rows = self._get_target_result_df(dag.target_model, "dataset", offset, limit)
         return dr.DatasetResult(
             target_model_config=dag.target_model.model_config, 
-            df=df.with_row_index("_row_num", offset=1)
+            df=df,
+            total_num_rows=total_num_rows,
+            vdl_snapshot_id=dag.vdl_snapshot_id,
+            static_models=dag.get_static_models_read(),
+            dependencies=dag.get_dependencies()
         )
     
     async def dashboard(
@@ -678,18 +908,22 @@ class SquirrelsProject:
             raise KeyError(f"No dashboard file found for: {name}")
     
     async def query_models(
-        self, sql_query: str, *, user: AbstractUser | None = None, selections: dict[str, t.Any] = {}, configurables: dict[str, str] = {}
+        self, sql_query: str, *, user: AbstractUser | None = None, selections: dict[str, t.Any] = {}, configurables: dict[str, str] = {},
+        offset: int = 0, limit: int | None = None
     ) -> dr.DatasetResult:
         if user is None:
             user = self._guest_user
         
         dag = await self._get_compiled_dag(user=user, sql_query=sql_query, selections=selections, configurables=configurables)
+        self._set_target_rows_to_load(dag.target_model, offset, limit)
         await dag._run_models()
-        assert isinstance(dag.target_model.result, pl.LazyFrame)
-        df = self._enforce_max_result_rows(dag.target_model.result, "query")
+        df, total_num_rows = self._get_target_result_df(dag.target_model, "query", offset, limit)
         return dr.DatasetResult(
             target_model_config=dag.target_model.model_config, 
-            df=df.with_row_index("_row_num", offset=1)
+            df=df,
+            total_num_rows=total_num_rows,
+            vdl_snapshot_id=dag.vdl_snapshot_id,
+            static_models=dag.get_static_models_read()
         )
 
     async def get_compiled_model_query(
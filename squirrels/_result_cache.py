@@ -0,0 +1,753 @@
+from typing import AbstractSet, Any, Callable, Hashable, Iterator, Literal
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from contextlib import contextmanager
+from pydantic import BaseModel
+import abc, os, sys, time, json, uuid, asyncio, hashlib, sqlite3, threading, polars as pl
+
+from . import _utils as u
+from ._dashboards import Dashboard, PngDashboard, HtmlDashboard
+from ._dataset_types import DatasetResult
+from ._dependency_tracker import DatasetDependencies
+from ._model_configs import ModelConfig
+
+
+def get_estimated_size(value: Any) -> int:
+    """
+    Get the estimated size of a cached result in bytes. Results that track their own memory (such as dataset results)
+    implement an "estimated_size" method.
+    """
+    estimated_size = getattr(value, "estimated_size", None)
+    if callable(estimated_size):
+        return int(estimated_size())
+    if isinstance(value, Dashboard):
+        return len(value._content)
+    return sys.getsizeof(value)
+
+
+@dataclass(frozen=True)
+class CacheTags:
+    """
+    The Virtual Data Lake (VDL) snapshot that a cached result was computed from, and the names of the static models 
+    (sources, seeds, and build models) that it read
+    """
+    vdl_snapshot_id: int
+    static_models: frozenset[str]
+
+
+def get_cache_tags(value: Any) -> CacheTags | None:
+    """
+    Get the tags of a result to cache. Only dataset results computed from a DuckLake VDL have tags
+    """
+    if isinstance(value, DatasetResult) and value.vdl_snapshot_id is not None:
+        return CacheTags(value.vdl_snapshot_id, value.static_models)
+    return None
+
+
+def _is_invalidated(tags: CacheTags | None, changed_models: AbstractSet[str] | None, vdl_snapshot_id: int | None) -> bool:
+    if tags is None or vdl_snapshot_id is None:
+        return True
+    if tags.vdl_snapshot_id >= vdl_snapshot_id:
+        return False
+    return changed_models is None or not changed_models.isdisjoint(tags.static_models)
+
+
+@dataclass
+class CacheStats:
+    name: str
+    entries: int
+    size_bytes: int
+    max_entries: int
+    max_size_bytes: int
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    rejections: int = 0
+    invalidations: int = 0
+    stale_hits: int = 0
+
+
+@dataclass
+class CacheLookup:
+    """
+    The result of looking up a key that allows stale entries
+
+    Attributes:
+        value: The cached value
+        needs_refresh: Whether the entry is stale (expired but within the max staleness), or is frequently used and about to expire
+    """
+    value: Any
+    needs_refresh: bool
+
+
+class CacheBackend(metaclass=abc.ABCMeta):
+    """
+    Abstract parent class for the backends of the result caches used by the API routes
+    """
+
+    @abc.abstractmethod
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get the value for the key if it exists and has not expired, or the default otherwise
+        """
+        pass
+
+    @abc.abstractmethod
+    def lookup(self, key: Hashable) -> CacheLookup | None:
+        """
+        Get the value for the key if it exists and has not expired for longer than the max staleness, along with whether it 
+        should be refreshed
+        """
+        pass
+
+    @abc.abstractmethod
+    def set(self, key: Hashable, value: Any, *, cost: float = 1.0) -> None:
+        """
+        Add or replace the value for the key. A replaced entry keeps its access frequency
+
+        Arguments:
+            key: The cache key
+            value: The result to cache
+            cost: The cost of computing the value again (such as the time it took in seconds)
+        """
+        pass
+
+    async def lookup_async(self, key: Hashable) -> CacheLookup | None:
+        """
+        Same as "lookup", for use in async code. Backends that block on I/O run it in a separate thread
+        """
+        return self.lookup(key)
+
+    async def set_async(self, key: Hashable, value: Any, *, cost: float = 1.0) -> None:
+        """
+        Same as "set", for use in async code. Backends that block on I/O run it in a separate thread
+        """
+        self.set(key, value, cost=cost)
+
+    @abc.abstractmethod
+    def __contains__(self, key: Hashable) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def get_stats(self) -> CacheStats:
+        """
+        Get a snapshot of the statistics of the cache
+        """
+        pass
+
+    @abc.abstractmethod
+    def invalidate(self, changed_models: AbstractSet[str] | None, vdl_snapshot_id: int | None) -> int:
+        """
+        Remove the entries that are outdated by a build of the Virtual Data Lake (VDL). 
+        
+        Tagged entries from an older snapshot are removed if they read any of the changed models. Untagged entries are 
+        always removed. Tagged results from an older snapshot that read a changed model are not cached afterwards.
+
+        Arguments:
+            changed_models: The names of the tables of the VDL that changed, or None if unknown (all are considered changed)
+            vdl_snapshot_id: The id of the current snapshot of the VDL, or None if the VDL is not a DuckLake
+        
+        Returns:
+            The number of entries removed
+        """
+        pass
+
+    @property
+    @abc.abstractmethod
+    def num_invalidations(self) -> int:
+        """
+        The number of times that the cache was invalidated. Used to avoid caching untagged results computed before a build ended
+        """
+        pass
+
+    @property
+    @abc.abstractmethod
+    def vdl_snapshot_id(self) -> int | None:
+        """
+        The id of the VDL snapshot from the latest invalidation, if any
+        """
+        pass
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    size: int
+    cost: float
+    expires_at: float
+    frequency: int = 1
+    priority: float = 0.0
+    tags: CacheTags | None = None
+
+
+@dataclass
+class ResultCache(CacheBackend):
+    """
+    An in-memory TTL cache for results that is bounded by both the number of entries and the estimated size of the entries in bytes.
+
+    When a bound is exceeded, entries are evicted by Greedy-Dual-Size-Frequency (GDSF), where the priority of an entry is
+    "inflation + frequency * cost / size". Small results that are expensive to compute and frequently used are kept over
+    large results that are cheap or rarely used. The inflation value is raised to the priority of every evicted entry, so
+    entries that are no longer used eventually age out.
+
+    Expired entries are kept for up to max_stale_seconds, during which "lookup" serves them as stale entries that need a refresh.
+    With refresh_ahead_seconds, entries that were hit at least refresh_ahead_min_hits times also need a refresh once they are
+    about to expire.
+
+    Attributes:
+        name: The name of the cache, used for logging and stats
+        max_entries: The maximum number of entries
+        max_size_bytes: The maximum total estimated size of the entries in bytes
+        ttl_seconds: The time-to-live of every entry in seconds
+        max_stale_seconds: How long expired entries can still be served by "lookup" in seconds
+        refresh_ahead_seconds: How long before expiring that frequently used entries need a refresh in seconds
+        refresh_ahead_min_hits: The minimum number of hits for an entry to be refreshed ahead of expiring
+    """
+    name: str
+    max_entries: int
+    max_size_bytes: int
+    ttl_seconds: float
+    max_stale_seconds: float = 0
+    refresh_ahead_seconds: float = 0
+    refresh_ahead_min_hits: int = 1
+    logger: u.Logger = field(default_factory=lambda: u.Logger(""))
+    getsizeof: Callable[[Any], int] = get_estimated_size
+    timer: Callable[[], float] = time.monotonic
+    _entries: dict[Hashable, _CacheEntry] = field(default_factory=dict, init=False)
+    _size_bytes: int = field(default=0, init=False)
+    _inflation: float = field(default=0.0, init=False)
+    _model_versions: dict[str, int] = field(default_factory=dict, init=False) # VDL snapshot of the latest change of each model
+    _num_invalidations: int = field(default=0, init=False)
+    _vdl_snapshot_id: int | None = field(default=None, init=False)
+    _stats: CacheStats = field(init=False)
+    _lock: threading.RLock = field(default_factory=threading.RLock, init=False)
+
+    def __post_init__(self) -> None:
+        self._stats = CacheStats(self.name, 0, 0, self.max_entries, self.max_size_bytes)
+
+    def _get_priority(self, entry: _CacheEntry) -> float:
+        return self._inflation + entry.frequency * entry.cost / max(entry.size, 1)
+
+    def _remove(self, key: Hashable) -> _CacheEntry:
+        entry = self._entries.pop(key)
+        self._size_bytes -= entry.size
+        return entry
+
+    def _expire(self) -> None:
+        now = self.timer()
+        for key in [key for key, entry in self._entries.items() if entry.expires_at + self.max_stale_seconds <= now]:
+            self._remove(key)
+            self._stats.expirations += 1
+
+    def _evict_until_within_bounds(self, keep: Hashable | None = None) -> None:
+        while len(self._entries) > self.max_entries or self._size_bytes > self.max_size_bytes:
+            candidates = [(entry.priority, key) for key, entry in self._entries.items() if key != keep]
+            if not candidates:
+                break
+            priority, key = min(candidates, key=lambda x: x[0])
+            entry = self._remove(key)
+            self._inflation = priority
+            self._stats.evictions += 1
+            self.logger.info(
+                f"Evicted entry of {entry.size} bytes from the {self.name} cache", data=asdict(self.get_stats())
+            )
+
+    def _lookup(self, key: Hashable, allow_stale: bool) -> CacheLookup | None:
+        with self._lock:
+            now = self.timer()
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at + self.max_stale_seconds <= now:
+                self._remove(key)
+                self._stats.expirations += 1
+                entry = None
+
+            is_stale = entry is not None and entry.expires_at <= now
+            if entry is None or (is_stale and not allow_stale):
+                self._stats.misses += 1
+                return None
+
+            self._stats.hits += 1
+            self._stats.stale_hits += int(is_stale)
+            entry.frequency += 1
+            needs_refresh = is_stale or (
+                entry.frequency > self.refresh_ahead_min_hits and entry.expires_at - now <= self.refresh_ahead_seconds
+            )
+
+            # Results like dataset results grow as serialized payloads get cached on them, so the size is measured again
+            new_size = self.getsizeof(entry.value)
+            self._size_bytes += new_size - entry.size
+            entry.size = new_size
+            entry.priority = self._get_priority(entry)
+            self._evict_until_within_bounds(keep=key)
+            return CacheLookup(entry.value, needs_refresh)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        lookup = self._lookup(key, allow_stale=False)
+        return lookup.value if lookup is not None else default
+
+    def lookup(self, key: Hashable) -> CacheLookup | None:
+        return self._lookup(key, allow_stale=True)
+
+    def set(self, key: Hashable, value: Any, *, cost: float = 1.0) -> None:
+        with self._lock:
+            frequency = self._remove(key).frequency if key in self._entries else 1
+
+            tags = get_cache_tags(value)
+            if tags is not None and self._is_outdated(tags):
+                self.logger.info(f"Result from an outdated VDL snapshot was not cached in the {self.name} cache")
+                return
+
+            size = self.getsizeof(value)
+            if size > self.max_size_bytes or self.max_entries <= 0:
+                self._stats.rejections += 1
+                self.logger.info(f"Result of {size} bytes is too large for the {self.name} cache and was not cached")
+                return
+
+            entry = _CacheEntry(value, size, cost, expires_at=self.timer() + self.ttl_seconds, frequency=frequency, tags=tags)
+            entry.priority = self._get_priority(entry)
+            self._entries[key] = entry
+            self._size_bytes += size
+
+            self._expire()
+            self._evict_until_within_bounds(keep=key)
+
+    def _is_outdated(self, tags: CacheTags) -> bool:
+        latest_change = max((self._model_versions.get(x, -1) for x in [*tags.static_models, "*"]), default=-1)
+        return latest_change > tags.vdl_snapshot_id
+
+    def invalidate(self, changed_models: AbstractSet[str] | None, vdl_snapshot_id: int | None) -> int:
+        with self._lock:
+            self._num_invalidations += 1
+            if vdl_snapshot_id is not None:
+                self._vdl_snapshot_id = vdl_snapshot_id
+                for model in (changed_models if changed_models is not None else ["*"]):
+                    self._model_versions[model] = vdl_snapshot_id
+            
+            invalidated_keys = [
+                key for key, entry in self._entries.items() if _is_invalidated(entry.tags, changed_models, vdl_snapshot_id)
+            ]
+            for key in invalidated_keys:
+                self._remove(key)
+            self._stats.invalidations += len(invalidated_keys)
+            return len(invalidated_keys)
+
+    @property
+    def num_invalidations(self) -> int:
+        return self._num_invalidations
+
+    @property
+    def vdl_snapshot_id(self) -> int | None:
+        return self._vdl_snapshot_id
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.expires_at > self.timer()
+
+    def __len__(self) -> int:
+        with self._lock:
+            now = self.timer()
+            return sum(1 for entry in self._entries.values() if entry.expires_at > now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def get_stats(self) -> CacheStats:
+        with self._lock:
+            stats = CacheStats(**asdict(self._stats))
+            stats.entries = len(self._entries)
+            stats.size_bytes = self._size_bytes
+            return stats
+
+
+def _get_key_digest(key: Hashable) -> str:
+    """
+    Get a digest of the cache key that is stable across processes (unlike the built-in hash function)
+    """
+    def to_json_default(obj: Any) -> Any:
+        if isinstance(obj, BaseModel):
+            return obj.model_dump(mode="json")
+        return repr(obj)
+    
+    key_json = json.dumps(key, default=to_json_default, sort_keys=True)
+    return hashlib.sha256(key_json.encode()).hexdigest()
+
+
+def _get_dataset_result_metadata(result: DatasetResult) -> str:
+    dependencies = result.dependencies
+    metadata = {
+        "target_model_config": result.target_model_config.model_dump(mode="json"),
+        "total_num_rows": result.total_num_rows,
+        "dependencies": {
+            "parameters": sorted(dependencies.parameters), "configurables": sorted(dependencies.configurables), 
+            "user_fields": sorted(dependencies.user_fields)
+        } if dependencies is not None else None
+    }
+    return json.dumps(metadata)
+
+
+def _get_tags_from_row(vdl_snapshot_id: int | None, static_models: str | None) -> CacheTags | None:
+    if vdl_snapshot_id is None or static_models is None:
+        return None
+    return CacheTags(vdl_snapshot_id, frozenset(json.loads(static_models)))
+
+
+def get_oldest_disk_cache_vdl_snapshot_id(cache_path: str) -> int | None:
+    """
+    Get the oldest VDL snapshot that the disk caches in the cache path were last invalidated at. The snapshots since then
+    are needed to invalidate the disk caches selectively when the server starts again
+
+    Arguments:
+        cache_path: The folder for the disk caches
+    
+    Returns:
+        The snapshot id, or None if no disk cache was invalidated at a VDL snapshot
+    """
+    snapshot_ids = []
+    for index_path in Path(cache_path).glob("*/index.sqlite"):
+        try:
+            conn = sqlite3.connect(f"{index_path.as_uri()}?mode=ro", uri=True, timeout=30)
+            try:
+                row = conn.execute("SELECT value FROM cache_state WHERE name = 'vdl_snapshot_id'").fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            continue
+        if row is not None:
+            snapshot_ids.append(int(row[0]))
+    return min(snapshot_ids, default=None)
+
+
+@dataclass
+class DiskResultCache(CacheBackend):
+    """
+    A TTL cache for results stored as files on local disk, so it persists across restarts and is shared by all server
+    processes with the same cache path.
+
+    Dataset results are stored as Arrow IPC or Parquet files, and dashboards as PNG or HTML files. Other results are not
+    cached. The entries are indexed in a SQLite database, which also serializes the writes of concurrent processes through
+    its file locks. Files are written to a temporary path and renamed, so a reader never sees a partially written file.
+    Entries are evicted by Greedy-Dual-Size-Frequency (GDSF) based on the file sizes, like the in-memory ResultCache.
+
+    The async methods run the SQLite and file I/O in a separate thread, so they do not block the event loop. The number of
+    invalidations is kept in memory and refreshed from the index whenever it is read or written, so invalidations by other
+    processes are seen by the next lookup or set.
+
+    Attributes:
+        name: The name of the cache, used for the folder name, logging and stats
+        max_entries: The maximum number of entries
+        max_size_bytes: The maximum total size of the files in bytes
+        ttl_seconds: The time-to-live of every entry in seconds
+        cache_path: The folder for the caches. Each cache uses a subfolder named after the cache
+        file_format: The file format for dataset results, either "arrow" or "parquet"
+        max_stale_seconds: How long expired entries can still be served by "lookup" in seconds
+        refresh_ahead_seconds: How long before expiring that frequently used entries need a refresh in seconds
+        refresh_ahead_min_hits: The minimum number of hits for an entry to be refreshed ahead of expiring
+    """
+    name: str
+    max_entries: int
+    max_size_bytes: int
+    ttl_seconds: float
+    cache_path: str
+    file_format: Literal["arrow", "parquet"] = "arrow"
+    max_stale_seconds: float = 0
+    refresh_ahead_seconds: float = 0
+    refresh_ahead_min_hits: int = 1
+    logger: u.Logger = field(default_factory=lambda: u.Logger(""))
+    timer: Callable[[], float] = time.time
+    _folder: Path = field(init=False)
+    _stats: CacheStats = field(init=False)
+    _num_invalidations: int = field(default=0, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def __post_init__(self) -> None:
+        self._folder = Path(self.cache_path, self.name.replace(" ", "_"))
+        self._folder.mkdir(parents=True, exist_ok=True)
+        self._stats = CacheStats(self.name, 0, 0, self.max_entries, self.max_size_bytes)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, file_name TEXT NOT NULL, value_type TEXT NOT NULL, "
+                "metadata TEXT NOT NULL, size INTEGER NOT NULL, cost REAL NOT NULL, frequency INTEGER NOT NULL, "
+                "priority REAL NOT NULL, expires_at REAL NOT NULL, vdl_snapshot_id INTEGER, static_models TEXT)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_state (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO cache_state VALUES ('inflation', 0), ('invalidations', 0)")
+            conn.execute("CREATE TABLE IF NOT EXISTS model_versions (model TEXT PRIMARY KEY, vdl_snapshot_id INTEGER NOT NULL)")
+            self._refresh_num_invalidations(conn)
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self._folder / "index.sqlite", timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def _refresh_num_invalidations(self, conn: sqlite3.Connection) -> None:
+        (num_invalidations,) = conn.execute("SELECT value FROM cache_state WHERE name = 'invalidations'").fetchone()
+        self._num_invalidations = int(num_invalidations)
+    
+    def _remove_files(self, file_names: list[str]) -> None:
+        for file_name in file_names:
+            try:
+                os.remove(self._folder / file_name)
+            except OSError:
+                pass # already removed by another process, or still open on some platforms
+    
+    def _write_value(self, value: Any) -> tuple[str, str, str] | None:
+        if isinstance(value, DatasetResult):
+            value_type, extension, metadata = "dataset_result", self.file_format, _get_dataset_result_metadata(value)
+        elif isinstance(value, PngDashboard):
+            value_type, extension, metadata = "png_dashboard", "png", ""
+        elif isinstance(value, HtmlDashboard):
+            value_type, extension, metadata = "html_dashboard", "html", ""
+        else:
+            return None
+        
+        file_name = f"{uuid.uuid4().hex}.{extension}"
+        temp_path = self._folder / (file_name + ".tmp")
+        if isinstance(value, DatasetResult):
+            if self.file_format == "parquet":
+                value.df.write_parquet(temp_path)
+            else:
+                value.df.write_ipc(temp_path, compression="uncompressed")
+        elif isinstance(value, PngDashboard):
+            temp_path.write_bytes(value._content)
+        else:
+            temp_path.write_text(value._content, encoding="utf-8")
+        os.replace(temp_path, self._folder / file_name)
+        return file_name, value_type, metadata
+    
+    def _read_value(self, file_name: str, value_type: str, metadata: str, tags: CacheTags | None) -> Any:
+        file_path = self._folder / file_name
+        if value_type == "dataset_result":
+            df = pl.read_parquet(file_path) if file_name.endswith(".parquet") else pl.read_ipc(file_path, memory_map=False)
+            metadata_dict = json.loads(metadata)
+            dependencies = metadata_dict["dependencies"]
+            result = DatasetResult(
+                target_model_config=ModelConfig.model_validate(metadata_dict["target_model_config"]), df=df, 
+                total_num_rows=metadata_dict["total_num_rows"],
+                dependencies=DatasetDependencies(
+                    frozenset(dependencies["parameters"]), frozenset(dependencies["configurables"]), 
+                    frozenset(dependencies["user_fields"])
+                ) if dependencies is not None else None
+            )
+            if tags is not None:
+                result.vdl_snapshot_id, result.static_models = tags.vdl_snapshot_id, tags.static_models
+            return result
+        elif value_type == "png_dashboard":
+            return PngDashboard(file_path.read_bytes())
+        else:
+            return HtmlDashboard(file_path.read_text(encoding="utf-8"))
+    
+    def _delete_expired(self, conn: sqlite3.Connection) -> list[str]:
+        expired = conn.execute(
+            "SELECT key, file_name FROM entries WHERE expires_at <= ?", (self.timer() - self.max_stale_seconds,)
+        ).fetchall()
+        conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in expired])
+        self._stats.expirations += len(expired)
+        return [file_name for _, file_name in expired]
+    
+    def _evict_until_within_bounds(self, conn: sqlite3.Connection, keep: str) -> list[str]:
+        removed_files = []
+        while True:
+            num_entries, total_size = conn.execute("SELECT count(*), coalesce(sum(size), 0) FROM entries").fetchone()
+            if num_entries <= self.max_entries and total_size <= self.max_size_bytes:
+                break
+            candidate = conn.execute(
+                "SELECT key, file_name, size, priority FROM entries WHERE key != ? ORDER BY priority LIMIT 1", (keep,)
+            ).fetchone()
+            if candidate is None:
+                break
+            key, file_name, size, priority = candidate
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.execute("UPDATE cache_state SET value = ? WHERE name = 'inflation'", (priority,))
+            removed_files.append(file_name)
+            self._stats.evictions += 1
+            self.logger.info(f"Evicted entry of {size} bytes from the {self.name} disk cache")
+        return removed_files
+    
+    def _lookup(self, key: Hashable, allow_stale: bool) -> CacheLookup | None:
+        digest = _get_key_digest(key)
+        with self._lock, self._connect() as conn:
+            self._refresh_num_invalidations(conn)
+            now = self.timer()
+            row = conn.execute(
+                "SELECT file_name, value_type, metadata, expires_at, vdl_snapshot_id, static_models, frequency FROM entries "
+                "WHERE key = ?", (digest,)
+            ).fetchone()
+            
+            value, is_removable = None, row is not None and row[3] + self.max_stale_seconds <= now
+            is_stale = row is not None and row[3] <= now
+            self._stats.expirations += int(is_removable)
+            if row is not None and not is_removable and (allow_stale or not is_stale):
+                try:
+                    value = self._read_value(*row[:3], _get_tags_from_row(*row[4:6]))
+                except Exception as e:
+                    self.logger.warning(f"Failed to read cached result from the {self.name} disk cache: {e}")
+                    is_removable = True
+            
+            if value is None:
+                if row is not None and is_removable:
+                    conn.execute("DELETE FROM entries WHERE key = ? AND file_name = ?", (digest, row[0]))
+                    self._remove_files([row[0]])
+                self._stats.misses += 1
+                return None
+            
+            conn.execute(
+                "UPDATE entries SET frequency = frequency + 1, "
+                "priority = (SELECT value FROM cache_state WHERE name = 'inflation') + (frequency + 1) * cost / max(size, 1) "
+                "WHERE key = ?", (digest,)
+            )
+            self._stats.hits += 1
+            self._stats.stale_hits += int(is_stale)
+            needs_refresh = is_stale or (row[6] + 1 > self.refresh_ahead_min_hits and row[3] - now <= self.refresh_ahead_seconds)
+            return CacheLookup(value, needs_refresh)
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        lookup = self._lookup(key, allow_stale=False)
+        return lookup.value if lookup is not None else default
+    
+    def lookup(self, key: Hashable) -> CacheLookup | None:
+        return self._lookup(key, allow_stale=True)
+    
+    async def lookup_async(self, key: Hashable) -> CacheLookup | None:
+        return await asyncio.to_thread(self._lookup, key, True)
+    
+    def set(self, key: Hashable, value: Any, *, cost: float = 1.0) -> None:
+        if self.max_entries <= 0:
+            return
+        
+        written = self._write_value(value)
+        if written is None:
+            self.logger.info(f"Results of type {type(value).__name__} are not supported by the {self.name} disk cache")
+            return
+        
+        file_name, value_type, metadata = written
+        size = os.path.getsize(self._folder / file_name)
+        if size > self.max_size_bytes:
+            self._stats.rejections += 1
+            self.logger.info(f"Result of {size} bytes is too large for the {self.name} disk cache and was not cached")
+            self._remove_files([file_name])
+            return
+        
+        digest = _get_key_digest(key)
+        tags = get_cache_tags(value)
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh_num_invalidations(conn)
+                if tags is not None and self._is_outdated(conn, tags):
+                    conn.execute("ROLLBACK")
+                    self.logger.info(f"Result from an outdated VDL snapshot was not cached in the {self.name} disk cache")
+                    self._remove_files([file_name])
+                    return
+                
+                existing = conn.execute("SELECT file_name, frequency FROM entries WHERE key = ?", (digest,)).fetchone()
+                removed_files, frequency = ([existing[0]], existing[1]) if existing is not None else ([], 1)
+                (inflation,) = conn.execute("SELECT value FROM cache_state WHERE name = 'inflation'").fetchone()
+                tag_values = (tags.vdl_snapshot_id, json.dumps(sorted(tags.static_models))) if tags is not None else (None, None)
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", 
+                    (
+                        digest, file_name, value_type, metadata, size, cost, frequency, inflation + frequency * cost / max(size, 1), 
+                        self.timer() + self.ttl_seconds, *tag_values
+                    )
+                )
+                removed_files += self._delete_expired(conn)
+                removed_files += self._evict_until_within_bounds(conn, keep=digest)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                self._remove_files([file_name])
+                raise
+        
+        self._remove_files(removed_files)
+    
+    async def set_async(self, key: Hashable, value: Any, *, cost: float = 1.0) -> None:
+        await asyncio.to_thread(self.set, key, value, cost=cost)
+    
+    def _is_outdated(self, conn: sqlite3.Connection, tags: CacheTags) -> bool:
+        models = [*tags.static_models, "*"]
+        (latest_change,) = conn.execute(
+            f"SELECT max(vdl_snapshot_id) FROM model_versions WHERE model IN ({', '.join('?' for _ in models)})", models
+        ).fetchone()
+        return latest_change is not None and latest_change > tags.vdl_snapshot_id
+    
+    def invalidate(self, changed_models: AbstractSet[str] | None, vdl_snapshot_id: int | None) -> int:
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("UPDATE cache_state SET value = value + 1 WHERE name = 'invalidations'")
+                if vdl_snapshot_id is not None:
+                    conn.execute("INSERT OR REPLACE INTO cache_state VALUES ('vdl_snapshot_id', ?)", (vdl_snapshot_id,))
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO model_versions VALUES (?, ?)", 
+                        [(model, vdl_snapshot_id) for model in (changed_models if changed_models is not None else ["*"])]
+                    )
+                
+                invalidated = [
+                    (key, file_name) for key, file_name, *tag_values in conn.execute(
+                        "SELECT key, file_name, vdl_snapshot_id, static_models FROM entries"
+                    ).fetchall()
+                    if _is_invalidated(_get_tags_from_row(*tag_values), changed_models, vdl_snapshot_id)
+                ]
+                conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in invalidated])
+                self._refresh_num_invalidations(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        
+        self._remove_files([file_name for _, file_name in invalidated])
+        self._stats.invalidations += len(invalidated)
+        return len(invalidated)
+    
+    @property
+    def num_invalidations(self) -> int:
+        return self._num_invalidations
+    
+    @property
+    def vdl_snapshot_id(self) -> int | None:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM cache_state WHERE name = 'vdl_snapshot_id'").fetchone()
+        return int(row[0]) if row is not None else None
+    
+    def __contains__(self, key: Hashable) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT expires_at FROM entries WHERE key = ?", (_get_key_digest(key),)).fetchone()
+        return row is not None and row[0] > self.timer()
+    
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT count(*) FROM entries WHERE expires_at > ?", (self.timer(),)).fetchone()[0]
+    
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            removed_files = [row[0] for row in conn.execute("SELECT file_name FROM entries")]
+            conn.execute("DELETE FROM entries")
+            conn.execute("COMMIT")
+        self._remove_files(removed_files)
+    
+    def get_stats(self) -> CacheStats:
+        with self._connect() as conn:
+            num_entries, total_size = conn.execute("SELECT count(*), coalesce(sum(size), 0) FROM entries").fetchone()
+        stats = CacheStats(**asdict(self._stats))
+        stats.entries, stats.size_bytes = num_entries, total_size
+        return stats
@@ -43,6 +43,7 @@ def get_query_models_for_dataset(param_fields: dict[str, APIParamFieldInfo], sco
         APIParamFieldInfo("x_orientation", str, default="records", description="Controls the orientation of the result data. Options: 'records' (default), 'rows', 'columns'"),
         APIParamFieldInfo("x_offset", int, default=0, description="The number of rows to skip before returning data (applied after data caching)"),
         APIParamFieldInfo("x_limit", int, default=1000, description="The maximum number of rows to return (applied after data caching and offset)"),
+        APIParamFieldInfo("x_format", str, description="The format of the result: 'json', 'arrow' (Arrow IPC stream), 'parquet', 'csv', or 'ndjson'. If not provided, the format is taken from the 'Accept' header (default 'json')"),
     ]
     return _get_query_models_helper(predefined_params, param_fields, scoped_parameters)
 
@@ -60,6 +61,7 @@ def get_query_models_for_querying_models(param_fields: dict[str, APIParamFieldIn
         APIParamFieldInfo("x_orientation", str, default="records", description="Controls the orientation of the result data. Options: 'records' (default), 'rows', 'columns'"),
         APIParamFieldInfo("x_offset", int, default=0, description="The number of rows to skip before returning data (applied after data caching)"),
         APIParamFieldInfo("x_limit", int, default=1000, description="The maximum number of rows to return (applied after data caching and offset)"),
+        APIParamFieldInfo("x_format", str, description="The format of the result: 'json', 'arrow' (Arrow IPC stream), 'parquet', 'csv', or 'ndjson'. If not provided, the format is taken from the 'Accept' header (default 'json')"),
     ]
     return _get_query_models_helper(predefined_params, param_fields) 
 
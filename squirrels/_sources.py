@@ -1,6 +1,6 @@
 from typing import Any
 from pydantic import BaseModel, Field, model_validator
-import time, yaml
+import sqlglot, time, yaml
 
 from . import _utils as u, _constants as c, _model_configs as mc
 from ._env_vars import SquirrelsEnvVars
@@ -10,6 +10,7 @@ class UpdateHints(BaseModel):
     increasing_column: str | None = Field(default=None)
     strictly_increasing: bool = Field(default=True, description="Delete the max value of the increasing column, ignored if selective_overwrite_value is set")
     selective_overwrite_value: Any = Field(default=None, description="Delete all values of the increasing column greater than or equal to this value")
+    pushdown_filter: bool = Field(default=False, description="Run the filter on the increasing column as a native query in the source database (postgres and mysql only)")
 
 
 class Source(mc.ConnectionInterface, mc.ModelConfig):
@@ -41,14 +42,17 @@ class Source(mc.ConnectionInterface, mc.ModelConfig):
         
         increasing_col = self.update_hints.increasing_column
         increasing_col_type = next(col.type for col in self.columns if col.name == increasing_col)
-        where_cond = f"{increasing_col}::{increasing_col_type} > '{max_value_of_increasing_col}'::{increasing_col_type}"
+        max_value_str = str(max_value_of_increasing_col).replace("'", "''")
         
-        # TODO: figure out if using pushdown query is worth it
-        # if dialect in ['postgres', 'mysql']:
-        #     pushdown_query = f"SELECT {select_cols} FROM {table_name} WHERE {where_cond}"
-        #     transpiled_query = sqlglot.transpile(pushdown_query, read='duckdb', write=dialect)[0].replace("'", "''")
-        #     return f"FROM {dialect}_query('db_{conn_name}', '{transpiled_query}')"
+        # The DuckDB scanners may not push down the filter to the source database, and transfer all rows instead. Only the
+        # max value is cast in the native query so the source database can use an index on the increasing column
+        if self.update_hints.pushdown_filter and dialect in ['postgres', 'mysql']:
+            where_cond = f"{increasing_col} > CAST('{max_value_str}' AS {increasing_col_type})"
+            pushdown_query = f"SELECT {select_cols} FROM {table_name} WHERE {where_cond}"
+            transpiled_query = sqlglot.transpile(pushdown_query, read='duckdb', write=dialect)[0].replace("'", "''")
+            return f"FROM {dialect}_query('db_{conn_name}', '{transpiled_query}')"
         
+        where_cond = f"{increasing_col}::{increasing_col_type} > '{max_value_str}'::{increasing_col_type}"
         return f"SELECT {select_cols} FROM db_{conn_name}.{table_name} WHERE {where_cond}"
     
 
@@ -1,8 +1,8 @@
-from typing import Sequence, Optional, Union, TypeVar, Callable, Iterable, Literal, Any
+from typing import Sequence, Optional, Union, TypeVar, Callable, Awaitable, Iterable, Literal, Any
 from datetime import datetime
 from pathlib import Path
 import os, time, logging, json, duckdb, polars as pl, yaml
-import jinja2 as j2, jinja2.nodes as j2_nodes
+import jinja2 as j2, jinja2.nodes as j2_nodes, jinja2.meta as j2_meta
 import sqlglot, sqlglot.expressions, asyncio, hashlib, inspect, base64
 
 from . import _constants as c
@@ -51,11 +51,26 @@ class Logger(logging.Logger):
         self.info(f'Time taken for "{activity}": {time_taken}ms', data=data)
 
 
+class _TemplateWithMacros(j2.Template):
+    def new_context(self, vars: dict[str, Any] | None = None, shared: bool = False, locals: dict[str, Any] | None = None):
+        environment = self.environment
+        assert isinstance(environment, EnvironmentWithMacros)
+        macros_need_context = environment._compile_macros()
+        context = super().new_context(vars, shared, locals)
+        if macros_need_context:
+            context.vars.update(environment._make_macros_module(context.get_all()))
+        return context
+
+
 class EnvironmentWithMacros(j2.Environment):
+    template_class = _TemplateWithMacros
+
     def __init__(self, logger: logging.Logger, loader: j2.FileSystemLoader, *args, **kwargs):
         super().__init__(*args, loader=loader, **kwargs)
         self._logger = logger
         self._macros = self._load_macro_templates(logger)
+        self._macros_template: j2.Template | None = None
+        self._macros_need_context = False
 
     def _load_macro_templates(self, logger: logging.Logger) -> str:
         macros_dirs = self._get_macro_folders_from_packages()
@@ -86,9 +101,35 @@ class EnvironmentWithMacros(j2.Environment):
         subdirectories.append(Path(self.loader.searchpath[0], c.MACROS_FOLDER))
         return subdirectories
 
-    def _parse(self, source: str, name: str | None, filename: str | None) -> j2_nodes.Template:
-        source = self._macros + source
-        return super()._parse(source, name, filename)
+    def _compile_macros(self) -> bool:
+        """
+        Compiles the macro files once (on first render, since filters may be added after the environment is created).
+
+        If the macros only reference globals, the compiled module is injected into the globals of this environment.
+        Otherwise, the macros depend on the render context and are instantiated for each render without re-parsing.
+
+        Returns:
+            True if the macros must be instantiated with the render context, False otherwise
+        """
+        if self._macros_template is None:
+            start = time.time()
+            undeclared_vars = j2_meta.find_undeclared_variables(self.parse(self._macros)) - set(self.globals)
+            macros_template = self.from_string(self._macros, template_class=j2.Template)
+            self._macros_need_context = len(undeclared_vars) > 0
+            if not self._macros_need_context:
+                self.globals.update(self._get_exported_macros(macros_template.module))
+            self._macros_template = macros_template
+            if isinstance(self._logger, Logger):
+                self._logger.log_activity_time("compiling macros", start)
+        return self._macros_need_context
+
+    @staticmethod
+    def _get_exported_macros(module: j2.environment.TemplateModule) -> dict[str, Any]:
+        return {key: value for key, value in vars(module).items() if not key.startswith("_")}
+
+    def _make_macros_module(self, context_vars: dict[str, Any]) -> dict[str, Any]:
+        assert self._macros_template is not None
+        return self._get_exported_macros(self._macros_template.make_module(context_vars))
 
 
 ## Utility functions/variables
@@ -253,6 +294,71 @@ def create_duckdb_connection(
     return conn
 
 
+def get_current_vdl_snapshot_id(duckdb_conn: duckdb.DuckDBPyConnection) -> int | None:
+    """
+    Gets the id of the current snapshot of the Virtual Data Lake (VDL) attached as 'vdl'
+
+    Arguments:
+        duckdb_conn: The DuckDB connection with the VDL attached
+    
+    Returns:
+        The snapshot id, or None if the VDL is not a DuckLake
+    """
+    cursor = duckdb_conn.cursor()
+    try:
+        result = cursor.execute("SELECT id FROM vdl.current_snapshot()").fetchone()
+        return result[0] if result else None
+    except duckdb.Error:
+        return None
+    finally:
+        cursor.close()
+
+
+def get_vdl_tables_changed_since(duckdb_conn: duckdb.DuckDBPyConnection, snapshot_id: int) -> set[str] | None:
+    """
+    Gets the names of the tables and views of the Virtual Data Lake (VDL) that changed after the given DuckLake snapshot
+
+    Arguments:
+        duckdb_conn: The DuckDB connection with the VDL attached
+        snapshot_id: The id of the snapshot to compare against
+    
+    Returns:
+        The names of the changed tables and views, or None if the changes cannot be determined
+    """
+    cursor = duckdb_conn.cursor()
+    try:
+        snapshot_changes = cursor.execute(
+            "SELECT snapshot_id, changes FROM ducklake_snapshots('vdl') WHERE snapshot_id > ? ORDER BY snapshot_id", [snapshot_id]
+        ).fetchall()
+        table_names_by_id = dict(cursor.execute("SELECT table_id::VARCHAR, table_name FROM ducklake_table_info('vdl')").fetchall())
+    except duckdb.Error:
+        return None
+    finally:
+        cursor.close()
+    
+    # The changes of expired snapshots are no longer available
+    if [x[0] for x in snapshot_changes] != list(range(snapshot_id+1, snapshot_id+1+len(snapshot_changes))):
+        return None
+    
+    changed_tables: set[str] = set()
+    for _, changes in snapshot_changes:
+        for change_type, values in changes.items():
+            if change_type in ("tables_created", "views_created"):
+                # Created tables and views are listed by qualified name (e.g. "main.my_table")
+                changed_tables.update(value.split(".")[-1].strip('"') for value in values)
+            elif change_type in ("tables_inserted_into", "tables_deleted_from", "tables_altered", "inlined_insert", "inlined_delete"):
+                # Other changes are listed by id (inserts and deletes of small tables are inlined in the catalog by newer DuckLake versions)
+                for table_id in values:
+                    if table_id not in table_names_by_id:
+                        return None
+                    changed_tables.add(table_names_by_id[table_id])
+            elif change_type != "tables_dropped":
+                # Dropped tables are always created again by builds. Other changes (such as to schemas) are not expected
+                return None
+    
+    return changed_tables
+
+
 def run_sql_on_dataframes(sql_query: str, dataframes: dict[str, pl.LazyFrame]) -> pl.DataFrame:
     """
     Runs a SQL query against a collection of dataframes
@@ -278,7 +384,8 @@ def run_sql_on_dataframes(sql_query: str, dataframes: dict[str, pl.LazyFrame]) -
 
 
 async def run_polars_sql_on_dataframes(
-    sql_query: str, dataframes: dict[str, pl.LazyFrame], *, timeout_seconds: float = 2.0, max_rows: int | None = None
+    sql_query: str, dataframes: dict[str, pl.LazyFrame], *, timeout_seconds: float = 2.0, max_rows: int | None = None, 
+    run_in_thread: Callable[..., Awaitable[pl.DataFrame]] | None = None
 ) -> pl.DataFrame:
     """
     Runs a SQL query against a collection of dataframes using Polars SQL (more secure than DuckDB for user input).
@@ -289,6 +396,7 @@ async def run_polars_sql_on_dataframes(
         timeout_seconds: Maximum execution time in seconds (default 2.0)
         max_rows: Maximum number of rows to collect. Collects at most max_rows + 1 rows
                   to allow overflow detection without loading unbounded results into memory.
+        run_in_thread: Function to run the blocking query with (such as an executor's run method). Default is asyncio.to_thread
     
     Returns:
         The result as a polars DataFrame from running the query (limited to max_rows + 1)
@@ -300,10 +408,10 @@ async def run_polars_sql_on_dataframes(
     _validate_sql_query_security(sql_query, dataframes)
     
     # Execute with timeout
+    run_in_thread = run_in_thread or asyncio.to_thread
     try:
-        loop = asyncio.get_event_loop()
         result = await asyncio.wait_for(
-            loop.run_in_executor(None, _run_polars_sql_sync, sql_query, dataframes, max_rows),
+            run_in_thread(_run_polars_sql_sync, sql_query, dataframes, max_rows),
             timeout=timeout_seconds
         )
         return result
@@ -465,6 +573,38 @@ def parse_dependent_tables(sql_query: str, all_table_names: Iterable[str]) -> tu
     return dependencies, parsed
 
 
+def get_constant_args_of_calls(j2_env: j2.Environment, source: str, func_names: Iterable[str]) -> set[str] | None:
+    """
+    Statically finds the first argument of all calls to the given functions in a Jinja template
+
+    Arguments:
+        j2_env: The Jinja environment used to parse the template
+        source: The template source
+        func_names: The names of the functions to look for (e.g. "ref" or "source")
+
+    Returns:
+        The set of constant string arguments, or None if any call uses an argument that cannot be resolved statically
+    """
+    func_names = set(func_names)
+    args = set()
+    for call in j2_env.parse(source).find_all(j2_nodes.Call):
+        if not (isinstance(call.node, j2_nodes.Name) and call.node.name in func_names):
+            continue
+
+        if len(call.args) > 0:
+            arg = call.args[0]
+        elif len(call.kwargs) > 0:
+            arg = call.kwargs[0].value
+        else:
+            return None
+
+        if not (isinstance(arg, j2_nodes.Const) and isinstance(arg.value, str)):
+            return None
+        args.add(arg.value)
+
+    return args
+
+
 async def asyncio_gather(coroutines: list):
     tasks = [asyncio.create_task(coro) for coro in coroutines]
     
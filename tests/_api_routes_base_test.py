@@ -0,0 +1,178 @@
+from types import SimpleNamespace
+from cachetools import TTLCache
+from fastapi.responses import StreamingResponse
+import pytest, asyncio, json, polars as pl
+
+from squirrels import _utils as u
+from squirrels._api_routes.base import RouteBase
+from squirrels._dataset_types import DatasetResult
+from squirrels._exceptions import InvalidInputError
+from squirrels._model_configs import ModelConfig
+from squirrels._result_cache import ResultCache
+
+
+@pytest.fixture
+def route_base() -> RouteBase:
+    project = SimpleNamespace(
+        _logger=u.Logger(""), _env_vars=None, _manifest_cfg=None, _auth=None, _param_cfg_set=None
+    )
+    return RouteBase(None, project) # type: ignore
+
+
+def test_concurrent_cache_misses_are_coalesced(route_base: RouteBase):
+    cache = TTLCache(maxsize=8, ttl=60)
+    calls = []
+
+    async def action(x: int) -> int:
+        calls.append(x)
+        await asyncio.sleep(0.05)
+        return x * 10
+
+    async def main():
+        results = await asyncio.gather(*[route_base.do_cachable_action(cache, action, 1) for _ in range(5)])
+        return results, await route_base.do_cachable_action(cache, action, 1)
+
+    results, cached_result = asyncio.run(main())
+    assert results == [10] * 5 and cached_result == 10
+    assert calls == [1]
+    assert route_base.cache_counters.misses == 1
+    assert route_base.cache_counters.coalesced == 4
+    assert route_base.cache_counters.hits == 1
+    assert route_base._in_flight_actions == {}
+
+
+def test_result_is_cached_under_key_derived_from_result(route_base: RouteBase):
+    cache = TTLCache(maxsize=8, ttl=60)
+
+    async def action(x: int, unused: str) -> int:
+        return x * 10
+
+    async def main():
+        first = await route_base.do_cachable_action(
+            cache, action, 3, "a", cache_key=(3, "a"), get_result_cache_key=lambda result: (result,)
+        )
+        second = await route_base.do_cachable_action(cache, action, 3, "b", cache_key=(30,))
+        return first, second
+
+    assert asyncio.run(main()) == (30, 30)
+    assert list(cache.keys()) == [(30,)]
+    assert (route_base.cache_counters.misses, route_base.cache_counters.hits) == (1, 1)
+
+
+def test_concurrent_runs_are_coalesced_on_arguments_not_cache_key(route_base: RouteBase):
+    cache = TTLCache(maxsize=8, ttl=60)
+    calls = []
+
+    async def action(x: int, unused: str) -> str:
+        calls.append(unused)
+        await asyncio.sleep(0.05)
+        return unused
+
+    async def main():
+        return await asyncio.gather(
+            route_base.do_cachable_action(cache, action, 3, "a", cache_key=(3,)),
+            route_base.do_cachable_action(cache, action, 3, "b", cache_key=(3,)),
+            route_base.do_cachable_action(cache, action, 3, "b", cache_key=(3,)),
+        )
+
+    assert asyncio.run(main()) == ["a", "b", "b"]
+    assert sorted(calls) == ["a", "b"]
+    assert (route_base.cache_counters.misses, route_base.cache_counters.coalesced) == (2, 1)
+
+
+def test_stale_results_are_served_while_refreshed_in_background(route_base: RouteBase):
+    cache = ResultCache("test", 8, 10**6, ttl_seconds=60, max_stale_seconds=60, timer=lambda: now)
+    calls = []
+
+    async def action(x: int) -> int:
+        calls.append(x)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def main():
+        nonlocal now
+        first = await route_base.do_cachable_action(cache, action, 4)
+        now = 90
+        stale = await asyncio.gather(*[route_base.do_cachable_action(cache, action, 4) for _ in range(3)])
+        await asyncio.sleep(0.1)
+        return first, stale, await route_base.do_cachable_action(cache, action, 4)
+
+    now = 0
+    first, stale, refreshed = asyncio.run(main())
+    assert (first, stale, refreshed) == (1, [1, 1, 1], 2)
+    assert len(calls) == 2
+    assert (route_base.cache_counters.hits, route_base.cache_counters.refreshes) == (4, 1)
+
+
+def test_coalesced_errors_are_raised_to_all_waiters_and_not_cached(route_base: RouteBase):
+    cache = TTLCache(maxsize=8, ttl=60)
+    calls = []
+
+    async def action(x: int) -> int:
+        calls.append(x)
+        await asyncio.sleep(0.05)
+        if len(calls) == 1:
+            raise ValueError("failed")
+        return x
+
+    async def main():
+        results = await asyncio.gather(*[route_base.do_cachable_action(cache, action, 2) for _ in range(3)], return_exceptions=True)
+        return results, await route_base.do_cachable_action(cache, action, 2)
+
+    results, retried_result = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert retried_result == 2
+    assert calls == [2, 2]
+
+
+def test_cancelled_waiter_does_not_cancel_shared_action(route_base: RouteBase):
+    cache = TTLCache(maxsize=8, ttl=60)
+
+    async def action(x: int) -> int:
+        await asyncio.sleep(0.05)
+        return x
+
+    async def main():
+        leader = asyncio.create_task(route_base.do_cachable_action(cache, action, 3))
+        follower = asyncio.create_task(route_base.do_cachable_action(cache, action, 3))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == 3
+    assert cache[(3,)] == 3
+
+
+@pytest.mark.parametrize("params, headers, expected", [
+    ({}, {}, "json"),
+    ({"x_format": "Parquet"}, {"Accept": "text/csv"}, "parquet"),
+    ({}, {"accept": "text/csv"}, "csv"),
+    ({}, {"accept": "application/json;q=0.5, application/vnd.apache.arrow.stream"}, "arrow"),
+    ({}, {"accept": "application/x-ndjson;q=0.9, text/csv;q=0.2"}, "ndjson"),
+    ({}, {"accept": "text/html, */*"}, "json"),
+])
+def test_get_result_file_format(params: dict, headers: dict, expected: str):
+    assert RouteBase.get_result_file_format(params, headers) == expected
+
+
+def test_get_result_file_format_invalid():
+    with pytest.raises(InvalidInputError) as exc_info:
+        RouteBase.get_result_file_format({"x_format": "xml"}, {})
+    assert exc_info.value.status_code == 400
+
+
+def test_get_result_response(route_base: RouteBase):
+    df = pl.DataFrame({"a": [1, 2, 3]}).with_row_index("_row_num", offset=1)
+    result = DatasetResult(target_model_config=ModelConfig(), df=df)
+    
+    json_response = route_base.get_result_response(result, {"x_limit": 2}, {})
+    assert json_response.media_type == "application/json"
+    assert json.loads(json_response.body)["data"] == [{"_row_num": 1, "a": 1}, {"_row_num": 2, "a": 2}]
+    
+    csv_response = route_base.get_result_response(result, {"x_format": "csv", "x_offset": 1}, {})
+    assert isinstance(csv_response, StreamingResponse)
+    assert csv_response.media_type == "text/csv"
+    assert csv_response.headers["Total-Num-Rows"] == "3"
+    assert [field["name"] for field in json.loads(csv_response.headers["Result-Schema"])["fields"]] == ["_row_num", "a"]
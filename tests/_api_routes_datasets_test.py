@@ -0,0 +1,126 @@
+from types import SimpleNamespace
+import pytest, asyncio, polars as pl
+
+from squirrels import _utils as u, _constants as c, _manifest as mf
+from squirrels._api_routes.datasets import DatasetRoutes
+from squirrels._dataset_types import DatasetResult
+from squirrels._dependency_tracker import DatasetDependencies
+from squirrels._model_configs import ModelConfig
+from squirrels._parameter_configs import APIParamFieldInfo
+from squirrels._schemas.auth_models import CustomUserFields, RegisteredUser
+
+
+def make_user(username: str) -> RegisteredUser:
+    return RegisteredUser(username=username, custom_fields=CustomUserFields())
+
+
+@pytest.fixture
+def dataset_routes() -> DatasetRoutes:
+    env_vars = SimpleNamespace(
+        result_cache_backend="memory", datasets_cache_size=8, datasets_cache_max_mb=1, datasets_cache_ttl_minutes=60,
+        datasets_cache_max_stale_minutes=0, datasets_cache_refresh_ahead_minutes=0, datasets_cache_refresh_ahead_min_hits=3,
+        datasets_cache_warming_enabled=True, datasets_cache_warming_test_sets=[c.DEFAULT_TEST_SET_NAME, "missing"],
+        datasets_cache_warming_top_n=1, datasets_cache_warming_max_concurrency=2, datasets_max_rows_output=100,
+        datasets_sql_timeout_seconds=10, elevated_access_level="admin"
+    )
+    manifest_cfg = SimpleNamespace(
+        selection_test_sets={}, get_default_test_set=lambda: mf.TestSetsConfig(name="default", parameters={"limit": 5}),
+        datasets={"public_ds": SimpleNamespace(scope="public"), "private_ds": SimpleNamespace(scope="private")},
+        configurables={}
+    )
+    project = SimpleNamespace(
+        _logger=u.Logger(""), _env_vars=env_vars, _manifest_cfg=manifest_cfg,
+        _auth=SimpleNamespace(can_user_access_scope=lambda user, scope: scope == "public"),
+        _param_cfg_set=SimpleNamespace(get_all_api_field_info=lambda: {"limit": APIParamFieldInfo("limit", float)}),
+        _get_user_from_test_set=lambda test_set: make_user("guest"),
+        _register_result_cache=lambda cache: None, post_build_hooks=[]
+    )
+    project._register_post_build_hook = project.post_build_hooks.append
+    return DatasetRoutes(None, project) # type: ignore
+
+
+def test_cache_warming_requests(dataset_routes: DatasetRoutes):
+    assert dataset_routes.project.post_build_hooks == [dataset_routes.start_cache_warming]
+
+    user = make_user("alice")
+    dataset_routes._record_recent_request(("private_ds", user, (("limit", 1.0),), ()))
+    dataset_routes._record_recent_request(("private_ds", user, (("limit", 1.0),), ()))
+    dataset_routes._record_recent_request(("public_ds", user, (), ()))
+
+    assert dataset_routes.get_cache_warming_requests() == [
+        ("public_ds", make_user("guest"), (("limit", 5.0),), ()),
+        ("private_ds", user, (("limit", 1.0),), ()),
+    ]
+
+
+def test_warm_cache_runs_requests_with_bounded_concurrency(dataset_routes: DatasetRoutes):
+    running, max_running, datasets_run = 0, 0, []
+
+    async def get_dataset_results(dataset: str, *args):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        datasets_run.append(dataset)
+        if dataset == "failing_ds":
+            raise RuntimeError("failed")
+
+    user = make_user("alice")
+    for dataset in ["ds1", "ds2", "ds3", "failing_ds"]:
+        dataset_routes._record_recent_request((dataset, user, (), ()))
+    dataset_routes.env_vars.datasets_cache_warming_top_n = 4
+    dataset_routes._get_dataset_results_cachable = get_dataset_results # type: ignore
+
+    asyncio.run(dataset_routes.warm_cache())
+    assert sorted(datasets_run) == ["ds1", "ds2", "ds3", "failing_ds", "public_ds"]
+    assert max_running == 2
+
+
+def test_cache_key_does_not_match_entries_from_other_dependency_sets(dataset_routes: DatasetRoutes):
+    # Parameter "b" (default 0) is only read when "a" is "x"
+    async def get_dataset_results(dataset: str, user, selections: tuple, configurables: tuple) -> DatasetResult:
+        selections_dict = dict(selections)
+        parameters = {"a", "b"} if selections_dict["a"] == "x" else {"a"}
+        value = f"{selections_dict['a']}{selections_dict.get('b', 0) if 'b' in parameters else ''}"
+        return DatasetResult(
+            target_model_config=ModelConfig(), df=pl.DataFrame({"value": [value]}), 
+            dependencies=DatasetDependencies(parameters=frozenset(parameters))
+        )
+    
+    dataset_routes._get_dataset_results_helper = get_dataset_results # type: ignore
+    get_value = lambda *selections: asyncio.run(
+        dataset_routes._get_dataset_results_cachable("ds", make_user("alice"), selections, ())
+    ).df.item()
+
+    assert get_value(("a", "x")) == "x0"
+
+    # The learned dependencies start empty again after a restart, while a disk cache keeps its entries
+    dataset_routes.dataset_dependencies.clear()
+    assert get_value(("a", "y")) == "y"
+    assert dataset_routes.dataset_dependencies["ds"].parameters == {"a"}
+    assert get_value(("a", "x"), ("b", 5)) == "x5"
+    assert get_value(("a", "y"), ("b", 5)) == "y"
+
+
+def test_only_results_route_loads_requested_page_without_cache(dataset_routes: DatasetRoutes):
+    from fastapi import FastAPI
+
+    dataset_routes.no_cache = True
+    for dataset_config in dataset_routes.manifest_cfg.datasets.values():
+        dataset_config.parameters, dataset_config.description = [], ""
+    dataset_routes.setup_routes(FastAPI(), "/api", {}, get_parameters_definition=None) # type: ignore
+
+    pages_loaded = []
+    async def get_dataset_results(dataset: str, user, selections, configurables, *, offset: int = 0, limit: int | None = None):
+        pages_loaded.append((offset, limit))
+        return DatasetResult(target_model_config=ModelConfig(), df=pl.DataFrame({"col": range(1500)}).with_row_index("_row_num", offset=1))
+    dataset_routes._get_dataset_results_helper = get_dataset_results # type: ignore
+
+    user = make_user("alice")
+    result = asyncio.run(dataset_routes._get_dataset_results_for_mcp("public_ds", {}, None, user, {}))
+    assert pages_loaded == [(0, None)]
+    assert result.df.height == 1500
+
+    asyncio.run(dataset_routes._get_dataset_results_definition("public_ds", user, {"x_offset": 1000, "x_limit": 10}, {}))
+    assert pages_loaded[-1] == (1000, 10)
@@ -1,8 +1,9 @@
 from sqlalchemy import create_engine
 import polars as pl
-import pytest
+import pytest, asyncio, threading
 
 from squirrels import _connection_set as cs, _utils as u
+from squirrels._exceptions import InvalidInputError
 
 
 @pytest.fixture(scope="module")
@@ -44,3 +45,41 @@ def test_run_sql_query_from_conn_name(connection_set: cs.ConnectionSet):
 
     with pytest.raises(RuntimeError):
         connection_set.run_sql_query_from_conn_name("SELECT invalid_column FROM test", "db2")
+
+
+def test_executors_are_isolated_per_connection(connection_set: cs.ConnectionSet):
+    with pytest.raises(u.ConfigurationError):
+        connection_set.get_executor('does_not_exist')
+    
+    db2_executor = connection_set.get_executor("db2")
+    assert connection_set.get_executor("db2") is db2_executor
+    assert connection_set.get_local_executor() is not db2_executor
+
+    thread_name = asyncio.run(db2_executor.run(lambda: threading.current_thread().name))
+    assert thread_name.startswith("sqrl_db2")
+    
+    metrics = connection_set.get_executor_metrics()["db2"]
+    assert (metrics.submitted, metrics.completed, metrics.active, metrics.queued) == (1, 1, 0, 0)
+
+
+def test_executor_rejects_when_queue_is_full():
+    executor = cs.BulkheadExecutor("slow_db", max_workers=1, max_queue_size=1)
+    release = threading.Event()
+
+    async def main():
+        blocked = asyncio.create_task(executor.run(release.wait))
+        queued = asyncio.create_task(executor.run(lambda: "done"))
+        await asyncio.sleep(0.1)
+        with pytest.raises(InvalidInputError) as exc_info:
+            await executor.run(lambda: "rejected")
+        assert exc_info.value.status_code == 503
+        release.set()
+        return await blocked, await queued
+
+    try:
+        assert asyncio.run(main()) == (True, "done")
+    finally:
+        executor.shutdown()
+    
+    metrics = executor.get_metrics()
+    assert (metrics.submitted, metrics.completed, metrics.rejected, metrics.peak_queued) == (2, 2, 1, 1)
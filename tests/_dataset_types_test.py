@@ -0,0 +1,90 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+import pytest, io, polars as pl, pyarrow.ipc as pa_ipc, pyarrow.parquet as pq
+
+from squirrels._dataset_types import DatasetResult, DatasetResultFormat
+from squirrels._schemas import response_models as rm
+from squirrels._model_configs import ModelConfig, ColumnConfig
+
+
+@pytest.fixture(scope="module")
+def dataset_result() -> DatasetResult:
+    df = pl.DataFrame({"id": list(range(25)), "name": ["x"] * 25}).with_row_index("_row_num", offset=1)
+    model_config = ModelConfig(columns=[ColumnConfig(name="id", type="integer", description="The id")])
+    return DatasetResult(target_model_config=model_config, df=df)
+
+
+def test_iter_file_bytes_arrow(dataset_result: DatasetResult):
+    chunks = list(dataset_result.iter_file_bytes(DatasetResultFormat("records", 5, 12), "arrow", chunk_size=5))
+    assert len(chunks) == 4
+
+    table = pa_ipc.open_stream(b"".join(chunks)).read_all()
+    assert table.column("id").to_pylist() == list(range(5, 17))
+    assert table.schema.field("id").metadata == {b"description": b"The id", b"category": b"misc"}
+    assert b"squirrels:schema" in table.schema.metadata
+
+
+def test_iter_file_bytes_parquet(dataset_result: DatasetResult):
+    chunks = list(dataset_result.iter_file_bytes(DatasetResultFormat("records", 0, None), "parquet", chunk_size=10))
+    parquet_file = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    assert parquet_file.metadata.num_row_groups == 3
+    assert parquet_file.read().num_rows == 25
+
+
+@pytest.mark.parametrize("file_format", ["csv", "ndjson"])
+def test_iter_file_bytes_text(dataset_result: DatasetResult, file_format):
+    chunks = list(dataset_result.iter_file_bytes(DatasetResultFormat("records", 0, 20), file_format, chunk_size=8))
+    assert len(chunks) == 3
+
+    read_func = pl.read_csv if file_format == "csv" else pl.read_ndjson
+    df = read_func(io.BytesIO(b"".join(chunks)))
+    assert df.columns == ["_row_num", "id", "name"]
+    assert df["id"].to_list() == list(range(20))
+
+
+def test_iter_file_bytes_empty_csv(dataset_result: DatasetResult):
+    chunks = list(dataset_result.iter_file_bytes(DatasetResultFormat("records", 100, None), "csv"))
+    assert b"".join(chunks) == b"_row_num,id,name\n"
+
+
+@pytest.mark.parametrize("orientation", ["records", "rows", "columns"])
+@pytest.mark.parametrize("offset, limit", [(0, None), (3, 2), (30, 5)])
+def test_to_json_bytes_matches_response_model(orientation, offset, limit):
+    df = pl.DataFrame({
+        "int": [1, None, 3, 4], 
+        "float": [1.5, float("nan"), None, -0.25], 
+        "float_exponent": [1e20, 1e-7, -1.234e-5, 1e-5],
+        "float_decimal": [1e15, 0.0001, 12345.678, 1e-4],
+        "float32": pl.Series([0.1, 1e20, None, 3.5], dtype=pl.Float32),
+        "float_list": [[1e16, 0.00001], [-2e-5, 0.5], None, []],
+        "float_struct": [{"a": 1e20, "b": "1e5"}, None, {"a": 0.1, "b": None}, {"a": 1e-5, "b": "0.00001"}],
+        "str": ['a"é\n', None, "c", "d"],
+        "date": [date(2024, 1, 2), None, date(2024, 1, 3), date(2024, 1, 4)],
+        "datetime": [datetime(2024, 1, 2, 3, 4, 5, 123456), datetime(2024, 1, 2, 3, 4, 5), None, datetime(2024, 1, 2)],
+        "datetime_tz": pl.Series([datetime(2024, 1, 2, 3, 4, 5), None, None, datetime(2024, 1, 2)]).dt.replace_time_zone("UTC"),
+        "decimal": pl.Series([Decimal("1.50"), None, Decimal("-0.05"), Decimal("2")], dtype=pl.Decimal(10, 2)),
+        "time": [time(1, 2, 3), time(1, 2, 3, 4000), None, time(0, 0)],
+        "category": pl.Series(["x", "y", None, "x"], dtype=pl.Categorical),
+        "list": [[1, 2], [], None, [3]],
+        "struct": [{"a": datetime(2024, 1, 1)}, None, {"a": None}, {"a": datetime(2024, 1, 1, 0, 0, 1)}],
+    }).with_row_index("_row_num", offset=1)
+    result = DatasetResult(target_model_config=ModelConfig(), df=df)
+    result_format = DatasetResultFormat(orientation, offset, limit)
+
+    expected = JSONResponse(jsonable_encoder(rm.DatasetResultModel(**result.to_json(result_format)))).body
+    assert result.to_json_bytes(result_format) == expected
+    assert result.to_json_bytes(result_format) is result.to_json_bytes(result_format)
+
+
+def test_estimated_size_counts_all_cached_payloads():
+    df = pl.DataFrame({"id": list(range(100))}).with_row_index("_row_num", offset=1)
+    result = DatasetResult(target_model_config=ModelConfig(), df=df)
+    df_size = result.estimated_size()
+
+    result.to_json(DatasetResultFormat("records", 0, None))
+    assert result.estimated_size() == df_size
+
+    json_bytes = result.to_json_bytes(DatasetResultFormat("records", 0, None))
+    assert result.estimated_size() == df_size + len(json_bytes)
@@ -0,0 +1,62 @@
+import pytest
+
+from squirrels._dependency_tracker import DependencyTracker, DatasetDependencies
+from squirrels._schemas.auth_models import CustomUserFields, RegisteredUser
+
+
+class UserFields(CustomUserFields):
+    role: str = "employee"
+    region: str = "east"
+
+
+def make_user(username: str, role: str = "employee", region: str = "east") -> RegisteredUser:
+    return RegisteredUser(username=username, custom_fields=UserFields(role=role, region=region))
+
+
+def test_track_parameters_and_configurables():
+    tracker = DependencyTracker()
+    prms = tracker.track_parameters({"a": 1, "b": 2, "c": 3})
+    configurables = tracker.track_configurables({"x": "1", "y": "2"})
+
+    assert prms["a"] == 1 and prms.get("d") is None and "b" in prms
+    assert configurables.copy()["x"] == "1"
+    assert tracker.parameters_read == {"a", "b", "d"}
+    assert tracker.configurables_read == {"x"}
+
+    assert list(prms) == ["a", "b", "c"]
+    assert tracker.parameters_read == {"a", "b", "c", "d"}
+
+
+def test_track_user_fields():
+    tracker = DependencyTracker()
+    user = tracker.track_user(make_user("alice", role="manager"))
+
+    assert isinstance(user, RegisteredUser)
+    assert user.access_level == "member" and user.custom_fields.role == "manager"
+    assert tracker.user_fields_read == {"access_level", "custom_fields.role"}
+
+    with pytest.raises(AttributeError):
+        user.username = "bob"
+
+    assert user.custom_fields.model_dump() == {"role": "manager", "region": "east"}
+    assert tracker.user_fields_read == {"access_level", "custom_fields.role", "custom_fields"}
+
+    assert str(user) == "alice"
+    assert "" in tracker.user_fields_read
+
+
+def test_cache_key_only_has_inputs_read():
+    dependencies = DatasetDependencies(
+        parameters=frozenset({"category"}), configurables=frozenset({"tenant"}),
+        user_fields=frozenset({"access_level", "custom_fields.role"})
+    )
+    get_key = lambda user, selections, configurables: dependencies.get_cache_key(user, selections, configurables)
+
+    key = get_key(make_user("alice"), (("category", "food"), ("limit", 10)), (("tenant", "t1"), ("other", "1")))
+    assert key == get_key(make_user("bob", region="west"), (("category", "food"),), (("tenant", "t1"),))
+    assert key != get_key(make_user("bob", role="manager"), (("category", "food"),), (("tenant", "t1"),))
+    assert key != get_key(make_user("alice"), (("category", "travel"),), (("tenant", "t1"),))
+    assert key != get_key(make_user("alice"), (("category", "food"),), (("tenant", "t2"),))
+
+    whole_user = DatasetDependencies(user_fields=frozenset({""})) | dependencies
+    assert whole_user.get_cache_key(make_user("alice"), (), ()) != whole_user.get_cache_key(make_user("bob"), (), ())
@@ -0,0 +1,91 @@
+import pytest, duckdb, subprocess, sys
+
+from squirrels._connection_set import ConnectionSet
+from squirrels._duckdb_pool import DuckDBConnectionPool
+
+
+@pytest.fixture(scope="function")
+def pool() -> DuckDBConnectionPool:
+    pool = DuckDBConnectionPool(None, ConnectionSet(), pool_size=2)
+    yield pool
+    pool.clear()
+
+
+def test_connection_is_reused_and_reset(pool: DuckDBConnectionPool):
+    with pool.connection() as conn1:
+        cursor = conn1.cursor()
+        cursor.execute("CREATE TABLE model1 AS SELECT 1 AS a")
+        cursor.execute("CREATE VIEW model2 AS FROM model1")
+        cursor.close()
+    
+    with pool.connection() as conn2:
+        assert conn2 is conn1
+        assert conn2.cursor().execute("SHOW TABLES").fetchall() == []
+
+
+def test_concurrent_checkouts_get_different_connections(pool: DuckDBConnectionPool):
+    with pool.connection() as conn1, pool.connection() as conn2, pool.connection() as conn3:
+        assert len({id(conn1), id(conn2), id(conn3)}) == 3
+    
+    # Connections are released in reverse order, so the last one released exceeds the pool size
+    assert pool._idle_connections == [conn3, conn2]
+    with pytest.raises(duckdb.ConnectionException):
+        conn1.execute("SELECT 1")
+
+
+def test_unhealthy_connection_is_replaced(pool: DuckDBConnectionPool):
+    pool.warm_up()
+    assert len(pool._idle_connections) == 2
+    for conn in pool._idle_connections:
+        conn.close()
+    
+    with pool.connection() as conn:
+        assert conn.execute("SELECT 1").fetchall() == [(1,)]
+    assert len(pool._idle_connections) == 1
+
+
+def test_clear_discards_checked_out_connections(pool: DuckDBConnectionPool):
+    with pool.connection() as conn:
+        pool.clear()
+    
+    assert pool._idle_connections == []
+    with pytest.raises(duckdb.ConnectionException):
+        conn.execute("SELECT 1")
+
+
+def test_objects_from_init_file_are_kept(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "duckdb_init.sql").write_text("CREATE TABLE lookup AS SELECT 1 AS a; CREATE MACRO plus_one(x) AS x + 1;")
+    pool = DuckDBConnectionPool(None, ConnectionSet(), pool_size=1)
+
+    with pool.connection() as conn1:
+        conn1.cursor().execute("CREATE TABLE model1 AS SELECT 2 AS a")
+    
+    with pool.connection() as conn2:
+        assert conn2 is conn1
+        cursor = conn2.cursor()
+        assert cursor.execute("SHOW TABLES").fetchall() == [("lookup",)]
+        assert cursor.execute("SELECT plus_one(a) FROM lookup").fetchall() == [(2,)]
+    pool.clear()
+
+
+def test_vdl_is_detached_while_idle(tmp_path):
+    catalog_path = f"ducklake:{tmp_path}/vdl_catalog.duckdb"
+    with duckdb.connect() as conn:
+        conn.execute(f"ATTACH '{catalog_path}' AS vdl (DATA_PATH '{tmp_path}/vdl_data/')")
+        conn.execute("CREATE TABLE vdl.table1 AS SELECT 1 AS a")
+    
+    pool = DuckDBConnectionPool(catalog_path, ConnectionSet(), pool_size=1)
+    with pool.connection() as conn:
+        assert conn.execute("FROM table1").fetchall() == [(1,)]
+    
+    # Another process (such as "sqrl build") can write to the VDL while the pooled connection is idle
+    write_vdl = (
+        f"import duckdb; conn = duckdb.connect(); conn.execute(\"ATTACH '{catalog_path}' AS vdl\"); "
+        "conn.execute('CREATE TABLE vdl.table2 AS SELECT 2 AS a')"
+    )
+    subprocess.run([sys.executable, "-c", write_vdl], check=True)
+
+    with pool.connection() as conn:
+        assert conn.execute("FROM table2").fetchall() == [(2,)]
+    pool.clear()
@@ -3,6 +3,7 @@ Tests for SQRL_DATASETS__MAX_ROWS_OUTPUT environment variable enforcement
 """
 import pytest
 import polars as pl
+from types import SimpleNamespace
 from unittest.mock import patch
 
 from squirrels._project import SquirrelsProject
@@ -11,12 +12,12 @@ from squirrels import _constants as c
 
 
 @pytest.fixture
-def mock_project_with_max_rows():
+def mock_project_with_max_rows(tmp_path):
     """Create a mock project with max_result_rows set"""
     with patch('squirrels._project.SquirrelsProject._load_env_vars', return_value={
         c.SQRL_DATASETS_MAX_ROWS_OUTPUT: "5"  # Small limit for testing
     }):
-        project = SquirrelsProject()
+        project = SquirrelsProject(project_path=str(tmp_path))
         return project
 
 
@@ -39,3 +40,25 @@ def test_enforce_max_result_rows_exceeds_limit(mock_project_with_max_rows: Squir
     
     assert exc_info.value.status_code == 413
     assert exc_info.value.error == "dataset_result_too_large"
+
+
+def test_get_target_result_df_for_page(mock_project_with_max_rows: SquirrelsProject):
+    """Test that a page is taken from results that were not loaded from DuckDB, and the full result is counted"""
+    project = mock_project_with_max_rows
+    target_model = SimpleNamespace(result=pl.LazyFrame({"col1": [1, 2, 3, 4]}), total_num_rows=None)
+    
+    df, total_num_rows = project._get_target_result_df(target_model, "dataset", 1, 2) # type: ignore
+    assert df.to_dict(as_series=False) == {"_row_num": [2, 3], "col1": [2, 3]}
+    assert total_num_rows == 4
+
+
+def test_get_target_result_df_for_page_exceeds_limit(mock_project_with_max_rows: SquirrelsProject):
+    """Test that the max rows are enforced on the row count of the full result when only a page was loaded"""
+    project = mock_project_with_max_rows
+    target_model = SimpleNamespace(result=pl.LazyFrame({"col1": [1, 2]}), total_num_rows=10)
+    
+    with pytest.raises(InvalidInputError) as exc_info:
+        project._get_target_result_df(target_model, "query", 0, 2) # type: ignore
+    
+    assert exc_info.value.status_code == 413
+    assert exc_info.value.error == "query_result_too_large"
@@ -1,20 +1,20 @@
 from pathlib import Path
-import pytest, asyncio, sqlite3, duckdb, polars as pl
+import pytest, asyncio, re, sqlite3, duckdb, polars as pl
 
 from squirrels._connection_set import ConnectionSet, ConnectionProperties
 from squirrels._manifest import ConnectionTypeEnum
-from squirrels._models import SourceModel
+from squirrels._models import SourceModel, Seed, BuildModel, StaticModel
 from squirrels._model_builder import ModelBuilder
-from squirrels._model_configs import ColumnConfig
+from squirrels._model_configs import ColumnConfig, SeedConfig, BuildModelConfig
+from squirrels._model_queries import SqlQueryFile, PyQueryFile
+from squirrels._exceptions import ConfigurationError, FileExecutionError
 from squirrels._sources import Source, UpdateHints
 from squirrels._arguments.init_time_args import ConnectionsArgs
 
 
 @pytest.fixture(scope="module")
-def sqlite_path():
-    path = Path("playground/sqlite_test.db")
-    path.parent.mkdir(parents=True, exist_ok=True)
-    return str(path)
+def sqlite_path(tmp_path_factory: pytest.TempPathFactory):
+    return str(tmp_path_factory.mktemp("playground") / "sqlite_test.db")
 
 @pytest.fixture(scope="module", autouse=True)
 def sqlite_conn(sqlite_path):
@@ -171,3 +171,220 @@ def test_build_sources(connection_set, expected_df3: pl.DataFrame, create_model_
         duckdb_conn.close()
     
     assert result.equals(expected_df3)
+
+
+def test_build_skips_downstreams_of_failed_models_only(create_model_builder):
+    def make_build_model(name: str, query: str, depends_on: set[str]) -> BuildModel:
+        config = BuildModelConfig(depends_on=depends_on, materialization="TABLE")
+        return BuildModel(name, config, SqlQueryFile(f"{name}.sql", query))
+
+    static_models: dict[str, StaticModel] = {
+        "seed_a": Seed("seed_a", SeedConfig(), pl.LazyFrame({"id": [1, 2, 3]})),
+        "seed_b": Seed("seed_b", SeedConfig(), pl.LazyFrame({"id": [4, 5]})),
+        "build_ok": make_build_model("build_ok", 'SELECT * FROM {{ ref("seed_a") }}', {"seed_a"}),
+        "build_fail": make_build_model("build_fail", "SELECT * FROM missing_table", {"seed_b"}),
+        "build_skipped": make_build_model("build_skipped", 'SELECT * FROM {{ ref("build_fail") }}', {"build_fail"}),
+        "build_combined": make_build_model(
+            "build_combined", 'SELECT * FROM {{ ref("build_ok") }} UNION ALL SELECT * FROM {{ ref("seed_b") }}',
+            {"build_ok", "seed_b"}
+        ),
+    }
+    model_builder = create_model_builder(static_models)
+    model_builder._threads = 2
+
+    duckdb_conn = duckdb.connect()
+    try:
+        with pytest.raises(FileExecutionError, match="build_fail"):
+            asyncio.run(model_builder._build_models(duckdb_conn, select=None, full_refresh=False))
+        tables = {name for (name,) in duckdb_conn.sql("SELECT table_name FROM information_schema.tables").fetchall()}
+        num_rows = duckdb_conn.sql("SELECT count(*) FROM build_combined").fetchone()
+    finally:
+        duckdb_conn.close()
+    
+    assert tables == {"seed_a", "seed_b", "build_ok", "build_combined"}
+    assert num_rows == (5,)
+
+
+def test_build_incremental_model_merges_new_rows(create_model_builder):
+    query = """
+        SELECT * FROM {{ ref("seed_orders") }}
+        {%- if is_incremental() %} WHERE updated_at >= (SELECT max(updated_at) FROM {{ this }}) {%- endif %}
+    """
+    config = BuildModelConfig(depends_on={"seed_orders"}, materialization="INCREMENTAL", unique_key=["id"])
+    build_model = BuildModel("build_orders", config, SqlQueryFile("build_orders.sql", query))
+
+    def build(orders: pl.LazyFrame, full_refresh: bool = False) -> None:
+        seed = Seed("seed_orders", SeedConfig(), orders)
+        model_builder = create_model_builder({"seed_orders": seed, "build_orders": build_model})
+        asyncio.run(model_builder._build_models(duckdb_conn, select=None, full_refresh=full_refresh))
+    
+    duckdb_conn = duckdb.connect()
+    try:
+        build(pl.LazyFrame({"id": [1, 2], "amount": [10, 20], "updated_at": [1, 1]}))
+        assert not build_model.is_incremental_run
+        
+        # The row with id 2 is updated, id 3 is new, and the stale row with id 1 is not selected by the incremental query
+        build(pl.LazyFrame({"id": [1, 2, 3], "amount": [0, 25, 30], "updated_at": [0, 2, 2]}))
+        assert build_model.is_incremental_run
+        result = duckdb_conn.sql("SELECT id, amount FROM build_orders ORDER BY id").fetchall()
+        
+        build(pl.LazyFrame({"id": [1], "amount": [0], "updated_at": [0]}), full_refresh=True)
+        assert not build_model.is_incremental_run
+        result_after_full_refresh = duckdb_conn.sql("SELECT id, amount FROM build_orders").fetchall()
+    finally:
+        duckdb_conn.close()
+    
+    assert result == [(1, 10), (2, 25), (3, 30)]
+    assert result_after_full_refresh == [(1, 0)]
+
+
+def test_build_incremental_model_merges_columns_by_name(create_model_builder):
+    config = BuildModelConfig(depends_on={"seed_values"}, materialization="INCREMENTAL", unique_key=["id"])
+    build_model = BuildModel("build_values", config, SqlQueryFile("build_values.sql", 'SELECT * FROM {{ ref("seed_values") }}'))
+
+    def build(values: pl.LazyFrame) -> None:
+        seed = Seed("seed_values", SeedConfig(), values)
+        model_builder = create_model_builder({"seed_values": seed, "build_values": build_model})
+        asyncio.run(model_builder._build_models(duckdb_conn, select=None, full_refresh=False))
+    
+    duckdb_conn = duckdb.connect()
+    try:
+        build(pl.LazyFrame({"id": [3], "v": [30]}))
+        
+        # The query of the incremental run selects the columns in a different order than the table
+        build(pl.LazyFrame({"v": [31, 40], "id": [3, 4]}))
+        assert build_model.is_incremental_run
+        result = duckdb_conn.sql("SELECT id, v FROM build_values ORDER BY id").fetchall()
+    finally:
+        duckdb_conn.close()
+    
+    assert result == [(3, 31), (4, 40)]
+
+
+def test_build_skips_unchanged_models(create_model_builder, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    build_model = BuildModel(
+        "build_total", BuildModelConfig(materialization="TABLE"), 
+        SqlQueryFile("build_total.sql", 'SELECT sum(id) AS total FROM {{ ref("seed_a") }}')
+    )
+    
+    def build(seed_ids: list[int], full_refresh: bool = False) -> str:
+        seed = Seed("seed_a", SeedConfig(), pl.LazyFrame({"id": seed_ids}))
+        model_builder = create_model_builder({"seed_a": seed, "build_total": build_model})
+        model_builder._build_state_path = str(tmp_path / "build_state.json")
+        asyncio.run(model_builder._build_models(duckdb_conn, select=None, full_refresh=full_refresh))
+        return capsys.readouterr().out.strip().splitlines()[-1]
+    
+    duckdb_conn = duckdb.connect()
+    try:
+        assert build([1, 2]).endswith("Built 2 models and skipped 0 unchanged models")
+        assert build([1, 2]).endswith("Built 0 models and skipped 2 unchanged models")
+        assert build([1, 2, 3]).endswith("Built 2 models and skipped 0 unchanged models")
+        assert build([1, 2, 3], full_refresh=True).endswith("Built 2 models and skipped 0 unchanged models")
+        total = duckdb_conn.sql("SELECT total FROM build_total").fetchone()
+    finally:
+        duckdb_conn.close()
+    
+    assert total == (6,)
+
+
+def test_build_always_builds_python_models(create_model_builder, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    # Python models can read external data that changes without any change to the model file
+    external_data = {"total": 1}
+    model_path = tmp_path / "build_py.py"
+    model_path.write_text("def main(sqrl): ...")
+    build_model = BuildModel(
+        "build_py", BuildModelConfig(materialization="TABLE"), 
+        PyQueryFile(str(model_path), lambda sqrl: pl.LazyFrame({"total": [external_data["total"]]}))
+    )
+    model_builder = create_model_builder({"build_py": build_model})
+    model_builder._build_state_path = str(tmp_path / "build_state.json")
+    
+    duckdb_conn = duckdb.connect()
+    try:
+        asyncio.run(model_builder._build_models(duckdb_conn, select=None, full_refresh=False))
+        external_data["total"] = 2
+        asyncio.run(model_builder._build_models(duckdb_conn, select=None, full_refresh=False))
+        total = duckdb_conn.sql("SELECT total FROM build_py").fetchone()
+    finally:
+        duckdb_conn.close()
+    
+    assert capsys.readouterr().out.strip().splitlines()[-1].endswith("Built 1 models and skipped 0 unchanged models")
+    assert total == (2,)
+
+
+@pytest.mark.parametrize("select, exclude, expected_built", [
+    ("build_b", None, {"build_b"}),
+    ("+build_b", None, {"seed_a", "build_b"}),
+    ("build_b+", None, {"build_b", "build_c"}),
+    ("+build_b+", None, {"seed_a", "build_b", "build_c"}),
+    ("seed_a+, seed_d", "build_c", {"seed_a", "build_b", "seed_d"}),
+    (None, "+build_b", {"build_c", "seed_d"}),
+])
+def test_build_selected_models(
+    create_model_builder, capsys: pytest.CaptureFixture[str], select: str | None, exclude: str | None, expected_built: set[str]
+):
+    def make_build_model(name: str, query: str) -> BuildModel:
+        return BuildModel(name, BuildModelConfig(materialization="TABLE"), SqlQueryFile(f"{name}.sql", query))
+    
+    static_models: dict[str, StaticModel] = {
+        "seed_a": Seed("seed_a", SeedConfig(), pl.LazyFrame({"id": [1, 2]})),
+        "build_b": make_build_model("build_b", 'SELECT * FROM {{ ref("seed_a") }}'),
+        "build_c": make_build_model("build_c", 'SELECT * FROM {{ ref("build_b") }}'),
+        "seed_d": Seed("seed_d", SeedConfig(), pl.LazyFrame({"id": [3]})),
+    }
+    model_builder = create_model_builder(static_models)
+
+    duckdb_conn = duckdb.connect()
+    try:
+        # The models that are not selected may still be upstreams of the selected models
+        duckdb_conn.execute("CREATE TABLE seed_a AS SELECT 1 AS id")
+        duckdb_conn.execute("CREATE TABLE build_b AS SELECT 1 AS id")
+        asyncio.run(model_builder._build_models(duckdb_conn, select=select, full_refresh=False, exclude=exclude))
+    finally:
+        duckdb_conn.close()
+    
+    built = set(re.findall(r"BUILDING: \w+ model '(\w+)'", capsys.readouterr().out))
+    assert built == expected_built
+
+
+def test_build_with_unknown_selector(create_model_builder):
+    seed = Seed("seed_a", SeedConfig(), pl.LazyFrame({"id": [1]}))
+    model_builder = create_model_builder({"seed_a": seed})
+
+    duckdb_conn = duckdb.connect()
+    try:
+        with pytest.raises(ConfigurationError, match="missing_model"):
+            asyncio.run(model_builder._build_models(duckdb_conn, select="+missing_model", full_refresh=False))
+    finally:
+        duckdb_conn.close()
+
+
+def test_build_independent_models_concurrently_in_ducklake(create_model_builder, tmp_path: Path):
+    vdl_catalog = f"ducklake:{tmp_path}/vdl_catalog.duckdb"
+    with duckdb.connect() as conn:
+        conn.execute(f"ATTACH '{vdl_catalog}' AS vdl (DATA_PATH '{tmp_path}/vdl_data/')")
+    
+    num_models = 8
+    static_models: dict[str, StaticModel] = {}
+    for i in range(num_models):
+        static_models[f"seed_{i}"] = Seed(f"seed_{i}", SeedConfig(), pl.LazyFrame({"id": list(range(i + 1))}))
+        query = f'SELECT sum(id) AS total, count(*) AS num_rows FROM {{{{ ref("seed_{i}") }}}}'
+        static_models[f"build_{i}"] = BuildModel(
+            f"build_{i}", BuildModelConfig(materialization="TABLE"), SqlQueryFile(f"build_{i}.sql", query)
+        )
+    model_builder = create_model_builder(static_models)
+    model_builder._datalake_db_path = vdl_catalog
+    model_builder._threads = 4
+
+    asyncio.run(model_builder.build(full_refresh=False, select=None))
+
+    with duckdb.connect() as conn:
+        conn.execute(f"ATTACH '{vdl_catalog}' AS vdl (READ_ONLY)")
+        totals = [conn.sql(f"SELECT total, num_rows FROM vdl.build_{i}").fetchone() for i in range(num_models)]
+        snapshot_changes = conn.sql("SELECT changes FROM ducklake_snapshots('vdl')").fetchall()
+    
+    assert totals == [(i * (i + 1) // 2, i + 1) for i in range(num_models)]
+    
+    # Every model was committed in its own snapshot
+    tables_created = [table for (changes,) in snapshot_changes for table in changes.get("tables_created", [])]
+    assert sorted(tables_created) == sorted(f"main.{name}" for name in static_models)
@@ -1,6 +1,6 @@
 import pytest
 
-from squirrels._model_configs import FederateModelConfig
+from squirrels._model_configs import FederateModelConfig, BuildModelConfig
 
 
 @pytest.mark.parametrize("eager,create_type", [
@@ -14,3 +14,24 @@ def test_get_sql_for_create(eager: bool, create_type: str):
     
     expected = f"CREATE {create_type} test_model AS\n\nSELECT * FROM table"
     assert result == expected
+
+
+@pytest.mark.parametrize("eager,default_eager,expected", [
+    (None, "auto", "auto"),
+    (None, True, True),
+    (False, "auto", False),
+])
+def test_finalize_eager(eager: bool | None, default_eager: bool | str, expected: bool | str):
+    config = FederateModelConfig(eager=eager).finalize_eager(default_eager=default_eager) # type: ignore
+    assert config.eager == expected
+    assert config.get_sql_for_create("test_model", "SELECT 1").startswith("CREATE VIEW" if expected is not True else "CREATE TABLE")
+
+
+@pytest.mark.parametrize("unique_key,incremental_run,expected", [
+    (["id"], False, "CREATE OR REPLACE TABLE test_model AS\n\nSELECT * FROM table"),
+    (["id"], True, "MERGE INTO test_model USING (\nSELECT * FROM table\n) AS src USING (id) WHEN MATCHED THEN UPDATE BY NAME WHEN NOT MATCHED THEN INSERT BY NAME"),
+    ([], True, "MERGE INTO test_model USING (\nSELECT * FROM table\n) AS src ON false WHEN MATCHED THEN UPDATE BY NAME WHEN NOT MATCHED THEN INSERT BY NAME"),
+])
+def test_get_sql_for_build_incremental(unique_key: list[str], incremental_run: bool, expected: str):
+    config = BuildModelConfig(materialization="incremental", unique_key=unique_key)
+    assert config.get_sql_for_build("test_model", "SELECT * FROM table", incremental_run=incremental_run) == expected
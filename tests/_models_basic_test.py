@@ -1,4 +1,4 @@
-import pytest, polars as pl
+import pytest, asyncio, duckdb, polars as pl, pyarrow as pa
 from pathlib import Path
 
 from squirrels import _models as m, _utils as u, _model_queries as mq
@@ -8,6 +8,9 @@ from squirrels._schemas.auth_models import GuestUser, CustomUserFields
 from squirrels._manifest import DatasetConfig
 from squirrels._model_configs import DbviewModelConfig, FederateModelConfig, SeedConfig
 from squirrels._env_vars import SquirrelsEnvVars
+from squirrels._connection_set import ConnectionSet, ConnectionProperties
+from squirrels._manifest import ConnectionTypeEnum
+from squirrels._sources import Source
 
 
 # Model Type Tests
@@ -58,6 +61,66 @@ def test_federate_model(federate_model: m.FederateModel):
     assert not federate_model.is_target
 
 
+def test_target_model_loads_requested_rows_from_duckdb(federate_model: m.FederateModel):
+    conn = duckdb.connect()
+    conn.execute("CREATE VIEW test_model AS SELECT range AS id FROM range(100)")
+    federate_model.is_target = True
+    federate_model.row_offset, federate_model.row_limit, federate_model.count_total_rows = 10, 5, True
+
+    result = federate_model._load_duckdb_view_to_python_df(conn)
+    assert result.collect()["id"].to_list() == [10, 11, 12, 13, 14]
+    assert federate_model.total_num_rows == 100
+
+
+@pytest.mark.parametrize("is_target, expected_type", [(False, pa.Table), (True, pl.LazyFrame)])
+def test_duckdb_dbview_result_stays_in_arrow_unless_used_in_python(is_target: bool, expected_type: type):
+    model = m.DbviewModel("test_model", DbviewModelConfig(connection="default"), mq.SqlQueryFile("test.sql", ""))
+    model.compiled_query = mq.SqlModelQuery("SELECT range AS id FROM range(3)", is_duckdb=True)
+    model.is_target = is_target
+
+    conn = duckdb.connect()
+    asyncio.run(model.run_model(conn))
+    assert isinstance(model.result, expected_type)
+    
+    conn.register("test_model", model.result)
+    assert conn.sql("SELECT sum(id) FROM test_model").fetchone() == (3,)
+
+
+def test_sql_query_file_template_is_compiled_once():
+    j2_env = u.j2.Environment()
+    query_file = mq.SqlQueryFile("test.sql", 'SELECT * FROM {{ ref("upstream") }}')
+    template = query_file.get_template(j2_env)
+    assert query_file.get_template(j2_env) is template
+    assert query_file.get_template(u.j2.Environment()) is not template
+    
+    changed_query_file = mq.SqlQueryFile("test.sql", 'SELECT 1 FROM {{ ref("upstream") }}')
+    assert changed_query_file.get_template(j2_env).render(ref=lambda x: x) == "SELECT 1 FROM upstream"
+
+
+@pytest.mark.parametrize("translate_to_duckdb, expected_query, expected_is_duckdb", [
+    (False, "SELECT * FROM raw_table WHERE id > 1", False),
+    (True, "-- translated to duckdb\nSELECT\n  *\nFROM vdl.src_table\nWHERE\n  id > 1", True),
+])
+def test_dbview_sources_compile_with_one_render(
+    ctx_args: ContextArgs, monkeypatch: pytest.MonkeyPatch, translate_to_duckdb: bool, expected_query: str, expected_is_duckdb: bool
+):
+    conn_set = ConnectionSet({"default": ConnectionProperties(type=ConnectionTypeEnum.CONNECTORX, uri="sqlite://test.db")})
+    source = Source(connection="default", table="raw_table", load_to_vdl=True).finalize_table("src_table")
+    source_model = m.SourceModel("src_table", source, conn_set=conn_set)
+    config = DbviewModelConfig(connection="default", translate_to_duckdb=translate_to_duckdb)
+    model = m.DbviewModel("test_model", config, mq.SqlQueryFile("test.sql", 'SELECT * FROM {{ source("src_table") }} WHERE id > 1'), conn_set=conn_set)
+    
+    # Only the template of the query file (compiled once) is rendered, and no template is compiled from a rendered query
+    model.query_file.get_template(model.j2_env)
+    def from_string(*args, **kwargs):
+        raise AssertionError("The rendered query of a dbview model should not be compiled again")
+    monkeypatch.setattr(model.j2_env, "from_string", from_string)
+    
+    model.compile({}, ctx_args, {"src_table": source_model, "test_model": model}, recurse=False)
+    assert model.compiled_query == mq.SqlModelQuery(expected_query, expected_is_duckdb)
+    assert model.model_config.depends_on == {"src_table"}
+
+
 # DAG Tests
 @pytest.fixture(scope="function")
 def ctx_args() -> ContextArgs:
@@ -96,6 +159,70 @@ def test_dag_compilation(simple_dag: m.DAG, ctx_args: ContextArgs):
     assert model_b.upstreams == {"C": model_c}
     assert model_c.upstreams == {}
 
+@pytest.mark.parametrize("release_results", [True, False])
+def test_dag_releases_intermediate_results(simple_dag: m.DAG, ctx_args: ContextArgs, release_results: bool):
+    simple_dag.target_model.is_target = True
+    simple_dag._compile_models({}, ctx_args, True)
+    simple_dag.release_results = release_results
+    model_b = simple_dag.models_dict["B"]
+    model_b.needs_python_df = True
+
+    # C is read by B and by A (since B is a view), so it must still be available when A runs
+    assert simple_dag._get_result_readers(simple_dag._get_models_to_run()) == {"A": set(), "B": {"A"}, "C": {"A", "B"}}
+    
+    asyncio.run(simple_dag._run_models())
+    assert simple_dag.target_model.result is not None
+    assert simple_dag.target_model.result.collect()["id"].to_list() == [1, 2, 3]
+    assert (model_b.result is None) == release_results
+    assert (simple_dag.models_dict["C"].result is None) == release_results
+
+def test_dag_inlines_federate_chain_as_ctes(simple_dag: m.DAG, ctx_args: ContextArgs):
+    simple_dag.target_model.is_target = True
+    simple_dag._compile_models({}, ctx_args, True)
+    model_a, model_b = simple_dag.models_dict["A"], simple_dag.models_dict["B"]
+    assert isinstance(model_a, m.FederateModel) and isinstance(model_b, m.FederateModel)
+
+    asyncio.run(simple_dag._run_models())
+    assert model_b.inlined_into is model_a and model_a.inlined_into is None
+    assert model_a.get_inlined_upstreams() == [model_b]
+    assert simple_dag.target_model.result is not None
+    assert simple_dag.target_model.result.collect()["id"].to_list() == [1, 2, 3]
+
+    query = model_a._get_query_with_inlined_upstreams("-- comment\nWITH x AS (SELECT * FROM B) SELECT * FROM x")
+    assert query == "-- comment\nWITH B AS (\nSELECT * FROM C\n),\nx AS (SELECT * FROM B) SELECT * FROM x"
+
+@pytest.mark.parametrize("past_stats, expected_eager", [
+    (None, True),
+    (m.ModelRunStats(num_runs=5, avg_duration=0.5, avg_num_rows=10**7), True),
+    (m.ModelRunStats(num_runs=5, avg_duration=0.001, avg_num_rows=10**7), False),
+])
+def test_dag_decides_auto_eager_from_fan_out_and_past_runs(
+    ctx_args: ContextArgs, past_stats: m.ModelRunStats | None, expected_eager: bool
+):
+    # Create a DAG where B is read by both A and D: A -> B -> C, and A -> D -> B
+    model_c = m.Seed("C", SeedConfig(), pl.LazyFrame({"id": [1, 2, 3]}))
+    model_b = m.FederateModel("B", FederateModelConfig(eager="auto"), mq.SqlQueryFile("B.sql", 'SELECT * FROM {{ ref("C") }}'))
+    model_d = m.FederateModel("D", FederateModelConfig(eager="auto"), mq.SqlQueryFile("D.sql", 'SELECT * FROM {{ ref("B") }}'))
+    query_a = 'SELECT id FROM {{ ref("B") }} JOIN {{ ref("D") }} USING (id) ORDER BY id'
+    model_a = m.FederateModel("A", FederateModelConfig(), mq.SqlQueryFile("A.sql", query_a))
+    model_a.is_target = True
+
+    model_run_stats = {"B": past_stats} if past_stats is not None else {}
+    models: dict[str, m.DataModel] = {"A": model_a, "B": model_b, "C": model_c, "D": model_d}
+    dag = m.DAG(DatasetConfig(name="test"), model_a, models, model_run_stats=model_run_stats)
+    dag._compile_models({}, ctx_args, True)
+    
+    asyncio.run(dag._run_models())
+    assert model_b.is_eager == expected_eager and not model_d.is_eager
+    assert model_d.inlined_into is model_a
+    assert model_a.result is not None and model_a.result.collect()["id"].to_list() == [1, 2, 3]
+    
+    if expected_eager:
+        assert model_b.num_rows_materialized == 3
+        assert dag.model_run_stats["B"].num_runs == (1 if past_stats is None else 6)
+    else:
+        assert model_b.num_rows_materialized is None and dag.model_run_stats["B"].num_runs == 5
+
 def test_dag_terminal_nodes(simple_dag: m.DAG, ctx_args: ContextArgs):
     ctx = {}
     simple_dag._compile_models(ctx, ctx_args, True)
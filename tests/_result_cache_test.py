@@ -0,0 +1,265 @@
+from pathlib import Path
+from unittest.mock import patch
+import pytest, asyncio, duckdb, polars as pl
+
+from squirrels._result_cache import ResultCache, DiskResultCache, get_estimated_size
+from squirrels._dataset_types import DatasetResult, DatasetResultFormat
+from squirrels._dependency_tracker import DatasetDependencies
+from squirrels._model_configs import ModelConfig, ColumnConfig
+from squirrels._dashboards import HtmlDashboard, PngDashboard
+from squirrels._schemas.auth_models import GuestUser, CustomUserFields
+from squirrels._connection_set import ConnectionSet
+from squirrels._project import SquirrelsProject
+from squirrels import _constants as c
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def timer() -> FakeTimer:
+    return FakeTimer()
+
+
+def make_cache(timer: FakeTimer, *, max_entries: int = 10, max_size_bytes: int = 100) -> ResultCache:
+    return ResultCache("test", max_entries, max_size_bytes, ttl_seconds=60, getsizeof=len, timer=timer)
+
+
+def test_get_and_set(timer: FakeTimer):
+    cache = make_cache(timer)
+    assert cache.get("a") is None
+    cache["a"] = "x" * 10
+    assert cache.get("a") == "x" * 10
+    assert "a" in cache and len(cache) == 1
+
+    stats = cache.get_stats()
+    assert (stats.hits, stats.misses, stats.entries, stats.size_bytes) == (1, 1, 1, 10)
+
+
+def test_entries_expire(timer: FakeTimer):
+    cache = make_cache(timer)
+    cache["a"] = "x"
+    timer.now = 61
+    assert cache.get("a") is None
+    assert cache.get_stats().expirations == 1
+
+
+def test_evicts_by_size_cost_and_frequency(timer: FakeTimer):
+    cache = make_cache(timer)
+    cache.set("large_cheap", "x" * 60, cost=1)
+    cache.set("small_cheap", "x" * 20, cost=1)
+    cache.set("medium_expensive", "x" * 40, cost=100)
+    
+    assert "large_cheap" not in cache
+    assert "small_cheap" in cache and "medium_expensive" in cache
+    assert cache.get_stats().size_bytes == 60
+
+    # Frequently used entries outlive entries of the same size and cost
+    cache.set("other", "y" * 20, cost=1)
+    for _ in range(5):
+        cache.get("small_cheap")
+    cache.set("new", "z" * 30, cost=1)
+    assert "small_cheap" in cache and "other" not in cache
+    assert cache.get_stats().evictions == 2
+
+
+def test_evicts_by_max_entries(timer: FakeTimer):
+    cache = make_cache(timer, max_entries=2)
+    for key in ["a", "b", "c"]:
+        cache[key] = key
+    assert len(cache) == 2 and "c" in cache
+
+
+def test_rejects_entries_larger_than_budget(timer: FakeTimer):
+    cache = make_cache(timer)
+    cache["a"] = "x" * 101
+    assert "a" not in cache
+    assert cache.get_stats().rejections == 1
+
+
+def test_estimated_size_of_results():
+    df = pl.DataFrame({"a": list(range(1000))}).with_row_index("_row_num", offset=1)
+    result = DatasetResult(target_model_config=ModelConfig(), df=df)
+    initial_size = get_estimated_size(result)
+    assert initial_size == df.estimated_size()
+
+    json_bytes = result.to_json_bytes(DatasetResultFormat("records", 0, None))
+    assert get_estimated_size(result) == initial_size + len(json_bytes)
+
+    assert get_estimated_size(HtmlDashboard("<p>hi</p>")) == 9
+
+
+@pytest.mark.parametrize("file_format", ["arrow", "parquet"])
+def test_disk_cache_is_shared_across_instances(tmp_path, timer: FakeTimer, file_format):
+    cache1 = DiskResultCache("dataset results", 10, 10**6, 60, str(tmp_path), file_format=file_format, timer=timer)
+    cache2 = DiskResultCache("dataset results", 10, 10**6, 60, str(tmp_path), file_format=file_format, timer=timer)
+    
+    df = pl.DataFrame({"a": [1, 2, 3]}).with_row_index("_row_num", offset=1)
+    model_config = ModelConfig(columns=[ColumnConfig(name="a", description="My column")])
+    key = ("dataset", GuestUser(username="user1", custom_fields=CustomUserFields()), (("param", "value"),), ())
+    cache1.set(key, DatasetResult(target_model_config=model_config, df=df))
+    
+    result = cache2.get(("dataset", GuestUser(username="user1", custom_fields=CustomUserFields()), (("param", "value"),), ()))
+    assert isinstance(result, DatasetResult)
+    assert result.df.equals(df)
+    assert result.target_model_config == model_config
+    assert cache2.get(("dataset", GuestUser(username="user2", custom_fields=CustomUserFields()), (("param", "value"),), ())) is None
+    
+    stats = cache2.get_stats()
+    assert (stats.entries, stats.hits, stats.misses) == (1, 1, 1)
+
+
+def test_disk_cache_restores_dependencies_and_total_num_rows(tmp_path, timer: FakeTimer):
+    cache1 = DiskResultCache("dataset results", 10, 10**6, 60, str(tmp_path), timer=timer)
+    cache2 = DiskResultCache("dataset results", 10, 10**6, 60, str(tmp_path), timer=timer)
+
+    df = pl.DataFrame({"a": [1, 2, 3]}).with_row_index("_row_num", offset=1)
+    dependencies = DatasetDependencies(frozenset({"param"}), frozenset(), frozenset({"custom_fields.role"}))
+    cache1.set("key", DatasetResult(target_model_config=ModelConfig(), df=df, total_num_rows=100, dependencies=dependencies))
+    cache1.set("no_dependencies", DatasetResult(target_model_config=ModelConfig(), df=df))
+
+    result = asyncio.run(cache2.lookup_async("key")).value
+    assert result.dependencies == dependencies
+    assert result.get_total_num_rows() == 100
+    result = cache2.get("no_dependencies")
+    assert result.dependencies is None and result.get_total_num_rows() == 3
+
+    # Invalidations by another instance are seen by the next lookup or set
+    cache1.invalidate(None, None)
+    assert (cache1.num_invalidations, cache2.num_invalidations) == (1, 0)
+    asyncio.run(cache2.set_async("key", DatasetResult(target_model_config=ModelConfig(), df=df)))
+    assert cache2.num_invalidations == 1
+
+
+def test_disk_cache_dashboards_and_unsupported_values(tmp_path, timer: FakeTimer):
+    cache = DiskResultCache("dashboard results", 10, 10**6, 60, str(tmp_path), timer=timer)
+    cache["png"] = PngDashboard(b"\x89PNG")
+    cache["html"] = HtmlDashboard("<p>é</p>")
+    cache["other"] = {"a": 1}
+
+    assert cache.get("png")._content == b"\x89PNG"
+    assert cache.get("html")._content == "<p>é</p>"
+    assert "other" not in cache and len(cache) == 2
+
+
+def test_disk_cache_expires_and_evicts(tmp_path, timer: FakeTimer):
+    cache = DiskResultCache("dashboard results", 10, 100, 60, str(tmp_path), timer=timer)
+    cache.set("large_cheap", HtmlDashboard("x" * 60), cost=1)
+    cache.set("small_cheap", HtmlDashboard("x" * 20), cost=1)
+    cache.set("medium_expensive", HtmlDashboard("x" * 40), cost=100)
+    
+    assert "large_cheap" not in cache and len(cache) == 2
+    assert len(list(Path(tmp_path, "dashboard_results").glob("*.html"))) == 2
+    
+    timer.now = 61
+    assert cache.get("small_cheap") is None
+    assert cache.get_stats().entries == 1
+    assert len(list(Path(tmp_path, "dashboard_results").glob("*.html"))) == 1
+
+    cache.clear()
+    assert len(cache) == 0
+    assert len(list(Path(tmp_path, "dashboard_results").glob("*.html"))) == 0
+
+
+def make_tagged_result(vdl_snapshot_id: int | None, static_models: set[str]) -> DatasetResult:
+    df = pl.DataFrame({"a": [1, 2, 3]}).with_row_index("_row_num", offset=1)
+    return DatasetResult(
+        target_model_config=ModelConfig(), df=df, vdl_snapshot_id=vdl_snapshot_id, static_models=frozenset(static_models)
+    )
+
+
+@pytest.mark.parametrize("backend", ["memory", "disk"])
+def test_invalidates_entries_that_read_changed_models(tmp_path, timer: FakeTimer, backend):
+    if backend == "disk":
+        cache = DiskResultCache("dataset results", 10, 10**6, 60, str(tmp_path), timer=timer)
+    else:
+        cache = ResultCache("dataset results", 10, 10**6, 60, timer=timer)
+    
+    cache["orders"] = make_tagged_result(5, {"orders"})
+    cache["customers"] = make_tagged_result(5, {"customers"})
+    cache["up_to_date"] = make_tagged_result(7, {"orders"})
+    cache["untagged"] = make_tagged_result(None, set())
+    
+    assert cache.invalidate({"orders"}, 7) == 2
+    assert "customers" in cache and "up_to_date" in cache and len(cache) == 2
+    assert (cache.num_invalidations, cache.vdl_snapshot_id) == (1, 7)
+    
+    # Results computed from a snapshot before the change are not cached afterwards
+    cache["stale_orders"] = make_tagged_result(6, {"orders"})
+    cache["stale_customers"] = make_tagged_result(6, {"customers"})
+    assert "stale_orders" not in cache and "stale_customers" in cache
+    
+    # Unknown changes invalidate all older entries
+    assert cache.invalidate(None, 8) == 3
+    cache["stale_customers"] = make_tagged_result(7, {"customers"})
+    assert len(cache) == 0
+    assert cache.get_stats().invalidations == 5
+
+
+@pytest.mark.parametrize("backend", ["memory", "disk"])
+def test_lookup_serves_stale_and_soon_to_expire_entries(tmp_path, timer: FakeTimer, backend):
+    kwargs = dict(max_stale_seconds=30, refresh_ahead_seconds=10, refresh_ahead_min_hits=2, timer=timer)
+    if backend == "disk":
+        cache = DiskResultCache("dashboard results", 10, 10**6, 60, str(tmp_path), **kwargs)
+    else:
+        cache = ResultCache("dashboard results", 10, 10**6, 60, **kwargs)
+    
+    cache["a"] = HtmlDashboard("a")
+    timer.now = 55
+    assert cache.lookup("a").needs_refresh is False # only hit once
+    assert cache.lookup("a").needs_refresh is True
+    
+    timer.now = 70
+    assert cache.get("a") is None and "a" not in cache
+    lookup = cache.lookup("a")
+    assert lookup.value._content == "a" and lookup.needs_refresh is True
+    
+    # A refreshed entry is fresh again and keeps its access frequency
+    cache["a"] = HtmlDashboard("b")
+    assert cache.get("a")._content == "b"
+    timer.now = 125
+    assert cache.lookup("a").needs_refresh is True
+    
+    timer.now = 161
+    assert cache.lookup("a") is None
+    stats = cache.get_stats()
+    assert (stats.stale_hits, stats.expirations) == (1, 1)
+
+
+def test_disk_cache_is_invalidated_selectively_across_restarts(tmp_path):
+    env_vars = {c.SQRL_RESULT_CACHE_BACKEND: "disk"}
+    vdl_catalog = f"ducklake:{tmp_path}/target/vdl_catalog.duckdb"
+    
+    def write_to_vdl(*statements: str) -> None:
+        with duckdb.connect() as conn:
+            conn.execute(f"ATTACH '{vdl_catalog}' AS vdl")
+            for statement in statements:
+                conn.execute(statement)
+    
+    def start_project() -> SquirrelsProject:
+        with patch("squirrels._project.SquirrelsProject._load_env_vars", return_value=env_vars):
+            project = SquirrelsProject(project_path=str(tmp_path))
+        project.__dict__["_conn_set"] = ConnectionSet()
+        return project
+    
+    project = start_project()
+    write_to_vdl("CREATE TABLE vdl.orders AS SELECT 1 AS a", "CREATE TABLE vdl.customers AS SELECT 1 AS a")
+    cache = DiskResultCache("dataset results", 10, 10**6, 60, project._env_vars.result_cache_disk_path)
+    project._register_result_cache(cache)
+    vdl_snapshot_id = project._get_current_vdl_snapshot_id()
+    cache.invalidate(set(), vdl_snapshot_id)
+    cache["orders"] = make_tagged_result(vdl_snapshot_id, {"orders"})
+    cache["customers"] = make_tagged_result(vdl_snapshot_id, {"customers"})
+    project._duckdb_pool.clear()
+    
+    # The VDL changes while the server is stopped, and the restart expires old snapshots
+    write_to_vdl("INSERT INTO vdl.orders VALUES (2)", "INSERT INTO vdl.orders VALUES (3)")
+    project = start_project()
+    project._register_result_cache(DiskResultCache("dataset results", 10, 10**6, 60, project._env_vars.result_cache_disk_path))
+    project._duckdb_pool.clear()
+    assert "orders" not in cache and "customers" in cache
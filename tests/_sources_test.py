@@ -60,17 +60,37 @@ def test_source_get_query_for_upsert():
     assert source.get_query_for_upsert(dialect="postgres", conn_name="default", table_name="table_test", max_value_of_increasing_col=None) == expected
     assert source.get_query_for_upsert(dialect="postgres", conn_name="default", table_name="table_test", max_value_of_increasing_col="2024-01-01", full_refresh=True) == expected
     
-    # expected = "FROM postgres_query('db_default', 'SELECT id, timestamp FROM table_test WHERE CAST(timestamp AS TIMESTAMP) > CAST(''2024-01-01'' AS TIMESTAMP)')"
     expected = "SELECT id, timestamp FROM db_default.table_test WHERE timestamp::timestamp > '2024-01-01'::timestamp"
     assert source.get_query_for_upsert(dialect="postgres", conn_name="default", table_name="table_test", max_value_of_increasing_col="2024-01-01", full_refresh=False) == expected
 
-    # expected = "FROM mysql_query('db_default', 'SELECT id, timestamp FROM table_test WHERE CAST(timestamp AS DATETIME) > CAST(''2024-01-01'' AS DATETIME)')"
     expected = "SELECT id, timestamp FROM db_default.table_test WHERE timestamp::timestamp > '2024-01-01'::timestamp"
     assert source.get_query_for_upsert(dialect="mysql", conn_name="default", table_name="table_test", max_value_of_increasing_col="2024-01-01", full_refresh=False) == expected
 
     expected = "SELECT id, timestamp FROM db_default.table_test WHERE timestamp::timestamp > '2024-01-01'::timestamp"
     assert source.get_query_for_upsert(dialect="sqlite", conn_name="default", table_name="table_test", max_value_of_increasing_col="2024-01-01", full_refresh=False) == expected
 
+def test_source_get_query_for_upsert_with_pushdown_filter():
+    source = Source(
+        table="table_test",
+        columns=[
+            ColumnConfig(name="id", type="integer"),
+            ColumnConfig(name="timestamp", type="timestamp")
+        ],
+        update_hints=UpdateHints(increasing_column="timestamp", pushdown_filter=True)
+    )
+    expected = "FROM postgres_query('db_default', 'SELECT id, timestamp FROM table_test WHERE timestamp > CAST(''2024-01-01'' AS TIMESTAMP)')"
+    assert source.get_query_for_upsert(dialect="postgres", conn_name="default", table_name="table_test", max_value_of_increasing_col="2024-01-01", full_refresh=False) == expected
+
+    expected = "FROM mysql_query('db_default', 'SELECT id, timestamp FROM table_test WHERE timestamp > CAST(''2024-01-01'' AS DATETIME)')"
+    assert source.get_query_for_upsert(dialect="mysql", conn_name="default", table_name="table_test", max_value_of_increasing_col="2024-01-01", full_refresh=False) == expected
+
+    # Not supported for other dialects, and not applicable to full refreshes
+    expected = "SELECT id, timestamp FROM db_default.table_test WHERE timestamp::timestamp > '2024-01-01'::timestamp"
+    assert source.get_query_for_upsert(dialect="sqlite", conn_name="default", table_name="table_test", max_value_of_increasing_col="2024-01-01", full_refresh=False) == expected
+
+    expected = "SELECT id, timestamp FROM db_default.table_test"
+    assert source.get_query_for_upsert(dialect="postgres", conn_name="default", table_name="table_test", max_value_of_increasing_col="2024-01-01", full_refresh=True) == expected
+
 def test_sources_creation():
     # Test creating Sources with a dictionary
     sources = Sources(sources={
@@ -126,3 +126,30 @@ def test_user_has_elevated_privileges_matrix():
     ]
     for user_level, required_level, expected in cases:
         assert u.user_has_elevated_privileges(user_level, required_level) is expected
+
+
+@pytest.mark.parametrize('source,expected', [
+    ('SELECT * FROM {{ ref("a") }} JOIN {{ source("b") }}', {"a", "b"}),
+    ('SELECT * FROM {{ ref(model="a") }} WHERE x = {{ other("c") }}', {"a"}),
+    ('SELECT 1', set()),
+    ('SELECT * FROM {{ ref(model_name) }}', None),
+    ('{% for x in ["a", "b"] %}SELECT * FROM {{ ref(x) }}{% endfor %}', None),
+])
+def test_get_constant_args_of_calls(source, expected):
+    j2_env = u.j2.Environment()
+    assert u.get_constant_args_of_calls(j2_env, source, ["ref", "source"]) == expected
+
+
+@pytest.mark.parametrize('macros,query,kwargs,expected', [
+    ('{% macro add(a, b) %}{{ a + b }}{% endmacro %}', 'SELECT {{ add(1, 2) }}', {}, "SELECT 3"),
+    ('{% macro filter() %}x > {{ ctx.min_x }}{% endmacro %}', 'WHERE {{ filter() }}', {"ctx": {"min_x": 5}}, "WHERE x > 5"),
+    ('{% macro f() %}macro{% endmacro %}', '{% macro f() %}own{% endmacro %}{{ f() }}', {}, "own"),
+])
+def test_environment_with_macros(tmp_path, macros, query, kwargs, expected):
+    (tmp_path / "macros").mkdir()
+    (tmp_path / "macros" / "macros.sql").write_text(macros)
+    j2_env = u.EnvironmentWithMacros(u.Logger(""), loader=u.j2.FileSystemLoader(tmp_path))
+    
+    assert j2_env.from_string(query).render(kwargs) == expected
+    assert j2_env.from_string(query).render(kwargs) == expected
+    assert j2_env._macros_template is not None